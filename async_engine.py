@@ -0,0 +1,555 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步验证引擎
+线程引擎按行键验证时每个在途批次占用一个线程，在途请求到几十个以后线程切换和GIL争用
+开始占主导，跨机房等高延迟场景下吞吐受限于在途请求数。异步引擎在一个事件循环中保持
+数百个在途multi-get，每批的源端和目标端读取同时发出：
+
+- 有thriftpy2（happybase的依赖）时，每端维护一组非阻塞的Thrift连接（与happybase相同的
+  Hbase.thrift、buffered传输和binary协议），收发由asyncio完成，请求编码和响应解码使用
+  thriftpy2的Cython二进制协议（thriftpy2未编译扩展时退回纯Python实现），不占用线程
+- 否则（或注入了connection_factory，如基准测试的fake_hbase）通过run_in_executor调用
+  同步的表对象，在途批次数不超过连接池大小
+
+thriftpy2自带的asyncio客户端逐字段await解码，宽行响应的解码开销比网络延迟还高，所以没有使用。
+行摘要和逐列对比是CPU计算，在单独的对比线程（或多进程对比的进程池）中进行，不阻塞事件循环。
+限速、重试、熔断和运行指标与同步表对象的包装链一致；批次按读取顺序提交，断点语义与
+线程引擎相同。
+"""
+
+import asyncio
+import itertools
+import logging
+import socket
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from metrics import RPC_ERRORS, RPC_TOTAL, STAGE_SECONDS
+from rate_limit import RateLimiter
+from resilience import ResilientTable
+from result_store import RowResult
+from scan_tuning import estimate_row_bytes
+
+try:
+    from thriftpy2.thrift import TApplicationException, TMessageType
+    from thriftpy2.transport import TTransportException
+    try:
+        from thriftpy2.protocol import TCyBinaryProtocol as BinaryProtocol
+        from thriftpy2.transport import TCyMemoryBuffer as MemoryBuffer
+    except ImportError:
+        from thriftpy2.protocol import TBinaryProtocol as BinaryProtocol
+        from thriftpy2.transport import TMemoryBuffer as MemoryBuffer
+except ImportError:
+    BinaryProtocol = None
+
+ENGINES = ('thread', 'asyncio')
+
+# 异步引擎默认的在途批次数上限
+DEFAULT_ASYNC_CONCURRENCY = 256
+
+# 每次从套接字读取的最大字节数
+READ_SIZE = 256 * 1024
+
+# 熔断期间重新检查熔断器的最长间隔（秒），探测请求成功后尽快恢复
+BREAKER_POLL_SECONDS = 0.1
+
+_I32 = struct.Struct('!i')
+
+# Thrift二进制协议中定长类型的字节数（BOOL、BYTE、DOUBLE、I16、I32、I64）
+_FIXED_SIZES = {2: 1, 3: 1, 4: 8, 6: 2, 8: 4, 10: 8}
+_STRING, _STRUCT, _MAP, _SET, _LIST = 11, 12, 13, 14, 15
+
+
+def load_hbase_service():
+    """happybase加载Hbase.thrift时注册的Hbase_thrift模块，没有thriftpy2时返回None"""
+    if BinaryProtocol is None:
+        return None
+    try:
+        import happybase  # noqa: F401  导入时加载Hbase.thrift
+        import Hbase_thrift
+    except ImportError:
+        return None
+    return Hbase_thrift
+
+
+class MessageScanner:
+    """
+    增量判断二进制协议消息的长度（buffered传输没有长度前缀）
+
+    只跳过字段不构造对象，完整的消息再交给协议实现一次解码。扫描位置和未跳过完的
+    结构体/容器栈在多次feed之间保留，已扫描的字节不再重复扫描。
+    """
+
+    def __init__(self):
+        self.position = 0
+        # 栈元素为 [元素类型, 剩余值个数, 下一个值的类型下标]，结构体的元素类型为None；
+        # 栈为None表示消息头尚未读完
+        self.stack: Optional[List[list]] = None
+
+    def feed(self, data) -> Optional[int]:
+        """data为目前收到的全部字节，消息完整时返回其长度，否则返回None"""
+        try:
+            return self._scan(data)
+        except (IndexError, struct.error):
+            # 下一个类型/长度字段还没收到，状态停在上一个完整的值之后
+            return None
+
+    def _scan(self, data) -> Optional[int]:
+        if self.stack is None:
+            header = _I32.unpack_from(data, 0)[0]
+            if header < 0:
+                # strict格式：版本和消息类型、方法名、序号
+                position = 8 + _I32.unpack_from(data, 4)[0] + 4
+            else:
+                # 非strict格式：方法名、消息类型、序号
+                position = 4 + header + 5
+            if position > len(data):
+                return None
+            self.position = position
+            self.stack = [[None, 0, 0]]
+
+        stack = self.stack
+        size_limit = len(data)
+        while stack:
+            frame = stack[-1]
+            types = frame[0]
+            position = self.position
+            if types is None:
+                field_type = data[position]
+                if field_type == 0:
+                    self.position = position + 1
+                    stack.pop()
+                    continue
+                value_type, start = field_type, position + 3
+            else:
+                if frame[1] == 0:
+                    stack.pop()
+                    continue
+                value_type, start = types[frame[2]], position
+
+            # 跳过一个值：定长类型、字符串和元素全为定长类型的容器直接前进，其余压栈
+            pushed = None
+            size = _FIXED_SIZES.get(value_type)
+            if size:
+                advanced = start + size
+            elif value_type == _STRING:
+                advanced = start + 4 + _I32.unpack_from(data, start)[0]
+            elif value_type == _STRUCT:
+                advanced, pushed = start, [None, 0, 0]
+            elif value_type in (_MAP, _SET, _LIST):
+                if value_type == _MAP:
+                    element_types = (data[start], data[start + 1])
+                    advanced = start + 6
+                else:
+                    element_types = (data[start],)
+                    advanced = start + 5
+                count = max(_I32.unpack_from(data, advanced - 4)[0], 0)
+                sizes = [_FIXED_SIZES.get(element_type) for element_type in element_types]
+                if all(sizes):
+                    advanced += sum(sizes) * count
+                elif count:
+                    pushed = [element_types, count * len(element_types), 0]
+            else:
+                raise TTransportException(TTransportException.UNKNOWN, f"无法识别的Thrift类型: {value_type}")
+            if advanced > size_limit:
+                return None
+
+            if types is not None:
+                frame[1] -= 1
+                frame[2] = (frame[2] + 1) % len(types)
+            self.position = advanced
+            if pushed:
+                stack.append(pushed)
+        return self.position
+
+
+def message_length(data) -> Optional[int]:
+    """data中第一条二进制协议消息的长度，消息还不完整时返回None"""
+    return MessageScanner().feed(data)
+
+
+class AsyncThriftConnection:
+    """一条非阻塞的Thrift连接，同一时刻只能有一个在途请求"""
+
+    def __init__(self, service, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, timeout: float):
+        self.service = service
+        self.reader = reader
+        self.writer = writer
+        self.timeout = timeout
+        self.seqid = 0
+
+    @classmethod
+    async def open(cls, service, host: str, port: int, timeout: float) -> 'AsyncThriftConnection':
+        """建立连接，timeout为连接和每次读取的超时（秒）"""
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        except asyncio.TimeoutError:
+            raise socket.timeout(f"连接超时: {host}:{port}")
+        return cls(service, reader, writer, timeout)
+
+    async def call(self, api: str, **kwargs):
+        """调用一个Thrift方法，返回值和异常与happybase使用的同步客户端一致"""
+        self.seqid += 1
+        buffer = MemoryBuffer()
+        protocol = BinaryProtocol(buffer)
+        protocol.write_message_begin(api, TMessageType.CALL, self.seqid)
+        getattr(self.service.Hbase, api + '_args')(**kwargs).write(protocol)
+        protocol.write_message_end()
+        buffer.flush()
+        self.writer.write(buffer.getvalue())
+        await self.writer.drain()
+
+        protocol = BinaryProtocol(MemoryBuffer(await self.read_message()))
+        _, message_type, _ = protocol.read_message_begin()
+        if message_type == TMessageType.EXCEPTION:
+            error = TApplicationException()
+            error.read(protocol)
+            raise error
+        result = getattr(self.service.Hbase, api + '_result')()
+        result.read(protocol)
+        if result.success is not None:
+            return result.success
+        for name, value in result.__dict__.items():
+            if name != 'success' and value is not None:
+                raise value
+        raise TApplicationException(TApplicationException.MISSING_RESULT)
+
+    async def read_message(self) -> bytes:
+        """读取一条完整的响应消息（请求和响应一一对应，不会读到下一条消息）"""
+        data = bytearray()
+        scanner = MessageScanner()
+        while True:
+            try:
+                received = await asyncio.wait_for(self.reader.read(READ_SIZE), self.timeout)
+            except asyncio.TimeoutError:
+                raise socket.timeout("Thrift读取超时")
+            if not received:
+                raise TTransportException(TTransportException.END_OF_FILE, "TSocket read 0 bytes")
+            data += received
+            if scanner.feed(data) is not None:
+                return bytes(data)
+
+    def close(self):
+        self.writer.close()
+
+
+class AsyncThriftPool:
+    """
+    单个端点的异步Thrift连接池，连接在第一次借出时才建立
+
+    空闲太久的连接可能已被服务端关闭，借出时直接重建，不发探活请求。
+    """
+
+    def __init__(self, service, host: str, port: int = 9090, timeout: int = 30000, size: int = 256,
+                 idle_timeout: float = 60.0):
+        """
+        Args:
+            service: Hbase_thrift模块
+            host: Thrift服务主机
+            port: Thrift服务端口
+            timeout: 连接和读取超时（毫秒）
+            size: 连接数上限
+            idle_timeout: 连接空闲超过该秒数后借出时重建
+        """
+        self.service = service
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.size = size
+        self.idle_timeout = idle_timeout
+        # 元素为 (连接, 归还时间)，None表示尚未建立的连接槽位
+        self._idle = asyncio.LifoQueue()
+        for _ in range(size):
+            self._idle.put_nowait(None)
+        self._connections = set()
+
+    async def acquire(self) -> AsyncThriftConnection:
+        slot = await self._idle.get()
+        if slot is not None:
+            connection, released = slot
+            if time.monotonic() - released <= self.idle_timeout:
+                return connection
+            self._discard(connection)
+
+        try:
+            connection = await AsyncThriftConnection.open(self.service, self.host, self.port,
+                                                          self.timeout / 1000.0 if self.timeout else None)
+        except BaseException:
+            self._idle.put_nowait(None)
+            raise
+        self._connections.add(connection)
+        return connection
+
+    def release(self, connection: AsyncThriftConnection, broken: bool = False):
+        """归还连接，传输层出错的连接关闭后把槽位还回去"""
+        if broken:
+            self._discard(connection)
+            self._idle.put_nowait(None)
+        else:
+            self._idle.put_nowait((connection, time.monotonic()))
+
+    def _discard(self, connection: AsyncThriftConnection):
+        self._connections.discard(connection)
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def close(self):
+        for connection in list(self._connections):
+            self._discard(connection)
+
+
+class AsyncTable:
+    """单端的异步multi-get，外加限速、重试、熔断和计时"""
+
+    def __init__(self, pool: AsyncThriftPool, table_name: str, resilience: ResilientTable,
+                 limiter: Optional[RateLimiter], metric_side: str):
+        """
+        Args:
+            pool: 该端点的异步连接池
+            table_name: 表名
+            resilience: 提供重试策略和熔断器（与同步表对象共享同一个熔断器）
+            limiter: 该端点的令牌桶，None表示不限速
+            metric_side: 指标中的端标签（source/target）
+        """
+        self.pool = pool
+        self.name = table_name.encode('utf-8')
+        self.resilience = resilience
+        self.limiter = limiter if limiter and limiter.active else None
+        self.stage = STAGE_SECONDS.labels(f'{metric_side}_fetch')
+        self.calls = RPC_TOTAL.labels(metric_side, 'multi_get')
+        self.errors = RPC_ERRORS.labels(metric_side, 'multi_get')
+
+    async def _get_rows(self, rows: List[bytes], columns: Optional[List[bytes]]) -> List[Tuple[bytes, Dict]]:
+        connection = await self.pool.acquire()
+        try:
+            results = await connection.call('getRowsWithColumns', tableName=self.name, rows=rows,
+                                            columns=columns, attributes={})
+        except BaseException as e:
+            # 服务端返回的错误（IOError等）不影响连接，其他异常的连接状态不确定，直接丢弃
+            served = isinstance(e, (self.pool.service.IOError, TApplicationException))
+            self.pool.release(connection, broken=not served)
+            raise
+        self.pool.release(connection)
+        return [(r.row, {name: cell.value for name, cell in r.columns.items()}) for r in results]
+
+    async def rows(self, rows: List[bytes], columns: Optional[List[bytes]] = None) -> List[Tuple[bytes, Dict]]:
+        """
+        与happybase.Table.rows相同的返回值，重试耗尽时抛出FetchError
+
+        计数和计时与MeteredTable一致：一次调用计一次请求，耗时包含重试、熔断和限速等待，
+        重试后仍失败才计入错误数。
+        """
+        self.calls.inc()
+        started = time.perf_counter()
+        try:
+            return await self._rows_with_retry(rows, columns)
+        except Exception:
+            self.errors.inc()
+            raise
+        finally:
+            self.stage.observe(time.perf_counter() - started)
+
+    async def _rows_with_retry(self, rows: List[bytes], columns: Optional[List[bytes]]) -> List[Tuple[bytes, Dict]]:
+        breaker = self.resilience.breaker
+        attempt = 0
+        while True:
+            attempt += 1
+            # 熔断期间在事件循环中定时重新检查，不占用线程
+            wait = breaker.try_call()
+            while wait:
+                await asyncio.sleep(min(wait, BREAKER_POLL_SECONDS))
+                wait = breaker.try_call()
+            if self.limiter:
+                await self.limiter.before_request_async()
+
+            try:
+                result = await self._get_rows(rows, columns)
+            except Exception as e:
+                await asyncio.sleep(self.resilience.retry_delay(e, attempt, '批量读取'))
+                continue
+
+            breaker.record_success()
+            if self.limiter:
+                self.limiter.after_response(sum(estimate_row_bytes(key, data) for key, data in result))
+            return result
+
+
+class AsyncRowkeyEngine:
+    """在事件循环中流式验证行键，接口与HBaseDataValidator.run_rowkey_stream一致"""
+
+    def __init__(self, validator, concurrency: int = DEFAULT_ASYNC_CONCURRENCY):
+        """
+        Args:
+            validator: 已连接两端的HBaseDataValidator，计数、对比和结果记录都委托给它
+            concurrency: 在途批次数上限（原生异步客户端时也是每端的连接数）
+        """
+        self.validator = validator
+        self.concurrency = max(concurrency, 1)
+        self.logger = logging.getLogger(__name__)
+        self.service = load_hbase_service() if validator.connection_factory is None else None
+        self.source = None
+        self.target = None
+        self.executor = None
+        self.compare_executor = None
+        self.pools = []
+
+    @property
+    def native(self) -> bool:
+        """是否使用非阻塞的Thrift连接"""
+        return self.service is not None
+
+    def create_table(self, config, side: str, metric_side: str) -> AsyncTable:
+        validator = self.validator
+        endpoint = f"{config.host}:{config.port}"
+        pool = AsyncThriftPool(self.service, config.host, config.port, config.timeout, self.concurrency)
+        self.pools.append(pool)
+        resilience = ResilientTable(pool, side, validator.retry_policy, validator.breakers[endpoint],
+                                    validator.retry_callback(metric_side))
+        return AsyncTable(pool, config.table_name, resilience, validator.rate_limiters.get(endpoint), metric_side)
+
+    async def get_rows_data(self, table, rowkeys: List[str]) -> Dict[str, Dict]:
+        """异步版本的HBaseDataValidator.get_rows_data"""
+        validator = self.validator
+        if not self.native:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, validator.get_rows_data, table, rowkeys)
+
+        started = time.perf_counter()
+        try:
+            rows = await table.rows([rowkey.encode('utf-8') for rowkey in rowkeys],
+                                    columns=validator.projection.columns)
+        except Exception as e:
+            validator.record_fetch(started, error=True)
+            self.logger.warning(f"批量获取行数据失败 ({len(rowkeys)}行, 首行 {rowkeys[0]}): {e}")
+            raise
+        validator.record_fetch(started)
+        rows = ((key, validator.projection.apply(data)) for key, data in rows)
+        return {key.decode('utf-8'): data for key, data in rows if data}
+
+    async def validate_batch(self, rowkeys: List[str]) -> List[RowResult]:
+        """验证一批行键：两端的multi-get同时发出，然后整批对比"""
+        validator = self.validator
+        fetched = await asyncio.gather(self.get_rows_data(self.source, rowkeys),
+                                       self.get_rows_data(self.target, rowkeys), return_exceptions=True)
+        for outcome in fetched:
+            if isinstance(outcome, BaseException):
+                return [validator.record_error(rowkey, outcome) for rowkey in rowkeys]
+        source_rows, target_rows = fetched
+
+        pairs = [(rowkey, source_rows.get(rowkey), target_rows.get(rowkey)) for rowkey in rowkeys]
+        if validator.compare_pool:
+            submitted = validator.submit_compare(pairs)
+            try:
+                await asyncio.wrap_future(submitted[1])
+            except Exception:
+                pass  # 由collect_compare记为错误行
+            return validator.collect_compare(submitted)
+        return await asyncio.get_running_loop().run_in_executor(self.compare_executor, validator.compare_rows, pairs)
+
+    def run(self, rowkeys: Iterable[str], mode: str, total: int, progress_callback, batch_size: int,
+            start_time: float, committed_rows: int = 0, checkpoint_extra: Optional[Dict] = None):
+        """在新的事件循环中运行，返回验证器的ValidationResult"""
+        validator = self.validator
+        if self.native:
+            self.source = self.create_table(validator.source_config, '源端', 'source')
+            self.target = self.create_table(validator.target_config, '目标端', 'target')
+        else:
+            # 两端读取同时进行，每个在途批次占用两个线程
+            self.concurrency = min(self.concurrency, validator.pool_size)
+            self.executor = ThreadPoolExecutor(max_workers=self.concurrency * 2)
+            self.source = validator.source_table
+            self.target = validator.target_table
+        if not validator.compare_pool:
+            # 行摘要和逐列对比受GIL限制，一个线程即可，作用是不阻塞事件循环上的收发
+            self.compare_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='compare')
+
+        try:
+            return asyncio.run(self._run(rowkeys, mode, total, progress_callback, batch_size,
+                                         start_time, committed_rows, checkpoint_extra))
+        finally:
+            for executor in (self.executor, self.compare_executor):
+                if executor:
+                    executor.shutdown(wait=True)
+            self.executor = None
+            self.compare_executor = None
+
+    def in_flight_limit(self) -> int:
+        controller = self.validator.concurrency
+        return min(controller.limit, self.concurrency) if controller else self.concurrency
+
+    async def _run(self, rowkeys: Iterable[str], mode: str, total: int, progress_callback, batch_size: int,
+                   start_time: float, committed_rows: int, checkpoint_extra: Optional[Dict]):
+        validator = self.validator
+        loop = asyncio.get_running_loop()
+        batch_size = max(batch_size, 1)
+        rowkey_iter = iter(rowkeys)
+        batches = iter(lambda: list(itertools.islice(rowkey_iter, batch_size)), [])
+        if validator.concurrency:
+            validator.concurrency.reset()
+        self.logger.info(f"开始验证 {total or '流式'} 行数据 (批大小: {batch_size}, 异步引擎: "
+                         f"{'非阻塞Thrift连接' if self.native else '线程池读取'}, "
+                         f"在途批次上限: {self.in_flight_limit()}/{self.concurrency})")
+        max_in_flight = self.concurrency * 2
+        progress = {'committed_rows': committed_rows, 'last_rowkey': validator._resumed_state_value('last_rowkey'),
+                    **(checkpoint_extra or {})}
+        finished = False
+
+        try:
+            in_flight = {}
+            finished_batches = {}
+            exhausted = False
+            next_seq = 0
+            next_commit = 0
+            completed = 0
+            reported = 0
+
+            while True:
+                # 在途和待提交的批次未满时继续读取行键（行键源可能是同步扫描，在线程中读取）
+                room = min(max_in_flight - len(in_flight) - len(finished_batches),
+                           self.in_flight_limit() - len(in_flight))
+                if room > 0 and not exhausted:
+                    new_batches = await loop.run_in_executor(None, lambda: list(itertools.islice(batches, room)))
+                    exhausted = len(new_batches) < room
+                    for batch in new_batches:
+                        in_flight[asyncio.ensure_future(self.validate_batch(batch))] = (next_seq, batch)
+                        next_seq += 1
+
+                if not in_flight:
+                    break
+
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    seq, batch = in_flight.pop(task)
+                    try:
+                        finished_batches[seq] = (batch, task.result())
+                    except Exception as e:
+                        finished_batches[seq] = (batch, validator.record_batch_error(batch, e))
+                    completed += len(batch)
+
+                next_commit = validator.commit_batches(finished_batches, next_commit, progress)
+                validator.save_checkpoint(mode, start_time, progress)
+
+                if progress_callback and completed - reported >= 100:
+                    reported = completed
+                    progress_callback(completed, total)
+
+            if progress_callback and completed != reported:
+                progress_callback(completed, total)
+            finished = True
+        finally:
+            if not finished:
+                validator.save_checkpoint(mode, start_time, progress, force=True)
+            # 异步连接要在事件循环关闭前关闭
+            for pool in self.pools:
+                pool.close()
+            self.pools = []
+
+        validator.finish_result(start_time)
+        self.logger.info(f"验证完成，共 {completed} 行，耗时 {validator.result.validation_time:.2f} 秒")
+
+        return validator.result
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+验证吞吐基准测试
+在进程内的HBase替身（fake_hbase）上运行各验证引擎，输出每秒验证行数、每行RPC数和峰值内存，
+数据和延迟完全由参数决定，结果可重复，用于发现性能回退。每个引擎在独立的子进程中运行，
+峰值内存互不影响。
+
+示例:
+  python benchmark.py --rows 200000 --latency-ms 2 --engines rowkeys_list,all_data,merge
+  python benchmark.py --rows 200000 --output bench.json
+  python benchmark.py --rows 200000 --baseline bench.json
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from async_engine import ENGINES as EXECUTION_ENGINES
+from fake_hbase import FakeHBase, populate_pair
+from hbase_data_validator import HBaseConnection, HBaseDataValidator
+
+SOURCE_HOST = 'bench-source'
+TARGET_HOST = 'bench-target'
+TABLE_NAME = 'bench:table'
+
+
+def run_rowkeys_list(validator: HBaseDataValidator, settings: Dict):
+    rowkeys = ('row%010d' % i for i in range(settings['rows']))
+    return validator.validate_by_rowkeys_list(rowkeys, settings['max_workers'], None, settings['batch_size'])
+
+
+def run_all_data(validator: HBaseDataValidator, settings: Dict):
+    return validator.validate_all_data(max_workers=settings['max_workers'], batch_size=settings['batch_size'])
+
+
+def run_merge(validator: HBaseDataValidator, settings: Dict):
+    return validator.validate_by_merge_scan(max_workers=settings['max_workers'])
+
+
+def run_merkle(validator: HBaseDataValidator, settings: Dict):
+    return validator.validate_by_merkle(max_workers=settings['max_workers'], leaf_rows=settings['leaf_rows'])
+
+
+def run_count(validator: HBaseDataValidator, settings: Dict):
+    return validator.validate_by_count(max_workers=settings['max_workers'])
+
+
+def run_sample(validator: HBaseDataValidator, settings: Dict):
+    return validator.validate_by_sampling(settings['sample_size'], settings['max_workers'],
+                                          batch_size=settings['batch_size'], seed=settings['seed'])
+
+
+# 引擎名 -> 运行函数
+ENGINES = {
+    'rowkeys_list': run_rowkeys_list,
+    'all_data': run_all_data,
+    'merge': run_merge,
+    'merkle': run_merkle,
+    'count': run_count,
+    'sample': run_sample,
+}
+
+
+def peak_rss_mb() -> Optional[float]:
+    """当前进程的峰值常驻内存（MB），不支持的平台返回None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux以KB为单位，macOS以字节为单位
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_engine(engine: str, settings: Dict) -> Dict:
+    """生成数据并运行一个引擎，返回测量结果（在子进程中执行）"""
+    logging.basicConfig(level=logging.WARNING)
+
+    backend = FakeHBase(latency=settings['latency_ms'] / 1000.0)
+    populate_pair(backend, SOURCE_HOST, TARGET_HOST, TABLE_NAME, settings['rows'], settings['columns'],
+                  settings['value_size'], settings['mismatch_ratio'], settings['missing_ratio'],
+                  settings['regions'], settings['seed'])
+    dataset_rss = peak_rss_mb()
+
+    validator = HBaseDataValidator(
+        HBaseConnection(SOURCE_HOST, table_name=TABLE_NAME),
+        HBaseConnection(TARGET_HOST, table_name=TABLE_NAME),
+        pool_size=settings['max_workers'],
+        digest=settings['digest'],
+        scan_batch_size=settings['scan_batch_size'] or None,
+        max_concurrency=settings['max_concurrency'] or None,
+        connection_factory=backend.connect,
+        engine=settings['execution_engine']
+    )
+    if not validator.connect_source() or not validator.connect_target():
+        raise RuntimeError("连接HBase替身失败")
+
+    try:
+        backend.reset_calls()
+        started = time.perf_counter()
+        result = ENGINES[engine](validator, settings)
+        elapsed = time.perf_counter() - started
+    finally:
+        validator.disconnect()
+
+    rows = result.total_rows
+    return {
+        'engine': engine,
+        'rows': rows,
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(rows / elapsed, 1) if elapsed else 0.0,
+        'rpcs': backend.data_rpcs,
+        'rpcs_per_row': round(backend.data_rpcs / rows, 4) if rows else 0.0,
+        'calls': dict(backend.calls),
+        'matched_rows': result.matched_rows,
+        'problem_rows': rows - result.matched_rows,
+        'dataset_rss_mb': round(dataset_rss, 1) if dataset_rss is not None else None,
+        'peak_rss_mb': round(peak_rss_mb(), 1) if dataset_rss is not None else None,
+    }
+
+
+def run_benchmarks(engines: List[str], settings: Dict) -> List[Dict]:
+    """依次在独立子进程中运行各引擎"""
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for engine in engines:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            results.append(executor.submit(run_engine, engine, settings).result())
+    return results
+
+
+def display_results(results: List[Dict], baseline: Optional[Dict[str, Dict]] = None):
+    """打印结果表格；给出基线时附上每秒行数的变化"""
+    header = f"{'引擎':<14}{'行数':>10}{'耗时(秒)':>10}{'行/秒':>12}{'RPC/行':>10}{'数据RSS(MB)':>13}{'峰值RSS(MB)':>13}"
+    if baseline:
+        header += f"{'对比基线':>10}"
+    print(header)
+    print('-' * 90)
+    for entry in results:
+        line = (f"{entry['engine']:<14}{entry['rows']:>10,}{entry['seconds']:>10.2f}"
+                f"{entry['rows_per_second']:>12,.0f}{entry['rpcs_per_row']:>10.4f}"
+                f"{entry['dataset_rss_mb'] or 0:>13.1f}{entry['peak_rss_mb'] or 0:>13.1f}")
+        previous = (baseline or {}).get(entry['engine'])
+        if previous and previous.get('rows_per_second'):
+            change = entry['rows_per_second'] / previous['rows_per_second'] - 1
+            line += f"{change:>+10.1%}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="HBase数据验证吞吐基准测试（进程内HBase替身）",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split('示例:')[1]
+    )
+    parser.add_argument("--engines", default=','.join(ENGINES),
+                       help=f"要运行的引擎，逗号分隔 (可选: {', '.join(ENGINES)}，默认全部)")
+    parser.add_argument("--rows", type=int, default=100000, help="源端行数 (默认: 100000)")
+    parser.add_argument("--columns", type=int, default=10, help="每行列数 (默认: 10)")
+    parser.add_argument("--value-size", type=int, default=32, help="每个值的字节数 (默认: 32)")
+    parser.add_argument("--mismatch-ratio", type=float, default=0.001, help="目标端数据不一致的行比例 (默认: 0.001)")
+    parser.add_argument("--missing-ratio", type=float, default=0.001, help="目标端缺失的行比例 (默认: 0.001)")
+    parser.add_argument("--regions", type=int, default=8, help="region数 (默认: 8)")
+    parser.add_argument("--latency-ms", type=float, default=1.0, help="每次RPC注入的延迟毫秒数 (默认: 1)")
+    parser.add_argument("--max-workers", type=int, default=10, help="并发线程数 (默认: 10)")
+    parser.add_argument("--max-concurrency", type=int, default=0, help="自适应并发上限，0表示固定并发 (默认: 0)")
+    parser.add_argument("--batch-size", type=int, default=100, help="每批multi-get的行数 (默认: 100)")
+    parser.add_argument("--scan-batch-size", type=int, default=0, help="扫描批大小，0表示自适应 (默认: 0)")
+    parser.add_argument("--leaf-rows", type=int, default=1000, help="merkle叶子行数 (默认: 1000)")
+    parser.add_argument("--sample-size", type=int, default=10000, help="sample引擎的抽样行数 (默认: 10000)")
+    parser.add_argument("--digest", default='auto', help="行摘要算法 (默认: auto)")
+    parser.add_argument("--execution-engine", default='thread', choices=EXECUTION_ENGINES,
+                       help="按行键验证的执行引擎（HBase替身上asyncio通过线程池读取） (默认: thread)")
+    parser.add_argument("--seed", type=int, default=0, help="数据随机种子 (默认: 0)")
+    parser.add_argument("--output", "-o", help="结果JSON文件")
+    parser.add_argument("--baseline", help="之前保存的结果JSON，用于对比每秒行数")
+    args = parser.parse_args()
+
+    engines = [name.strip() for name in args.engines.split(',') if name.strip()]
+    unknown = [name for name in engines if name not in ENGINES]
+    if unknown:
+        parser.error(f"未知的引擎: {', '.join(unknown)}")
+
+    settings = {key: getattr(args, key) for key in (
+        'rows', 'columns', 'value_size', 'mismatch_ratio', 'missing_ratio', 'regions', 'latency_ms',
+        'max_workers', 'max_concurrency', 'batch_size', 'scan_batch_size', 'leaf_rows', 'sample_size',
+        'digest', 'execution_engine', 'seed')}
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = {entry['engine']: entry for entry in json.load(f)['results']}
+
+    print(f"📊 基准测试: {args.rows:,} 行 × {args.columns} 列 × {args.value_size} 字节，"
+          f"RPC延迟 {args.latency_ms}ms，{args.regions} 个region，并发 {args.max_workers}")
+    results = run_benchmarks(engines, settings)
+    display_results(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'settings': settings, 'results': results,
+                       'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')}, f, ensure_ascii=False, indent=2)
+        print(f"📄 结果已保存: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
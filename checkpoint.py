@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+验证断点
+长时间运行的验证定期把已提交的进度（已完成的行键区间或最后提交的行键、
+对应的计数器、溢出文件偏移）写入本地状态文件，中断后可从断点继续，
+已验证过的行不再重新读取。
+"""
+
+import json
+import logging
+import os
+import time
+from typing import Dict, Iterable, Optional
+
+from result_store import RowResult, RowStatus
+
+# 行验证状态与ValidationResult计数字段的对应关系
+STATUS_COUNTERS = {
+    RowStatus.MATCHED: 'matched_rows',
+    RowStatus.MISSING_IN_TARGET: 'missing_in_target',
+    RowStatus.MISSING_IN_SOURCE: 'missing_in_source',
+    RowStatus.DATA_MISMATCH: 'data_mismatch',
+    RowStatus.ERROR: 'error_rows',
+    RowStatus.FETCH_FAILED: 'fetch_failed',
+}
+
+COUNTER_FIELDS = ['total_rows'] + list(STATUS_COUNTERS.values())
+
+
+def empty_counters() -> Dict[str, int]:
+    """全零计数器"""
+    return {field: 0 for field in COUNTER_FIELDS}
+
+
+def count_results(results: Iterable[RowResult], counters: Dict[str, int]):
+    """把一组行验证结论累加到计数器"""
+    for result in results:
+        counters['total_rows'] += 1
+        field = STATUS_COUNTERS.get(result.status)
+        if field:
+            counters[field] += 1
+
+
+def encode_key(key: bytes) -> str:
+    """行键编码为十六进制字符串，便于写入JSON"""
+    return key.hex()
+
+
+def decode_key(value: str) -> bytes:
+    """十六进制字符串还原为行键"""
+    return bytes.fromhex(value)
+
+
+class CheckpointManager:
+    """断点状态文件管理"""
+
+    VERSION = 1
+
+    def __init__(self, path: str, interval: float = 60.0):
+        """
+        初始化断点管理器
+
+        Args:
+            path: 状态文件路径
+            interval: 两次写入之间的最小间隔（秒）
+        """
+        self.path = path
+        self.interval = interval
+        self.logger = logging.getLogger(__name__)
+        self._last_saved = time.time()
+
+    def load(self, mode: str, source_table: str, target_table: str) -> Optional[Dict]:
+        """读取断点，模式或表名不一致时视为没有断点"""
+        if not os.path.exists(self.path):
+            return None
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except Exception as e:
+            self.logger.warning(f"读取断点文件失败，从头开始验证: {e}")
+            return None
+
+        expected = (self.VERSION, mode, source_table, target_table)
+        actual = (state.get('version'), state.get('mode'), state.get('source_table'), state.get('target_table'))
+        if actual != expected:
+            self.logger.warning(f"断点与本次验证不匹配 ({actual[1:]} != {expected[1:]})，从头开始验证")
+            return None
+
+        return state
+
+    def save(self, state: Dict):
+        """原子写入断点（先写临时文件再替换），所在目录不存在时创建"""
+        state = dict(state, version=self.VERSION, updated_at=time.strftime('%Y-%m-%d %H:%M:%S'))
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._last_saved = time.time()
+
+    def due(self) -> bool:
+        """距上次写入是否已超过间隔"""
+        return time.time() - self._last_saved >= self.interval
+
+    def clear(self):
+        """验证完成后删除断点"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
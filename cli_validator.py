@@ -7,12 +7,19 @@ HBase数据迁移验证系统 - 命令行版本
 
 import argparse
 import json
+import os
 import sys
 import time
-from typing import List
+from typing import Iterator, List, Optional
 
 from hbase_data_validator import HBaseDataValidator, HBaseConnection
+from async_engine import ENGINES
+from multi_table import MultiTableValidator, parse_table_mapping
+from metrics import start_metrics_server
+from profiler import SamplingProfiler
 from config_manager import ConfigManager
+from row_digest import DIGEST_ALGORITHMS
+from watermark import WatermarkStore
 
 
 class ProgressBar:
@@ -23,14 +30,20 @@ class ProgressBar:
         self.width = width
         self.current = 0
     
-    def update(self, current: int):
-        """更新进度"""
+    def update(self, current: int, workers: Optional[int] = None):
+        """更新进度，workers为当前并发数（自适应并发时显示）"""
         self.current = current
-        percent = current / self.total if self.total > 0 else 0
+        suffix = f' 并发 {workers:<3}' if workers else ''
+        if self.total <= 0:
+            # 总数未知（流式扫描）时只显示已完成数
+            print(f'\r验证进度: 已验证 {current:,} 行{suffix}', end='', flush=True)
+            return
+        
+        percent = min(current / self.total, 1.0)
         filled = int(self.width * percent)
         bar = '█' * filled + '░' * (self.width - filled)
         
-        print(f'\r验证进度: |{bar}| {percent:.1%} ({current}/{self.total})', end='', flush=True)
+        print(f'\r验证进度: |{bar}| {percent:.1%} ({current}/{self.total}){suffix}', end='', flush=True)
     
     def finish(self):
         """完成进度条"""
@@ -49,10 +62,44 @@ class CLIValidator:
         """进度回调"""
         if self.progress_bar is None:
             self.progress_bar = ProgressBar(total)
-        self.progress_bar.update(completed)
+        concurrency = self.validator.concurrency if self.validator else None
+        self.progress_bar.update(completed, concurrency.limit if concurrency else None)
     
-    def create_validator_from_config(self) -> HBaseDataValidator:
-        """从配置创建验证器"""
+    def validator_options(self, args) -> dict:
+        """验证器的公共参数（连接池、结果明细、溢出文件和断点）"""
+        report_config = self.config_manager.get_report_config()
+        validation_config = self.config_manager.get_validation_config()
+        output_dir = report_config.get('output_dir', './reports')
+        return {
+            'pool_size': args.max_workers,
+            'include_details': report_config.get('include_details', True),
+            'max_detail_records': report_config.get('max_detail_records', 1000),
+            'spill_dir': output_dir,
+            'digest': args.digest or validation_config.digest,
+            'compare_processes': (args.compare_processes if args.compare_processes is not None
+                                  else validation_config.compare_processes),
+            'engine': args.engine or validation_config.engine,
+            'async_concurrency': args.async_concurrency or validation_config.async_concurrency,
+            'checkpoint_file': args.checkpoint_file or os.path.join(output_dir, 'hbase_validation_checkpoint.json'),
+            'checkpoint_interval': args.checkpoint_interval,
+            'include_columns': args.include_columns or validation_config.include_columns,
+            'exclude_columns': args.exclude_columns or validation_config.exclude_columns,
+            'scan_batch_size': (args.scan_batch_size if args.scan_batch_size is not None
+                                else validation_config.scan_batch_size) or None,
+            'scan_memory_mb': validation_config.scan_memory_mb,
+            'max_concurrency': (args.max_concurrency if args.max_concurrency is not None
+                                else validation_config.max_concurrency) or None,
+            'max_retries': validation_config.max_retries,
+            'circuit_reset_seconds': validation_config.circuit_reset_seconds
+        }
+    
+    @staticmethod
+    def rate_limit(arg_value, side_config: dict, key: str) -> float:
+        """限速参数：命令行优先，其次配置文件，0表示不限制"""
+        return arg_value if arg_value is not None else side_config.get(key, 0)
+    
+    def connections_from_config(self, args):
+        """从配置创建两端连接配置"""
         source_config = self.config_manager.get_source_config()
         target_config = self.config_manager.get_target_config()
         
@@ -60,35 +107,62 @@ class CLIValidator:
             host=source_config.get('host', 'localhost'),
             port=source_config.get('port', 9090),
             table_name=source_config.get('table_name', ''),
-            timeout=source_config.get('timeout', 30000)
+            timeout=source_config.get('timeout', 30000),
+            max_requests_per_second=self.rate_limit(args.source_max_rps, source_config, 'max_requests_per_second'),
+            max_bytes_per_second=self.rate_limit(args.source_max_bytes, source_config, 'max_bytes_per_second')
         )
         
         target_conn = HBaseConnection(
             host=target_config.get('host', 'localhost'),
             port=target_config.get('port', 9090),
             table_name=target_config.get('table_name', ''),
-            timeout=target_config.get('timeout', 30000)
+            timeout=target_config.get('timeout', 30000),
+            max_requests_per_second=self.rate_limit(args.target_max_rps, target_config, 'max_requests_per_second'),
+            max_bytes_per_second=self.rate_limit(args.target_max_bytes, target_config, 'max_bytes_per_second')
         )
         
-        return HBaseDataValidator(source_conn, target_conn)
+        return source_conn, target_conn
     
-    def create_validator_from_args(self, args) -> HBaseDataValidator:
-        """从命令行参数创建验证器"""
+    def connections_from_args(self, args):
+        """从命令行参数创建两端连接配置"""
         source_conn = HBaseConnection(
             host=args.source_host,
             port=args.source_port,
             table_name=args.source_table,
-            timeout=30000
+            timeout=30000,
+            max_requests_per_second=args.source_max_rps or 0,
+            max_bytes_per_second=args.source_max_bytes or 0
         )
         
         target_conn = HBaseConnection(
             host=args.target_host,
             port=args.target_port,
             table_name=args.target_table,
-            timeout=30000
+            timeout=30000,
+            max_requests_per_second=args.target_max_rps or 0,
+            max_bytes_per_second=args.target_max_bytes or 0
         )
         
-        return HBaseDataValidator(source_conn, target_conn)
+        return source_conn, target_conn
+    
+    def create_validator_from_config(self, args) -> HBaseDataValidator:
+        """从配置创建验证器"""
+        return HBaseDataValidator(*self.connections_from_config(args), **self.validator_options(args))
+    
+    def create_validator_from_args(self, args) -> HBaseDataValidator:
+        """从命令行参数创建验证器"""
+        return HBaseDataValidator(*self.connections_from_args(args), **self.validator_options(args))
+    
+    def multi_table_settings(self, args):
+        """多表验证的表名模式、映射和同时验证表数：命令行优先，其次配置文件"""
+        multi_config = self.config_manager.get_multi_table_config() if args.use_config else {}
+        if args.tables:
+            tables = [name.strip() for name in args.tables.split(',') if name.strip()]
+        else:
+            tables = multi_config.get('tables') or []
+        table_mapping = parse_table_mapping(args.table_map or multi_config.get('table_mapping'))
+        parallel_tables = args.parallel_tables or multi_config.get('parallel_tables', 4)
+        return tables, table_mapping, parallel_tables
     
     def test_connections(self, validator: HBaseDataValidator) -> bool:
         """测试连接"""
@@ -113,26 +187,35 @@ class CLIValidator:
         print("✅ 连接测试通过")
         return True
     
-    def load_rowkeys_from_file(self, filename: str) -> List[str]:
-        """从文件加载行键"""
+    def iter_rowkeys_from_file(self, filename: str) -> Iterator[str]:
+        """从文件流式读取行键，不一次性载入内存"""
+        with open(filename, 'r', encoding='utf-8') as f:
+            for line in f:
+                rowkey = line.strip()
+                if rowkey:
+                    yield rowkey
+    
+    def load_split_points_from_file(self, filename: str) -> List[bytes]:
+        """从文件加载区间切分点（每行一个行键）"""
         try:
             with open(filename, 'r', encoding='utf-8') as f:
-                rowkeys = [line.strip() for line in f if line.strip()]
-            print(f"📄 从文件加载了 {len(rowkeys)} 个行键")
-            return rowkeys
+                split_points = [line.strip().encode('utf-8') for line in f if line.strip()]
+            print(f"📄 从文件加载了 {len(split_points)} 个切分点")
+            return split_points
         except Exception as e:
-            print(f"❌ 加载行键文件失败: {e}")
+            print(f"❌ 加载切分点文件失败: {e}")
             return []
     
     def validate_data(self, args):
         """执行数据验证"""
         # 创建验证器
         if args.use_config:
-            validator = self.create_validator_from_config()
+            validator = self.create_validator_from_config(args)
         else:
             validator = self.create_validator_from_args(args)
         
         self.validator = validator
+        batch_size = args.batch_size or self.config_manager.get_validation_config().batch_size
         
         # 测试连接
         if not self.test_connections(validator):
@@ -143,26 +226,80 @@ class CLIValidator:
         print(f"  - 源端: {validator.source_config.host}:{validator.source_config.port}")
         print(f"  - 目标端: {validator.target_config.host}:{validator.target_config.port}")
         print(f"  - 表名: {validator.source_config.table_name}")
+        print(f"  - 验证模式: {args.mode}")
         print(f"  - 最大行数: {args.max_rows or '不限制'}")
-        print(f"  - 并发数: {args.max_workers}")
+        if validator.concurrency:
+            print(f"  - 并发数: 自适应 (初始 {args.max_workers}，上限 {validator.concurrency.max_limit})")
+        else:
+            print(f"  - 并发数: {args.max_workers}")
+        if args.resume:
+            print(f"  - 断点续验: {validator.checkpoint.path}")
+        print(f"  - 批大小: {batch_size}")
+        print(f"  - 扫描批大小: {validator.scan_tuner.fixed_batch_size or '自适应'}")
+        print(f"  - 行摘要: {validator.row_digest.algorithm}")
+        if validator.projection.active:
+            columns = validator.projection.describe()
+            print(f"  - 列投影: 包含 {columns['include'] or '全部'}，排除 {columns['exclude'] or '无'}")
         print("-" * 50)
         
         start_time = time.time()
         
         try:
             if args.rowkeys_file:
-                # 使用行键文件验证
-                rowkeys = self.load_rowkeys_from_file(args.rowkeys_file)
-                if not rowkeys:
+                # 使用行键文件验证（流式读取）
+                if not os.path.isfile(args.rowkeys_file):
+                    print(f"❌ 行键文件不存在: {args.rowkeys_file}")
                     return False
                 
+                print(f"📄 从文件流式读取行键: {args.rowkeys_file}")
+                rowkeys = self.iter_rowkeys_from_file(args.rowkeys_file)
+                rowkeys_source = {'path': os.path.abspath(args.rowkeys_file),
+                                  'size': os.path.getsize(args.rowkeys_file)}
                 result = validator.validate_by_rowkeys_list(
-                    rowkeys, args.max_workers, self.progress_callback
+                    rowkeys, args.max_workers, self.progress_callback, batch_size, args.resume, rowkeys_source
+                )
+            elif args.mode == 'merge':
+                # 双端有序扫描归并验证
+                split_points = self.load_split_points_from_file(args.split_points_file) if args.split_points_file else None
+                result = validator.validate_by_merge_scan(
+                    args.max_rows, self.progress_callback, args.max_workers, split_points, args.resume
+                )
+            elif args.mode == 'incremental':
+                # 增量验证：只验证上次成功验证之后有写入的行
+                incremental_config = self.config_manager.get_incremental_config()
+                watermark_store = WatermarkStore(
+                    incremental_config.get('state_file', './reports/hbase_incremental_state.json')
+                )
+                lag_seconds = args.lag_seconds if args.lag_seconds is not None else incremental_config.get('lag_seconds', 60)
+                result = validator.validate_incremental(
+                    watermark_store, lag_seconds, args.since_ms, args.max_workers,
+                    self.progress_callback, batch_size, args.resume
+                )
+            elif args.mode == 'sample':
+                # 分层随机抽样验证
+                split_points = self.load_split_points_from_file(args.split_points_file) if args.split_points_file else None
+                result = validator.validate_by_sampling(
+                    args.sample_size, args.max_workers, self.progress_callback, batch_size,
+                    seed=args.sample_seed, split_points=split_points
+                )
+            elif args.mode == 'count':
+                # 按区间核对两端行数
+                split_points = self.load_split_points_from_file(args.split_points_file) if args.split_points_file else None
+                result = validator.validate_by_count(self.progress_callback, args.max_workers, split_points)
+            elif args.mode == 'merkle':
+                # 叶子区间摘要验证
+                split_points = self.load_split_points_from_file(args.split_points_file) if args.split_points_file else None
+                result = validator.validate_by_merkle(
+                    self.progress_callback, args.max_workers, split_points, args.leaf_rows,
+                    resume=args.resume
                 )
             else:
                 # 全量验证
+                sample_rate = args.sample_rate if args.sample_rate is not None else \
+                    self.config_manager.get_validation_config().sample_rate
                 result = validator.validate_all_data(
-                    args.max_rows, args.max_workers, self.progress_callback
+                    args.max_rows, args.max_workers, self.progress_callback, batch_size, args.resume,
+                    sample_rate, args.sample_seed
                 )
             
             if self.progress_bar:
@@ -179,6 +316,90 @@ class CLIValidator:
             
             return True
             
+        except KeyboardInterrupt:
+            print("\n⏹️ 用户中断验证")
+            if validator.checkpoint:
+                print(f"💾 进度已保存到断点文件: {validator.checkpoint.path}，使用 --resume 继续")
+            return False
+        except Exception as e:
+            print(f"\n❌ 验证失败: {e}")
+            return False
+        finally:
+            validator.disconnect()
+    
+    def multi_table_mode_kwargs(self, args, batch_size: int) -> dict:
+        """多表验证时传给各表验证方法的参数（区间切分点按表各自的region边界）"""
+        if args.mode == 'merge':
+            return {'max_rows': args.max_rows, 'resume': args.resume}
+        if args.mode == 'merkle':
+            return {'leaf_rows': args.leaf_rows, 'resume': args.resume}
+        if args.mode == 'count':
+            return {}
+        if args.mode == 'sample':
+            return {'sample_size': args.sample_size, 'batch_size': batch_size, 'seed': args.sample_seed}
+        if args.mode == 'incremental':
+            incremental_config = self.config_manager.get_incremental_config()
+            lag_seconds = args.lag_seconds if args.lag_seconds is not None else incremental_config.get('lag_seconds', 60)
+            return {
+                'watermark_store': WatermarkStore(
+                    incremental_config.get('state_file', './reports/hbase_incremental_state.json')
+                ),
+                'lag_seconds': lag_seconds, 'since_ms': args.since_ms,
+                'batch_size': batch_size, 'resume': args.resume
+            }
+        sample_rate = args.sample_rate if args.sample_rate is not None else \
+            self.config_manager.get_validation_config().sample_rate
+        return {'max_rows': args.max_rows, 'batch_size': batch_size, 'resume': args.resume,
+                'sample_rate': sample_rate, 'seed': args.sample_seed}
+    
+    def validate_tables(self, args, tables: List[str], table_mapping: dict, parallel_tables: int):
+        """多表验证：所有表共享max_workers个连接的全局并发预算，汇总为一份报告"""
+        if args.rowkeys_file:
+            print("❌ 多表验证不支持 --rowkeys-file")
+            return False
+        
+        if args.use_config:
+            source_conn, target_conn = self.connections_from_config(args)
+        else:
+            source_conn, target_conn = self.connections_from_args(args)
+        batch_size = args.batch_size or self.config_manager.get_validation_config().batch_size
+        
+        validator = MultiTableValidator(
+            source_conn, target_conn, tables, table_mapping,
+            budget=args.max_workers, parallel_tables=parallel_tables,
+            validator_options=self.validator_options(args)
+        )
+        
+        print("🔗 连接两端HBase...")
+        if not validator.connect():
+            print("❌ 连接失败")
+            return False
+        
+        print("\n🚀 开始多表验证")
+        print("📊 配置信息:")
+        print(f"  - 源端: {source_conn.host}:{source_conn.port}")
+        print(f"  - 目标端: {target_conn.host}:{target_conn.port}")
+        print(f"  - 表: {', '.join(tables)}")
+        if table_mapping:
+            print(f"  - 表名映射: {', '.join(f'{k} -> {v}' for k, v in table_mapping.items())}")
+        print(f"  - 验证模式: {args.mode}")
+        print(f"  - 全局并发预算: {args.max_workers}")
+        print(f"  - 同时验证表数: {parallel_tables}")
+        print("-" * 50)
+        
+        try:
+            jobs = validator.run(args.mode, self.progress_callback,
+                                 **self.multi_table_mode_kwargs(args, batch_size))
+            if self.progress_bar:
+                self.progress_bar.finish()
+            
+            self.display_multi_table_results(validator.summary(), jobs)
+            
+            report_file = validator.save_report(args.output)
+            if report_file:
+                print(f"📄 多表验证报告已保存: {report_file}")
+            return True
+        
         except KeyboardInterrupt:
             print("\n⏹️ 用户中断验证")
             return False
@@ -188,6 +409,55 @@ class CLIValidator:
         finally:
             validator.disconnect()
     
+    def save_profile(self, profiler: SamplingProfiler, args):
+        """保存剖析结果（与报告同名前缀，未指定报告文件时写入报告目录）并打印热点汇总"""
+        if args.output:
+            path_prefix = os.path.splitext(args.output)[0]
+        else:
+            output_dir = self.config_manager.get_report_config().get('output_dir', './reports')
+            path_prefix = os.path.join(output_dir, f"hbase_validation_profile_{int(time.time())}")
+        
+        print("\n" + "=" * 50)
+        print("🔬 性能剖析")
+        print("=" * 50)
+        print(profiler.format_summary())
+        try:
+            collapsed_file, summary_file = profiler.save(path_prefix)
+            print(f"📄 折叠栈: {collapsed_file}")
+            print(f"📄 剖析汇总: {summary_file}")
+        except Exception as e:
+            print(f"❌ 保存剖析结果失败: {e}")
+    
+    def display_multi_table_results(self, summary: dict, jobs):
+        """显示多表验证结果"""
+        print("\n" + "=" * 50)
+        print("📊 多表验证结果汇总")
+        print("=" * 50)
+        
+        for job in jobs:
+            if job.result:
+                result = job.result
+                print(f"{'✅' if result.success_rate == 100.0 else '⚠️'} {job.source_table}"
+                      f"{f' -> {job.target_table}' if job.target_table != job.source_table else ''}: "
+                      f"{result.matched_rows:,}/{result.total_rows:,} 行一致 ({result.success_rate:.2f}%)，"
+                      f"耗时 {result.validation_time:.2f}秒")
+            else:
+                print(f"❌ {job.source_table}: {job.error}")
+        
+        print("-" * 50)
+        print(f"表数:       {summary['tables']} (失败 {summary['failed_tables']}，"
+              f"不一致 {summary['inconsistent_tables']})")
+        print(f"总行数:     {summary['total_rows']:,}")
+        print(f"匹配行数:   {summary['matched_rows']:,}")
+        print(f"目标端缺失: {summary['missing_in_target']:,}")
+        print(f"源端缺失:   {summary['missing_in_source']:,}")
+        print(f"数据不一致: {summary['data_mismatch']:,}")
+        print(f"错误行数:   {summary['error_rows']:,}")
+        print(f"读取失败:   {summary['fetch_failed']:,}")
+        print(f"成功率:     {summary['success_rate']}")
+        print(f"耗时:       {summary['validation_time']}")
+        print("=" * 50)
+    
     def display_results(self, result):
         """显示验证结果"""
         print("\n" + "=" * 50)
@@ -200,8 +470,20 @@ class CLIValidator:
         print(f"源端缺失:   {result.missing_in_source:,}")
         print(f"数据不一致: {result.data_mismatch:,}")
         print(f"错误行数:   {result.error_rows:,}")
+        print(f"读取失败:   {result.fetch_failed:,}")
         print(f"成功率:     {result.success_rate:.2f}%")
         print(f"耗时:       {result.validation_time:.2f}秒")
+        if result.spill_file and result.spilled_rows:
+            print(f"不一致明细: {result.spill_file} ({result.spilled_rows:,}行)")
+        
+        estimate = result.mode_info
+        if estimate.get('count_only'):
+            self.display_range_counts(estimate)
+        if 'mismatch_rate' in estimate:
+            print(f"抽样估计:   不一致率 {estimate['mismatch_rate']:.4%}，"
+                  f"{estimate['confidence']:.0%}置信区间 "
+                  f"[{estimate['mismatch_rate_low']:.4%}, {estimate['mismatch_rate_high']:.4%}]"
+                  f"（有效样本 {estimate.get('effective_sample_rows', estimate['sample_rows']):,.0f} 行）")
         
         # 状态图标
         if result.success_rate == 100.0:
@@ -214,6 +496,20 @@ class CLIValidator:
             print(f"\n❌ 数据差异较大 ({result.success_rate:.1f}%)")
         
         print("=" * 50)
+    
+    def display_range_counts(self, counts: dict, max_ranges: int = 20):
+        """显示行数核对结果（只列出行数不一致的区间）"""
+        print(f"源端行数:   {counts['source_rows']:,}")
+        print(f"目标端行数: {counts['target_rows']:,}")
+        print(f"行数不一致的区间: {counts['differing_ranges']} / {len(counts['range_counts'])}")
+        
+        differing = [entry for entry in counts['range_counts'] if entry['delta'] != 0]
+        for entry in differing[:max_ranges]:
+            delta = '计数失败' if entry['delta'] is None else f"{entry['delta']:+,}"
+            print(f"  [{entry['row_start'] or '表头'}, {entry['row_stop'] or '表尾'}) "
+                  f"源端 {entry['source_rows']} / 目标端 {entry['target_rows']} ({delta})")
+        if len(differing) > max_ranges:
+            print(f"  ... 其余 {len(differing) - max_ranges} 个区间见报告mode_info.range_counts")
 
 
 def main():
@@ -234,6 +530,28 @@ def main():
   # 使用行键文件验证
   python cli_validator.py --use-config --rowkeys-file rowkeys.txt
   
+  # 双端有序扫描归并验证（可发现两个方向的缺失行），按region区间并行
+  python cli_validator.py --use-config --mode merge --max-workers 20
+  
+  # 两端几乎一致时，用叶子区间摘要只对有差异的叶子逐行对比
+  python cli_validator.py --use-config --mode merkle --leaf-rows 1000
+  
+  # 每晚增量验证：只验证上次成功验证之后有写入的行
+  python cli_validator.py --use-config --mode incremental
+  
+  # 分层随机抽样1万行，给出不一致率的置信区间
+  python cli_validator.py --use-config --mode sample --sample-size 10000
+  
+  # 先按区间核对两端行数，找出需要深度验证的区间
+  python cli_validator.py --use-config --mode count
+  
+  # 验证整个命名空间，目标端命名空间改名，所有表共享32个并发
+  python cli_validator.py --use-config --mode merge --tables 'ns_old:*' \\
+    --table-map 'ns_old:*=ns_new:*' --max-workers 32
+  
+  # 中断后从断点继续
+  python cli_validator.py --use-config --mode merge --resume
+  
   # 限制验证行数和并发
   python cli_validator.py --use-config --max-rows 1000 --max-workers 5
         """
@@ -257,33 +575,121 @@ def main():
     parser.add_argument("--target-table",
                        help="目标端表名")
     
+    # 限速配置
+    parser.add_argument("--source-max-rps", type=float,
+                       help="源端每秒最多RPC数，0表示不限制 (默认: 配置文件source.max_requests_per_second)")
+    parser.add_argument("--source-max-bytes", type=float,
+                       help="源端每秒最多读取字节数，0表示不限制 (默认: 配置文件source.max_bytes_per_second)")
+    parser.add_argument("--target-max-rps", type=float,
+                       help="目标端每秒最多RPC数，0表示不限制 (默认: 配置文件target.max_requests_per_second)")
+    parser.add_argument("--target-max-bytes", type=float,
+                       help="目标端每秒最多读取字节数，0表示不限制 (默认: 配置文件target.max_bytes_per_second)")
+    
+    # 多表配置
+    parser.add_argument("--tables",
+                       help="多表验证的源端表名或通配模式，逗号分隔，如 ns1:*,ns2:orders (默认: 配置文件multi_table.tables)")
+    parser.add_argument("--table-map",
+                       help="源端到目标端的表名映射，逗号分隔，支持通配，如 ns1:*=ns2:*,a=b (默认: 配置文件multi_table.table_mapping)")
+    parser.add_argument("--parallel-tables", type=int,
+                       help="多表验证时同时验证的表数 (默认: 配置文件multi_table.parallel_tables)")
+    
     # 验证配置
+    parser.add_argument("--mode", choices=["rowkey", "merge", "merkle", "incremental", "sample", "count"],
+                       default="rowkey",
+                       help="验证模式: rowkey=按源端行键点查, merge=双端有序扫描归并, "
+                            "merkle=叶子区间摘要对比, incremental=只验证上次之后变更的行, "
+                            "sample=按region分层随机抽样, count=按区间核对两端行数 (默认: rowkey)")
+    parser.add_argument("--sample-size", type=int, default=10000,
+                       help="sample模式的目标抽样行数 (默认: 10000)")
+    parser.add_argument("--sample-rate", type=float,
+                       help="rowkey模式的均匀抽样比例 (默认: 配置文件validation.sample_rate)")
+    parser.add_argument("--sample-seed", type=int,
+                       help="抽样随机种子，指定后抽样结果可复现")
+    parser.add_argument("--since-ms", type=int,
+                       help="incremental模式的时间窗口下界（毫秒时间戳），默认取上次成功验证的水位")
+    parser.add_argument("--lag-seconds", type=float,
+                       help="incremental模式窗口上界距当前时间的秒数 (默认: 配置文件incremental.lag_seconds)")
+    parser.add_argument("--leaf-rows", type=int, default=1000,
+                       help="merkle模式每个叶子区间的行数 (默认: 1000)")
     parser.add_argument("--max-rows", type=int,
                        help="最大验证行数 (默认: 不限制)")
     parser.add_argument("--max-workers", type=int, default=10,
-                       help="并发线程数 (默认: 10)")
+                       help="并发线程数，自适应并发时为初始并发数；多表验证时为所有表共享的全局并发预算 (默认: 10)")
+    parser.add_argument("--max-concurrency", type=int,
+                       help="自适应并发上限，0表示固定使用max-workers (默认: 配置文件validation.max_concurrency)")
+    parser.add_argument("--scan-batch-size", type=int,
+                       help="扫描每次RPC返回的行数，0表示按行大小和RPC耗时自适应 (默认: 配置文件validation.scan_batch_size)")
+    parser.add_argument("--batch-size", type=int,
+                       help="每批multi-get的行数，1表示逐行验证 (默认: 配置文件validation.batch_size)")
+    parser.add_argument("--digest", choices=DIGEST_ALGORITHMS,
+                       help="行摘要算法 (默认: 配置文件validation.digest)")
+    parser.add_argument("--compare-processes", type=int,
+                       help="行摘要和逐列对比使用的子进程数，0表示在读取线程中对比 (默认: 配置文件validation.compare_processes)")
+    parser.add_argument("--engine", choices=ENGINES,
+                       help="按行键验证的执行引擎，asyncio适合高延迟的跨机房验证 (默认: 配置文件validation.engine)")
+    parser.add_argument("--async-concurrency", type=int,
+                       help="asyncio引擎的在途批次数上限 (默认: 配置文件validation.async_concurrency)")
+    parser.add_argument("--include-columns",
+                       help="只对比的列族/列，逗号分隔，如 info,detail:status (默认: 配置文件validation.columns.include)")
+    parser.add_argument("--exclude-columns",
+                       help="不对比的列族/列，逗号分隔，如 blob,info:raw (默认: 配置文件validation.columns.exclude)")
+    parser.add_argument("--split-points-file",
+                       help="merge/merkle模式的区间切分点文件，每行一个行键 (默认: 按源端region边界切分)")
     parser.add_argument("--rowkeys-file",
                        help="行键文件路径")
     
+    # 断点配置
+    parser.add_argument("--resume", action="store_true",
+                       help="从断点文件继续上次中断的验证")
+    parser.add_argument("--checkpoint-file",
+                       help="断点文件路径 (默认: 报告目录下的hbase_validation_checkpoint.json)")
+    parser.add_argument("--checkpoint-interval", type=float, default=60.0,
+                       help="断点写入间隔秒数 (默认: 60)")
+    
+    # 剖析配置
+    parser.add_argument("--profile", action="store_true",
+                       help="采样剖析验证线程，在报告旁写入折叠栈文件（.collapsed）和汇总（.profile.json），结束时打印热点函数")
+    
+    # 指标配置
+    parser.add_argument("--metrics-port", type=int,
+                       help="Prometheus /metrics 端点端口，0表示不启动 (默认: 配置文件metrics.port)")
+    
     # 输出配置
     parser.add_argument("--output", "-o",
                        help="输出报告文件名")
     
     args = parser.parse_args()
     
+    # 创建验证器并运行
+    cli_validator = CLIValidator()
+    tables, table_mapping, parallel_tables = cli_validator.multi_table_settings(args)
+    
     # 参数验证
-    if not args.use_config:
+    if not args.use_config and not tables:
         if not args.source_table or not args.target_table:
             print("❌ 请指定源端和目标端表名，或使用 --use-config")
             sys.exit(1)
     
-    # 创建验证器并运行
-    cli_validator = CLIValidator()
-    
     print("🔍 HBase数据迁移验证系统 - 命令行版本")
     print("-" * 50)
     
-    if cli_validator.validate_data(args):
+    metrics_config = cli_validator.config_manager.get_metrics_config()
+    metrics_port = args.metrics_port if args.metrics_port is not None else metrics_config.get('port', 0)
+    if metrics_port:
+        metrics_host = metrics_config.get('host', '0.0.0.0')
+        start_metrics_server(metrics_port, metrics_host)
+        print(f"📈 指标端点: http://{metrics_host}:{metrics_port}/metrics")
+    
+    profiler = SamplingProfiler().start() if args.profile else None
+    try:
+        if tables:
+            success = cli_validator.validate_tables(args, tables, table_mapping, parallel_tables)
+        else:
+            success = cli_validator.validate_data(args)
+    finally:
+        if profiler:
+            cli_validator.save_profile(profiler.stop(), args)
+    if success:
         sys.exit(0)
     else:
         sys.exit(1)
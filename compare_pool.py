@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多进程行对比
+批量读取之后，行摘要和逐列对比是纯Python的CPU计算，在线程池中受GIL限制只能用满一个核。
+多进程模式下读取线程只负责I/O，把一批 (行键, 源端行, 目标端行) 交给进程池计算摘要并对比，
+进程只返回紧凑的结论：一致的行为 (行键, 列数, 摘要)，其余行为RowResult，
+计数和结果记录仍在主进程完成。
+
+本模块只依赖row_digest和result_store，子进程不导入happybase和验证器。
+"""
+
+import multiprocessing
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from result_store import RowResult, RowStatus, matched_result
+from row_digest import RowDigest
+
+# 每个子任务的行数：太小时进程间传输开销占比高，太大时流水线不够平滑
+DEFAULT_CHUNK_SIZE = 256
+
+
+def compare_row_details(source_data: Dict, target_data: Dict) -> Dict:
+    """详细对比行数据差异"""
+    mismatches = {
+        'missing_columns_in_target': [],
+        'missing_columns_in_source': [],
+        'value_differences': []
+    }
+
+    source_columns = set(source_data.keys())
+    target_columns = set(target_data.keys())
+
+    # 找出缺失的列
+    mismatches['missing_columns_in_target'] = list(source_columns - target_columns)
+    mismatches['missing_columns_in_source'] = list(target_columns - source_columns)
+
+    # 对比相同列的值
+    common_columns = source_columns & target_columns
+    for col in common_columns:
+        if source_data[col] != target_data[col]:
+            mismatches['value_differences'].append({
+                'column': col.decode('utf-8') if isinstance(col, bytes) else str(col),
+                'source_value': str(source_data[col]),
+                'target_value': str(target_data[col])
+            })
+
+    return mismatches
+
+
+def row_result(rowkey: str, source_data: Optional[Dict], target_data: Optional[Dict],
+               digest: Callable[[Dict], bytes],
+               details: Callable[[Dict, Dict], Dict] = compare_row_details) -> RowResult:
+    """
+    对比两端的单行数据，返回验证结论（不更新计数）
+
+    Args:
+        rowkey: 行键
+        source_data: 源端行数据，None表示不存在
+        target_data: 目标端行数据，None表示不存在
+        digest: 行摘要函数（原始bytes）
+        details: 摘要不同时的逐列对比函数
+    """
+    now = time.time()
+
+    # 检查数据存在性
+    if source_data is None and target_data is None:
+        return RowResult(rowkey, RowStatus.BOTH_MISSING, None, 0, now, {'message': '源端和目标端都没有此行数据'})
+
+    if source_data is None:
+        return RowResult(rowkey, RowStatus.MISSING_IN_SOURCE, None, len(target_data), now, {
+            'message': '源端缺失此行数据',
+            'target_columns': len(target_data)
+        })
+
+    if target_data is None:
+        return RowResult(rowkey, RowStatus.MISSING_IN_TARGET, None, len(source_data), now, {
+            'message': '目标端缺失此行数据',
+            'source_columns': len(source_data)
+        })
+
+    # 两端都有数据，一致的行只保留摘要，不一致时才做逐列对比
+    source_digest = digest(source_data)
+    target_digest = digest(target_data)
+
+    if source_digest == target_digest:
+        return matched_result(rowkey, len(source_data), source_digest, now)
+
+    return RowResult(rowkey, RowStatus.DATA_MISMATCH, source_digest, len(source_data), now, {
+        'message': '数据不一致',
+        'source_hash': source_digest.hex(),
+        'target_hash': target_digest.hex(),
+        'mismatches': details(source_data, target_data)
+    })
+
+
+# 子进程内的摘要计算器，由_init_worker创建
+_worker_digest: Optional[RowDigest] = None
+
+
+def _init_worker(algorithm: str):
+    global _worker_digest
+    _worker_digest = RowDigest(algorithm)
+
+
+def _compare_chunk(pairs: List[Tuple[str, Optional[Dict], Optional[Dict]]]) -> List:
+    """子进程：对比一批行，一致的行只返回 (行键, 列数, 摘要)"""
+    verdicts = []
+    for rowkey, source_data, target_data in pairs:
+        if source_data is not None and target_data is not None:
+            source_digest = _worker_digest.digest(source_data)
+            if source_digest == _worker_digest.digest(target_data):
+                verdicts.append((rowkey, len(source_data), source_digest))
+                continue
+        verdicts.append(row_result(rowkey, source_data, target_data, _worker_digest.digest))
+    return verdicts
+
+
+class ComparePool:
+    """行对比进程池，第一次提交时才启动子进程"""
+
+    def __init__(self, processes: int, algorithm: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """
+        Args:
+            processes: 子进程数
+            algorithm: 行摘要算法（已解析的算法名，与主进程一致）
+            chunk_size: 归并扫描时每个子任务的行数
+        """
+        self.processes = max(processes, 1)
+        self.algorithm = algorithm
+        self.chunk_size = chunk_size
+        # 每个扫描区间允许同时在进程池中计算的子任务数，读取和计算重叠进行
+        self.max_pending = 2
+        self._executor = None
+
+    def _ensure_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # 验证时已有大量线程在运行，fork可能复制持有中的锁，使用spawn启动子进程
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.algorithm,)
+            )
+        return self._executor
+
+    def submit(self, pairs: List[Tuple[str, Optional[Dict], Optional[Dict]]]) -> Future:
+        """提交一批 (行键, 源端行, 目标端行)，Future的结果用expand()展开"""
+        return self._ensure_executor().submit(_compare_chunk, pairs)
+
+    @staticmethod
+    def expand(verdicts: List) -> List[RowResult]:
+        """把子进程返回的紧凑结论展开为RowResult"""
+        now = time.time()
+        return [matched_result(verdict[0], verdict[1], verdict[2], now) if type(verdict) is tuple else verdict
+                for verdict in verdicts]
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自适应并发控制（AIMD）
+根据读取路径上每次请求的延迟和错误调整同时在途的请求数：
+
+- 吞吐仍在提升时每个观察窗口加1（加性增）
+- 延迟明显高于基线、或出现超时/传输错误时乘以0.5（乘性减）
+
+集群健康时并发逐步升高，某个regionserver变慢时迅速回落。
+"""
+
+import logging
+import math
+import threading
+import time
+from typing import List, Optional
+
+
+class AIMDController:
+    """加性增、乘性减的并发上限控制器"""
+
+    def __init__(self, max_limit: int, initial: Optional[int] = None, min_limit: int = 1,
+                 decrease_factor: float = 0.5, latency_spike: float = 2.0,
+                 min_window: int = 10):
+        """
+        初始化并发控制器
+
+        Args:
+            max_limit: 并发上限
+            initial: 初始并发数，默认为上限的四分之一
+            min_limit: 并发下限
+            decrease_factor: 乘性减的系数
+            latency_spike: 窗口延迟超过基线的倍数时视为延迟尖刺
+            min_window: 每个观察窗口至少包含的请求数
+        """
+        self.max_limit = max(max_limit, 1)
+        self.min_limit = max(min(min_limit, self.max_limit), 1)
+        self.decrease_factor = decrease_factor
+        self.latency_spike = latency_spike
+        self.min_window = min_window
+        self._limit = min(max(initial or math.ceil(self.max_limit / 4), self.min_limit), self.max_limit)
+
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self.reset()
+
+    @property
+    def limit(self) -> int:
+        """当前允许的在途请求数"""
+        return self._limit
+
+    def reset(self):
+        """开始新的一轮验证：清空观察窗口和基线，保留已学到的并发数"""
+        with self._lock:
+            self._latencies: List[float] = []
+            self._cooling = False
+            self._window_start = time.perf_counter()
+            self._base_latency = None
+            self._last_throughput = None
+
+    def record(self, latency: float, error: bool = False):
+        """记录一次请求的耗时（秒）及是否失败"""
+        with self._lock:
+            self._latencies.append(latency)
+            if error:
+                # 超时或传输错误立即减小并发，不等窗口结束；减小前已发出的请求
+                # 可能接连失败，同一批在途请求只触发一次减小
+                if not self._cooling or len(self._latencies) > self._limit:
+                    self._decrease('请求失败')
+                return
+            if len(self._latencies) >= max(self.min_window, self._limit * 2):
+                self._evaluate()
+
+    def _evaluate(self):
+        """一个观察窗口结束：比较延迟和吞吐，决定增减"""
+        elapsed = max(time.perf_counter() - self._window_start, 1e-6)
+        latencies = sorted(self._latencies)
+        median = latencies[len(latencies) // 2]
+        throughput = len(latencies) / elapsed
+
+        if self._base_latency is None:
+            self._base_latency = median
+        if median > self._base_latency * self.latency_spike:
+            self._decrease(f'延迟 {median * 1000:.0f}ms 超过基线 {self._base_latency * 1000:.0f}ms')
+            return
+
+        if self._last_throughput is None or throughput > self._last_throughput:
+            if self._limit < self.max_limit:
+                self._limit += 1
+        # 基线取观察到的较低延迟，并缓慢上浮以适应负载的正常变化
+        self._base_latency = min(self._base_latency * 1.05, median)
+        self._last_throughput = throughput
+        self._cooling = False
+        self._start_window()
+
+    def _decrease(self, reason: str):
+        new_limit = max(self.min_limit, int(self._limit * self.decrease_factor))
+        if new_limit != self._limit:
+            self.logger.info(f"并发数 {self._limit} -> {new_limit} ({reason})")
+        self._limit = new_limit
+        self._cooling = True
+        # 减小并发后重新建立延迟和吞吐基准：集群整体变慢时以新的延迟为准，
+        # 不会因为延迟一直高于旧基线而把并发减到下限
+        self._base_latency = None
+        self._last_throughput = None
+        self._start_window()
+
+    def _start_window(self):
+        self._latencies = []
+        self._window_start = time.perf_counter()
@@ -7,8 +7,8 @@
 
 import yaml
 import os
-from typing import Dict, Any
-from dataclasses import dataclass
+from typing import Dict, Any, List
+from dataclasses import dataclass, field
 
 @dataclass
 class ValidationConfig:
@@ -19,6 +19,17 @@ class ValidationConfig:
     timeout: int = 300
     verbose: bool = True
     sample_rate: float = 1.0
+    digest: str = 'auto'
+    compare_processes: int = 0
+    engine: str = 'thread'
+    async_concurrency: int = 256
+    include_columns: List[str] = field(default_factory=list)
+    exclude_columns: List[str] = field(default_factory=list)
+    scan_batch_size: int = 0
+    scan_memory_mb: float = 8.0
+    max_concurrency: int = 0
+    max_retries: int = 3
+    circuit_reset_seconds: float = 30.0
 
 
 class ConfigManager:
@@ -64,21 +75,38 @@ class ConfigManager:
                 'host': 'localhost',
                 'port': 9090,
                 'table_name': 'hope_saas_oms:oms_order_info',
-                'timeout': 30000
+                'timeout': 30000,
+                'max_requests_per_second': 0,
+                'max_bytes_per_second': 0
             },
             'target': {
                 'host': 'localhost',
                 'port': 9090,
                 'table_name': 'hope_saas_oms:oms_order_info',
-                'timeout': 30000
+                'timeout': 30000,
+                'max_requests_per_second': 0,
+                'max_bytes_per_second': 0
             },
             'validation': {
                 'max_rows': 1000,
                 'max_workers': 10,
+                'max_concurrency': 0,
                 'batch_size': 100,
+                'scan_batch_size': 0,
+                'scan_memory_mb': 8,
                 'timeout': 300,
+                'max_retries': 3,
+                'circuit_reset_seconds': 30,
                 'verbose': True,
-                'sample_rate': 1.0
+                'sample_rate': 1.0,
+                'digest': 'auto',
+                'compare_processes': 0,
+                'engine': 'thread',
+                'async_concurrency': 256,
+                'columns': {
+                    'include': [],
+                    'exclude': []
+                }
             },
             'report': {
                 'output_dir': './reports',
@@ -86,6 +114,19 @@ class ConfigManager:
                 'include_details': True,
                 'max_detail_records': 1000
             },
+            'incremental': {
+                'state_file': './reports/hbase_incremental_state.json',
+                'lag_seconds': 60
+            },
+            'multi_table': {
+                'tables': [],
+                'table_mapping': {},
+                'parallel_tables': 4
+            },
+            'metrics': {
+                'port': 0,
+                'host': '0.0.0.0'
+            },
             'logging': {
                 'level': 'INFO',
                 'file': 'hbase_validation.log',
@@ -133,19 +174,43 @@ class ConfigManager:
     def get_validation_config(self) -> ValidationConfig:
         """获取验证配置"""
         config = self.config_data.get('validation', {})
+        columns = config.get('columns') or {}
         return ValidationConfig(
             max_rows=config.get('max_rows', 1000),
             max_workers=config.get('max_workers', 10),
+            max_concurrency=config.get('max_concurrency', 0),
             batch_size=config.get('batch_size', 100),
+            scan_batch_size=config.get('scan_batch_size', 0),
+            scan_memory_mb=config.get('scan_memory_mb', 8.0),
             timeout=config.get('timeout', 300),
+            max_retries=config.get('max_retries', 3),
+            circuit_reset_seconds=config.get('circuit_reset_seconds', 30.0),
             verbose=config.get('verbose', True),
-            sample_rate=config.get('sample_rate', 1.0)
+            sample_rate=config.get('sample_rate', 1.0),
+            digest=config.get('digest', 'auto'),
+            compare_processes=config.get('compare_processes', 0),
+            engine=config.get('engine', 'thread'),
+            async_concurrency=config.get('async_concurrency', 256),
+            include_columns=columns.get('include') or [],
+            exclude_columns=columns.get('exclude') or []
         )
     
     def get_report_config(self):
         """获取报告配置"""
         return self.config_data.get('report', {})
     
+    def get_incremental_config(self):
+        """获取增量验证配置"""
+        return self.config_data.get('incremental', {})
+    
+    def get_multi_table_config(self):
+        """获取多表验证配置"""
+        return self.config_data.get('multi_table', {})
+    
+    def get_metrics_config(self):
+        """获取指标端点配置"""
+        return self.config_data.get('metrics', {})
+    
     def get_logging_config(self):
         """获取日志配置"""
         return self.config_data.get('logging', {})
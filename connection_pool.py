@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HBase连接池
+happybase.Connection底层的Thrift传输不是线程安全的，多个工作线程共享同一个连接
+会导致调用串行化甚至响应错乱。连接池为每次调用借出独占连接，借出时做健康检查，
+传输层异常时丢弃并重建连接。
+"""
+
+import logging
+import queue
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+
+import happybase
+
+try:
+    from thriftpy2.transport import TTransportException
+    BROKEN_TRANSPORT_ERRORS = (TTransportException, socket.error)
+except ImportError:
+    BROKEN_TRANSPORT_ERRORS = (socket.error,)
+
+
+class HBaseConnectionPool:
+    """线程安全的HBase连接池"""
+
+    def __init__(self, host: str, port: int = 9090, timeout: int = 30000, size: int = 10,
+                 health_check_interval: float = 60.0,
+                 connection_factory: Optional[Callable] = None):
+        """
+        初始化连接池
+
+        Args:
+            host: Thrift服务主机
+            port: Thrift服务端口
+            timeout: 连接超时（毫秒）
+            size: 连接数上限，一般与工作线程数一致
+            health_check_interval: 连接空闲超过该秒数后，借出前先探活
+            connection_factory: 连接构造函数，默认happybase.Connection
+        """
+        if size < 1:
+            raise ValueError("连接池大小必须大于0")
+
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.size = size
+        self.health_check_interval = health_check_interval
+        self.connection_factory = connection_factory or happybase.Connection
+
+        self.logger = logging.getLogger(__name__)
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self._created = 0
+        self._last_used = {}
+        self._closed = False
+
+    def _new_connection(self):
+        """创建新连接"""
+        return self.connection_factory(host=self.host, port=self.port, timeout=self.timeout)
+
+    def _acquire(self, timeout: Optional[float]):
+        """借出一个连接：优先复用空闲连接，未达上限时新建，否则等待归还"""
+        if self._closed:
+            raise RuntimeError("连接池已关闭")
+
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+
+        if create:
+            try:
+                return self._new_connection()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"等待HBase连接超时: {self.host}:{self.port}")
+
+    def _release(self, conn):
+        """归还连接"""
+        self._last_used[id(conn)] = time.time()
+        self._idle.put_nowait(conn)
+
+    def _discard(self, conn):
+        """丢弃损坏的连接，释放名额"""
+        self._last_used.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._created -= 1
+
+    def _ensure_healthy(self, conn):
+        """健康检查：传输已断开则重连；空闲过久则先探活"""
+        if not conn.transport.is_open():
+            self.logger.info(f"重新打开HBase连接: {self.host}:{self.port}")
+            conn.open()
+            return
+
+        last_used = self._last_used.get(id(conn))
+        if last_used is not None and time.time() - last_used > self.health_check_interval:
+            try:
+                conn.tables()
+            except BROKEN_TRANSPORT_ERRORS as e:
+                self.logger.warning(f"空闲连接已失效，重建连接: {self.host}:{self.port} ({e})")
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+                conn.open()
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """
+        借出一个独占连接
+
+        调用过程中出现传输层异常时连接会被丢弃，下一次借出时自动新建。
+        """
+        conn = self._acquire(timeout)
+        try:
+            self._ensure_healthy(conn)
+        except Exception:
+            self._discard(conn)
+            raise
+
+        try:
+            yield conn
+        except BROKEN_TRANSPORT_ERRORS:
+            self.logger.warning(f"HBase传输异常，丢弃连接: {self.host}:{self.port}")
+            self._discard(conn)
+            raise
+        except BaseException:
+            self._release(conn)
+            raise
+        else:
+            self._release(conn)
+
+    def table(self, name: str) -> 'PooledTable':
+        """获取基于连接池的表对象"""
+        return PooledTable(self, name)
+
+    def tables(self) -> List[bytes]:
+        """列出所有表"""
+        with self.connection() as conn:
+            return conn.tables()
+
+    def close(self):
+        """关闭所有空闲连接"""
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+
+class PooledTable:
+    """
+    与happybase.Table接口一致的表对象，每次调用从连接池借出独占连接
+
+    scan()在整个迭代期间持有连接，迭代结束或生成器被关闭时归还。
+    """
+
+    def __init__(self, pool: HBaseConnectionPool, name: str):
+        self.pool = pool
+        self.name = name
+
+    def row(self, row, *args, **kwargs):
+        with self.pool.connection() as conn:
+            return conn.table(self.name).row(row, *args, **kwargs)
+
+    def rows(self, rows, *args, **kwargs):
+        with self.pool.connection() as conn:
+            return conn.table(self.name).rows(rows, *args, **kwargs)
+
+    def scan(self, **kwargs):
+        with self.pool.connection() as conn:
+            yield from conn.table(self.name).scan(**kwargs)
+
+    def regions(self):
+        with self.pool.connection() as conn:
+            return conn.table(self.name).regions()
+
+    def families(self):
+        with self.pool.connection() as conn:
+            return conn.table(self.name).families()
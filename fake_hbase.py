@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+进程内的HBase替身
+实现验证器用到的happybase Connection/Table接口（tables、table、row、rows、scan、regions、
+families），数据保存在内存中，可为每次RPC注入固定延迟并统计RPC次数，用于在没有真实集群时
+测量验证吞吐（见benchmark.py）。通过HBaseConnectionPool的connection_factory注入：
+
+    backend = FakeHBase(latency=0.002)
+    validator = HBaseDataValidator(source, target, connection_factory=backend.connect)
+
+扫描过滤器只识别验证器使用的FirstKeyOnlyFilter和KeyOnlyFilter，其他过滤器（如列投影的
+FamilyFilter/QualifierFilter）被忽略。
+"""
+
+import bisect
+import random
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# 扫描未指定batch_size时每批的行数，与happybase一致
+DEFAULT_SCAN_BATCH_SIZE = 1000
+
+
+class FakeTableData:
+    """一张表的数据：有序行键和 行键 -> {列: (值, 时间戳)}"""
+
+    def __init__(self, split_keys: Optional[List[bytes]] = None):
+        self.keys: List[bytes] = []
+        self.rows: Dict[bytes, Dict[bytes, Tuple[bytes, int]]] = {}
+        self.split_keys = sorted(split_keys or [])
+        self.families = set()
+
+    def put(self, key: bytes, data: Dict[bytes, bytes], timestamp: int = 0):
+        if key not in self.rows:
+            bisect.insort(self.keys, key)
+            self.rows[key] = {}
+        self.rows[key].update({column: (value, timestamp) for column, value in data.items()})
+        self.families.update(column.split(b':', 1)[0] for column in data)
+
+    def delete(self, key: bytes):
+        if self.rows.pop(key, None) is not None:
+            del self.keys[bisect.bisect_left(self.keys, key)]
+
+
+class FakeHBase:
+    """
+    一组内存中的HBase集群，按主机名区分
+
+    Args:
+        latency: 每次RPC（点查、批量读取、扫描的每一批）注入的延迟（秒）
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.clusters: Dict[str, Dict[bytes, FakeTableData]] = {}
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def create_table(self, host: str, name: str, split_keys: Optional[List[bytes]] = None) -> FakeTableData:
+        table = FakeTableData(split_keys)
+        self.clusters.setdefault(host, {})[name.encode('utf-8')] = table
+        return table
+
+    def connect(self, host: str = 'localhost', port: int = 9090, timeout: int = None, **kwargs) -> 'FakeConnection':
+        """连接构造函数，签名与happybase.Connection一致，可直接作为connection_factory"""
+        return FakeConnection(self, host)
+
+    def rpc(self, kind: str):
+        """记录一次RPC并注入延迟"""
+        with self._lock:
+            self.calls[kind] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def reset_calls(self):
+        with self._lock:
+            self.calls.clear()
+
+    @property
+    def data_rpcs(self) -> int:
+        """读取数据的RPC总数（不含regions/families等元数据请求）"""
+        return self.calls['get'] + self.calls['multi_get'] + self.calls['scan']
+
+
+class _FakeTransport:
+    def __init__(self):
+        self.opened = True
+
+    def is_open(self) -> bool:
+        return self.opened
+
+
+class FakeConnection:
+    """happybase.Connection替身"""
+
+    def __init__(self, backend: FakeHBase, host: str):
+        self.backend = backend
+        self.host = host
+        self.transport = _FakeTransport()
+
+    def open(self):
+        self.transport.opened = True
+
+    def close(self):
+        self.transport.opened = False
+
+    def tables(self) -> List[bytes]:
+        return sorted(self.backend.clusters.get(self.host, {}))
+
+    def table(self, name) -> 'FakeTable':
+        if isinstance(name, str):
+            name = name.encode('utf-8')
+        return FakeTable(self.backend, name, self.backend.clusters.get(self.host, {}).get(name))
+
+
+def _column_matches(column: bytes, columns: List[bytes]) -> bool:
+    family = column.split(b':', 1)[0]
+    return any(column == wanted or (b':' not in wanted.rstrip(b':') and family == wanted.rstrip(b':'))
+               for wanted in columns)
+
+
+class FakeTable:
+    """happybase.Table替身"""
+
+    def __init__(self, backend: FakeHBase, name: bytes, data: Optional[FakeTableData]):
+        if data is None:
+            raise IOError(f"TableNotFoundException: {name.decode('utf-8')}")
+        self.backend = backend
+        self.name = name
+        self.data = data
+
+    def _project(self, cells: Dict[bytes, Tuple[bytes, int]], columns=None, timestamp: Optional[int] = None,
+                 include_timestamp: bool = False, first_key_only: bool = False,
+                 key_only: bool = False) -> Dict:
+        if columns:
+            columns = [column.encode('utf-8') if isinstance(column, str) else column for column in columns]
+        result = {}
+        for column in sorted(cells):
+            value, ts = cells[column]
+            if columns and not _column_matches(column, columns):
+                continue
+            if timestamp is not None and ts >= timestamp:
+                continue
+            if key_only:
+                value = b''
+            result[column] = (value, ts) if include_timestamp else value
+            if first_key_only:
+                break
+        return result
+
+    def row(self, row, columns=None, timestamp=None, include_timestamp=False) -> Dict:
+        self.backend.rpc('get')
+        if isinstance(row, str):
+            row = row.encode('utf-8')
+        cells = self.data.rows.get(row)
+        return self._project(cells, columns, timestamp, include_timestamp) if cells else {}
+
+    def rows(self, rows, columns=None, timestamp=None, include_timestamp=False) -> List[Tuple[bytes, Dict]]:
+        self.backend.rpc('multi_get')
+        result = []
+        for row in rows:
+            if isinstance(row, str):
+                row = row.encode('utf-8')
+            cells = self.data.rows.get(row)
+            if cells:
+                data = self._project(cells, columns, timestamp, include_timestamp)
+                if data:
+                    result.append((row, data))
+        return result
+
+    def scan(self, row_start=None, row_stop=None, row_prefix=None, columns=None, filter=None,
+             timestamp=None, include_timestamp=False, batch_size=DEFAULT_SCAN_BATCH_SIZE,
+             scan_batching=None, limit=None, sorted_columns=False,
+             reverse=False) -> Iterator[Tuple[bytes, Dict]]:
+        """按行键顺序扫描，每batch_size行计一次RPC（打开扫描时返回第一批）"""
+        if isinstance(filter, bytes):
+            filter = filter.decode('utf-8')
+        first_key_only = bool(filter) and 'FirstKeyOnlyFilter' in filter
+        key_only = bool(filter) and 'KeyOnlyFilter()' in filter.replace('FirstKeyOnlyFilter()', '')
+        batch_size = max(batch_size or DEFAULT_SCAN_BATCH_SIZE, 1)
+        if row_prefix:
+            row_start, row_stop = row_prefix, row_prefix + b'\xff'
+
+        keys = self.data.keys
+        if reverse:
+            # 反向扫描：row_start为上界（包含），row_stop为下界（不包含）
+            high = bisect.bisect_right(keys, row_start) if row_start else len(keys)
+            low = bisect.bisect_right(keys, row_stop) if row_stop else 0
+            positions = range(high - 1, low - 1, -1)
+        else:
+            low = bisect.bisect_left(keys, row_start) if row_start else 0
+            high = bisect.bisect_left(keys, row_stop) if row_stop else len(keys)
+            positions = range(low, high)
+
+        returned = 0
+        self.backend.rpc('scan')
+        for position in positions:
+            key = keys[position]
+            cells = self.data.rows.get(key)
+            if not cells:
+                continue
+            data = self._project(cells, columns, timestamp, include_timestamp, first_key_only, key_only)
+            if not data:
+                continue
+            if returned and returned % batch_size == 0:
+                self.backend.rpc('scan')
+            yield key, data
+            returned += 1
+            if limit and returned >= limit:
+                return
+
+    def regions(self) -> List[Dict]:
+        self.backend.rpc('meta')
+        bounds = [b''] + self.data.split_keys + [b'']
+        return [
+            {'start_key': bounds[i], 'end_key': bounds[i + 1], 'id': i, 'name': b'region-%d' % i,
+             'server_name': b'fake-regionserver', 'port': 16020, 'version': 1}
+            for i in range(len(bounds) - 1)
+        ]
+
+    def families(self) -> Dict[bytes, Dict]:
+        self.backend.rpc('meta')
+        return {family: {} for family in sorted(self.data.families)}
+
+
+def populate_pair(backend: FakeHBase, source_host: str, target_host: str, table_name: str,
+                  rows: int, columns: int = 10, value_size: int = 32, mismatch_ratio: float = 0.0,
+                  missing_ratio: float = 0.0, regions: int = 1, seed: int = 0) -> Tuple[FakeTableData, FakeTableData]:
+    """
+    生成一对源端/目标端表，数据由seed决定，可重复
+
+    Args:
+        rows: 源端行数
+        columns: 每行的列数（列族cf下的q0..qN）
+        value_size: 每个值的字节数
+        mismatch_ratio: 目标端值被改写的行比例
+        missing_ratio: 目标端缺失的行比例
+        regions: 按行键均匀切分的region数
+        seed: 随机种子
+    """
+    rng = random.Random(seed)
+    split_keys = [b'row%010d' % (rows * i // regions) for i in range(1, regions)]
+    source = backend.create_table(source_host, table_name, split_keys)
+    target = backend.create_table(target_host, table_name, split_keys)
+    qualifiers = [b'cf:q%d' % i for i in range(columns)]
+
+    for i in range(rows):
+        key = b'row%010d' % i
+        data = {qualifier: rng.getrandbits(value_size * 8).to_bytes(value_size, 'big') for qualifier in qualifiers}
+        source.put(key, data, timestamp=i)
+        draw = rng.random()
+        if draw < missing_ratio:
+            continue
+        if draw < missing_ratio + mismatch_ratio:
+            data = dict(data)
+            data[qualifiers[0]] = b'x' * value_size
+        target.put(key, data, timestamp=i)
+    return source, target
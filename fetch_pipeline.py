@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分阶段读取流水线
+线程池引擎原来由同一个工作线程依次读取源端、读取目标端、再计算摘要对比，每批行要等
+两个集群的延迟之和。流水线把一批行拆成三个阶段：
+
+    源端读取线程池 ─┐
+                    ├─> 有界队列 ─> 对比线程 ─> 批次结果Future
+    目标端读取线程池 ┘
+
+同一批的源端和目标端读取同时进行，两端都返回后放入有界的待对比队列，由对比线程得出
+结论；对比第N批时读取线程已在读取后续批次。待对比队列满时读取线程阻塞在入队处，
+已读取未对比的数据量不超过队列容量。批次的提交顺序、断点和背压仍由调用方控制。
+"""
+
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from metrics import PIPELINE_QUEUE
+from result_store import RowResult
+
+# 对比线程的停止标记
+_STOP = object()
+
+
+class FetchPipeline:
+    """源端/目标端分别读取、对比与读取重叠的批次流水线"""
+
+    def __init__(self, validator, workers: int, queue_size: Optional[int] = None,
+                 compare_workers: Optional[int] = None):
+        """
+        Args:
+            validator: HBaseDataValidator（已连接）
+            workers: 每端的读取线程数，不应超过每端的连接池大小
+            queue_size: 待对比队列容量（批），None表示与读取线程数相同
+            compare_workers: 对比线程数，None时单进程对比为1（受GIL限制，多开无益），
+                多进程对比时与对比进程数相同
+        """
+        self.validator = validator
+        if compare_workers is None:
+            compare_workers = validator.compare_pool.processes if validator.compare_pool else 1
+        self.source_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='source-fetch')
+        self.target_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='target-fetch')
+        self.compare_queue = queue.Queue(maxsize=queue_size or workers)
+        self.compare_threads = [
+            threading.Thread(target=self._compare_loop, name=f'compare-{i}', daemon=True)
+            for i in range(max(compare_workers, 1))
+        ]
+        for thread in self.compare_threads:
+            thread.start()
+
+    def fetch(self, table, rowkeys: List[str]) -> Dict[str, Dict]:
+        """读取一批行，单个行键走点查，多个行键走multi-get"""
+        if len(rowkeys) == 1:
+            data = self.validator.get_row_data(table, rowkeys[0])
+            return {rowkeys[0]: data} if data else {}
+        return self.validator.get_rows_data(table, rowkeys)
+
+    def submit(self, rowkeys: List[str]) -> Future:
+        """提交一批行键，返回的Future在该批对比完成后得到验证结果列表"""
+        result = Future()
+        source = self.source_executor.submit(self.fetch, self.validator.source_table, rowkeys)
+        target = self.target_executor.submit(self.fetch, self.validator.target_table, rowkeys)
+        remaining = [2]
+        lock = threading.Lock()
+
+        def fetched(_):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            # 在后完成的一端的读取线程中入队，队列满时该线程阻塞，读取阶段随之放慢
+            self.compare_queue.put((rowkeys, source, target, result))
+            PIPELINE_QUEUE.labels().set(self.compare_queue.qsize())
+
+        source.add_done_callback(fetched)
+        target.add_done_callback(fetched)
+        return result
+
+    def _compare_loop(self):
+        while True:
+            item = self.compare_queue.get()
+            if item is _STOP:
+                return
+            PIPELINE_QUEUE.labels().set(self.compare_queue.qsize())
+            rowkeys, source, target, result = item
+            try:
+                result.set_result(self.compare(rowkeys, source, target))
+            except Exception as e:
+                result.set_exception(e)
+
+    def compare(self, rowkeys: List[str], source: Future, target: Future) -> List[RowResult]:
+        """对比一批已读取的行，任一端读取失败时整批记为读取失败/错误行"""
+        error = source.exception() or target.exception()
+        if error is not None:
+            return [self.validator.record_error(rowkey, error) for rowkey in rowkeys]
+        source_rows = source.result()
+        target_rows = target.result()
+        return self.validator.compare_rows(
+            [(rowkey, source_rows.get(rowkey), target_rows.get(rowkey)) for rowkey in rowkeys])
+
+    def close(self):
+        """等待已提交的批次全部对比完成后停止各阶段线程"""
+        self.source_executor.shutdown(wait=True)
+        self.target_executor.shutdown(wait=True)
+        for _ in self.compare_threads:
+            self.compare_queue.put(_STOP)
+        for thread in self.compare_threads:
+            thread.join()
+        PIPELINE_QUEUE.labels().set(0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
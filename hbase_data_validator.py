@@ -5,13 +5,17 @@ HBase数据迁移验证核心类
 用于验证原端和目标端HBase数据的一致性
 """
 
-import hashlib
 import time
 import json
 import logging
-from typing import Dict, List, Tuple, Optional, Any
+import itertools
+import heapq
+import math
+import random
+from typing import Callable, Dict, List, Tuple, Optional, Any, Iterable, Iterator
 from dataclasses import dataclass
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 import threading
 
 try:
@@ -20,6 +24,26 @@ except ImportError:
     print("请安装happybase库: pip install happybase")
     exit(1)
 
+from connection_pool import HBaseConnectionPool
+from result_sink import ResultSink
+from result_store import ResultStore, RowResult, RowStatus
+from row_digest import RowDigest
+from checkpoint import CheckpointManager, count_results, empty_counters, encode_key, decode_key, COUNTER_FIELDS, STATUS_COUNTERS
+from watermark import WatermarkStore
+from sampling import BernoulliKeySample, random_key_between, mismatch_estimate, cluster_design_effect
+from column_projection import ColumnProjection
+from scan_tuning import ScanTuner
+from concurrency import AIMDController
+from resilience import CircuitBreaker, FetchError, ResilientTable, RetryPolicy
+from rate_limit import RateLimiter, RateLimitedTable, waited_seconds
+from metrics import MeteredTable, CONCURRENCY_LIMIT, COMPARE, HASH, PROCESS_COMPARE, RETRIES
+from compare_pool import ComparePool, compare_row_details, row_result
+from async_engine import AsyncRowkeyEngine, DEFAULT_ASYNC_CONCURRENCY
+from fetch_pipeline import FetchPipeline
+
+# 每行只返回第一个单元格且不带值，用于只需要行键的扫描
+KEY_ONLY_FILTER = 'FirstKeyOnlyFilter() AND KeyOnlyFilter()'
+
 
 @dataclass
 class HBaseConnection:
@@ -28,6 +52,8 @@ class HBaseConnection:
     port: int = 9090
     table_name: str = ""
     timeout: int = 30000
+    max_requests_per_second: float = 0  # 该端每秒最多发出的RPC数，0表示不限制
+    max_bytes_per_second: float = 0  # 该端每秒最多读取的字节数，0表示不限制
 
 
 @dataclass
@@ -39,12 +65,18 @@ class ValidationResult:
     missing_in_source: int = 0
     data_mismatch: int = 0
     error_rows: int = 0
+    fetch_failed: int = 0  # 重试后仍读取失败的行，与行不存在分开统计
     validation_time: float = 0.0
-    details: List[Dict] = None
+    details: ResultStore = None  # 内存中的明细样本（按列保存），完整的不一致记录见spill_file
+    spill_file: Optional[str] = None
+    spilled_rows: int = 0
+    mode_info: Dict = None  # 验证模式相关的附加信息（如增量时间窗口）
     
     def __post_init__(self):
         if self.details is None:
-            self.details = []
+            self.details = ResultStore()
+        if self.mode_info is None:
+            self.mode_info = {}
     
     @property
     def success_rate(self) -> float:
@@ -57,25 +89,114 @@ class ValidationResult:
 class HBaseDataValidator:
     """HBase数据验证器"""
     
-    def __init__(self, source_config: HBaseConnection, target_config: HBaseConnection):
+    def __init__(self, source_config: HBaseConnection, target_config: HBaseConnection,
+                 pool_size: int = 10, include_details: bool = True,
+                 max_detail_records: int = 1000, spill_dir: Optional[str] = None,
+                 digest: str = 'auto', checkpoint_file: Optional[str] = None,
+                 checkpoint_interval: float = 60.0, include_columns: Optional[List[str]] = None,
+                 exclude_columns: Optional[List[str]] = None, scan_batch_size: Optional[int] = None,
+                 scan_memory_mb: float = 8.0, max_concurrency: Optional[int] = None,
+                 max_retries: int = 3, circuit_reset_seconds: float = 30.0,
+                 source_pool: Optional[HBaseConnectionPool] = None,
+                 target_pool: Optional[HBaseConnectionPool] = None,
+                 key_scan_pools: Optional[Dict[str, HBaseConnectionPool]] = None,
+                 connection_factory: Optional[Callable] = None, compare_processes: int = 0,
+                 engine: str = 'thread', async_concurrency: int = DEFAULT_ASYNC_CONCURRENCY):
         """
         初始化验证器
         
         Args:
             source_config: 源端HBase连接配置
             target_config: 目标端HBase连接配置
+            pool_size: 每端连接池大小，应与并发线程数一致
+            include_details: 报告中是否包含行级明细
+            max_detail_records: 内存中保留的明细记录上限
+            spill_dir: 不一致记录溢出文件目录，None表示不落盘
+            digest: 行摘要算法，见row_digest.DIGEST_ALGORITHMS
+            checkpoint_file: 断点状态文件，None表示不写断点
+            checkpoint_interval: 断点写入间隔（秒）
+            include_columns: 只对比的列族/列（"cf"或"cf:qualifier"），None表示全部
+            exclude_columns: 不对比的列族/列，优先于include_columns
+            scan_batch_size: 扫描每次RPC返回的行数，None表示按行大小和RPC耗时自适应
+            scan_memory_mb: 自适应时单个扫描一批数据的内存预算（MB）
+            max_concurrency: 自适应并发上限。给出时按行键验证的并发数从pool_size开始，
+                由AIMD控制器根据读取延迟和错误在 [1, max_concurrency] 内调整；
+                None表示固定使用max_workers
+            max_retries: 瞬时读取错误（超时、传输断开、region迁移等）的最大重试次数
+            circuit_reset_seconds: 端点连续失败熔断后暂停请求的秒数
+            source_pool: 共享的源端连接池，None表示连接时自行创建
+            target_pool: 共享的目标端连接池，None表示连接时自行创建
+            key_scan_pools: 共享的行键扫描连接池 {'source'/'target': 连接池}，缺少的一端自行创建单连接池
+            connection_factory: 连接构造函数，默认happybase.Connection（基准测试时注入fake_hbase）
+            compare_processes: 行摘要和逐列对比使用的子进程数，0表示在读取线程中对比
+            engine: 按行键验证的执行引擎，thread为线程池，asyncio为事件循环（见async_engine）
+            async_concurrency: asyncio引擎的在途批次数上限；启用自适应并发时为并发上限
         """
         self.source_config = source_config
         self.target_config = target_config
-        self.source_conn = None
-        self.target_conn = None
+        self.pool_size = pool_size
+        self.source_pool = source_pool
+        self.target_pool = target_pool
+        self.shared_pools = [pool for pool in (source_pool, target_pool) if pool]
+        self.connection_factory = connection_factory
         self.source_table = None
         self.target_table = None
+        # 驱动按行键验证的行键扫描使用的连接池和表对象（见key_scan_table），
+        # key_scan_pools中只有自行创建的连接池，断开时关闭
+        self.shared_key_scan_pools = dict(key_scan_pools or {})
+        self.key_scan_pools: Dict[str, HBaseConnectionPool] = {}
+        self.key_scan_tables: Dict[str, MeteredTable] = {}
         
         # 统计计数器
         self.lock = threading.Lock()
         self.result = ValidationResult()
         
+        # 结果接收器
+        self.include_details = include_details
+        self.max_detail_records = max_detail_records
+        self.spill_dir = spill_dir
+        self.result_sink = None
+        
+        # 行摘要
+        self.row_digest = RowDigest(digest)
+        
+        # 多进程对比（读取线程只做I/O，摘要和逐列对比在子进程中进行）
+        self.compare_pool = ComparePool(compare_processes, self.row_digest.algorithm) if compare_processes else None
+        
+        # 列投影
+        self.projection = ColumnProjection(include_columns, exclude_columns)
+        
+        # 扫描批大小
+        self.scan_tuner = ScanTuner(scan_batch_size, scan_memory_mb, wait_clock=waited_seconds)
+        
+        # 执行引擎
+        self.engine = engine
+        self.async_concurrency = async_concurrency
+        
+        # 自适应并发（asyncio引擎不受线程数限制，上限取两者中较大的）
+        if max_concurrency and engine == 'asyncio':
+            max_concurrency = max(max_concurrency, async_concurrency)
+        self.concurrency = AIMDController(max_concurrency, initial=pool_size) if max_concurrency else None
+        if self.concurrency:
+            self.pool_size = max(pool_size, self.concurrency.max_limit)
+        
+        # 重试与熔断（熔断器按端点共享）
+        self.retry_policy = RetryPolicy(max_attempts=max_retries + 1)
+        self.circuit_reset_seconds = circuit_reset_seconds
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        
+        # 限速（令牌桶按端点共享）
+        self.rate_limiters: Dict[str, RateLimiter] = {}
+        
+        # 断点
+        self.checkpoint = CheckpointManager(checkpoint_file, checkpoint_interval) if checkpoint_file else None
+        self.committed_counters = empty_counters()
+        self.resumed_state = None
+        # 每次按顺序提交一批结论后调用（抽样验证用它按整群统计不一致行）
+        self.commit_observer: Optional[Callable[[List[RowResult]], None]] = None
+        # 每提交一批后以进度字典调用，可在写入断点前补充字段（全量抽样验证用它记录总体行数）
+        self.progress_observer: Optional[Callable[[Dict], None]] = None
+        
         # 配置日志
         self.logger = logging.getLogger(__name__)
         self.setup_logging()
@@ -91,26 +212,90 @@ class HBaseDataValidator:
             ]
         )
     
+    def create_pool(self, config: HBaseConnection, size: Optional[int] = None) -> HBaseConnectionPool:
+        """创建单端连接池，size默认为pool_size"""
+        return HBaseConnectionPool(
+            host=config.host,
+            port=config.port,
+            timeout=config.timeout,
+            size=size or self.pool_size,
+            connection_factory=self.connection_factory
+        )
+    
+    def key_scan_table(self, side: str) -> MeteredTable:
+        """
+        取得驱动按行键验证的行键扫描使用的表对象（side为source/target）
+        
+        行键扫描是边验证边迭代的生成器，整个验证期间占用一个连接。如果它从读取用的
+        连接池借连接，读取线程数不小于连接池大小（或多表共享连接池）时读取线程会永远
+        等不到连接，所以每端单独使用一个单连接的池（多表验证时为共享的行键扫描连接池），
+        限速、重试和熔断与读取共享。
+        """
+        if side not in self.key_scan_tables:
+            if side == 'source':
+                config, label = self.source_config, '源端'
+            else:
+                config, label = self.target_config, '目标端'
+            pool = self.shared_key_scan_pools.get(side)
+            if pool is None:
+                pool = self.create_pool(config, size=1)
+                self.key_scan_pools[side] = pool
+            self.key_scan_tables[side] = self.wrap_table(pool, config, label, side)
+        return self.key_scan_tables[side]
+    
+    def wrap_table(self, pool: HBaseConnectionPool, config: HBaseConnection, side: str,
+                   metric_side: str) -> MeteredTable:
+        """
+        创建带限速、重试和熔断的表对象（重试的请求同样受限速约束）
+        
+        最外层计时，读取耗时指标包含重试和限速等待，即验证线程实际等待的时间。
+        """
+        endpoint = f"{config.host}:{config.port}"
+        if endpoint not in self.breakers:
+            self.breakers[endpoint] = CircuitBreaker(f"{side} {endpoint}", reset_timeout=self.circuit_reset_seconds)
+        if endpoint not in self.rate_limiters:
+            self.rate_limiters[endpoint] = RateLimiter(config.max_requests_per_second, config.max_bytes_per_second)
+        
+        table = pool.table(config.table_name)
+        limiter = self.rate_limiters[endpoint]
+        if limiter.active:
+            self.logger.info(f"{side}限速: 每秒 {limiter.requests_per_second or '不限'} 次请求，"
+                             f"{limiter.bytes_per_second or '不限'} 字节")
+            table = RateLimitedTable(table, limiter)
+        
+        table = ResilientTable(table, side, self.retry_policy, self.breakers[endpoint], self.retry_callback(metric_side))
+        return MeteredTable(table, metric_side)
+    
+    def retry_callback(self, metric_side: str) -> Callable[[BaseException], None]:
+        """每次可重试的读取失败后调用：计入重试指标，并作为错误反馈给并发控制器"""
+        retries = RETRIES.labels(metric_side)
+        
+        def on_retry(error):
+            retries.inc()
+            if self.concurrency:
+                self.concurrency.record(0.0, error=True)
+        
+        return on_retry
+    
     def connect_source(self) -> bool:
         """连接源端HBase"""
         try:
             self.logger.info(f"连接源端HBase: {self.source_config.host}:{self.source_config.port}")
-            self.source_conn = happybase.Connection(
-                host=self.source_config.host,
-                port=self.source_config.port,
-                timeout=self.source_config.timeout
-            )
+            if self.source_pool is None:
+                self.source_pool = self.create_pool(self.source_config)
             
             # 测试连接
-            tables = self.source_conn.tables()
+            tables = self.source_pool.tables()
             table_bytes = self.source_config.table_name.encode('utf-8')
             
             if table_bytes not in tables:
                 self.logger.error(f"源端表不存在: {self.source_config.table_name}")
                 return False
             
-            self.source_table = self.source_conn.table(self.source_config.table_name)
-            self.logger.info("源端连接成功")
+            self.source_table = self.wrap_table(self.source_pool, self.source_config, '源端', 'source')
+            if self.projection.active:
+                self.projection.add_families(self.source_table.families())
+            self.logger.info(f"源端连接成功 (连接池大小: {self.source_pool.size})")
             return True
             
         except Exception as e:
@@ -121,22 +306,21 @@ class HBaseDataValidator:
         """连接目标端HBase"""
         try:
             self.logger.info(f"连接目标端HBase: {self.target_config.host}:{self.target_config.port}")
-            self.target_conn = happybase.Connection(
-                host=self.target_config.host,
-                port=self.target_config.port,
-                timeout=self.target_config.timeout
-            )
+            if self.target_pool is None:
+                self.target_pool = self.create_pool(self.target_config)
             
             # 测试连接
-            tables = self.target_conn.tables()
+            tables = self.target_pool.tables()
             table_bytes = self.target_config.table_name.encode('utf-8')
             
             if table_bytes not in tables:
                 self.logger.error(f"目标端表不存在: {self.target_config.table_name}")
                 return False
             
-            self.target_table = self.target_conn.table(self.target_config.table_name)
-            self.logger.info("目标端连接成功")
+            self.target_table = self.wrap_table(self.target_pool, self.target_config, '目标端', 'target')
+            if self.projection.active:
+                self.projection.add_families(self.target_table.families())
+            self.logger.info(f"目标端连接成功 (连接池大小: {self.target_pool.size})")
             return True
             
         except Exception as e:
@@ -144,198 +328,1055 @@ class HBaseDataValidator:
             return False
     
     def disconnect(self):
-        """断开所有连接"""
-        if self.source_conn:
-            self.source_conn.close()
+        """断开所有连接（共享的连接池由创建者关闭）"""
+        if self.source_pool and self.source_pool not in self.shared_pools:
+            self.source_pool.close()
             self.logger.info("源端连接已断开")
         
-        if self.target_conn:
-            self.target_conn.close()
+        if self.target_pool and self.target_pool not in self.shared_pools:
+            self.target_pool.close()
             self.logger.info("目标端连接已断开")
+        
+        for pool in self.key_scan_pools.values():
+            pool.close()
+        self.key_scan_pools.clear()
+        self.key_scan_tables.clear()
+        
+        if self.compare_pool:
+            self.compare_pool.close()
+    
+    def reset_result(self, state: Optional[Dict] = None, keep_spilled=None):
+        """
+        重置验证结果，并为本次验证创建新的结果接收器
+        
+        Args:
+            state: 断点状态，给出时恢复计数器和溢出文件
+            keep_spilled: 恢复溢出文件时用于筛选保留记录的函数
+        """
+        if self.result_sink:
+            self.result_sink.close()
+        self.result = ValidationResult()
+        self.result_sink = ResultSink(self.include_details, self.max_detail_records, self.spill_dir)
+        self.committed_counters = empty_counters()
+        self.resumed_state = state
+        
+        if state:
+            self.result_sink.resume(state.get('spill_file'), state.get('spill_offset', 0), keep_spilled)
+            for field in COUNTER_FIELDS:
+                value = state['counters'].get(field, 0)
+                setattr(self.result, field, value)
+                self.committed_counters[field] = value
+    
+    def finish_result(self, start_time: float):
+        """结束本次验证：关闭溢出文件，回填明细样本和耗时，删除断点"""
+        self.result_sink.close()
+        self.result.details = self.result_sink.sample
+        self.result.spill_file = self.result_sink.spill_file
+        self.result.spilled_rows = self.result_sink.spilled_rows
+        self.result.validation_time = self._resumed_state_value('elapsed', 0.0) + time.time() - start_time
+        if self.checkpoint:
+            self.checkpoint.clear()
+    
+    def _resumed_state_value(self, name: str, default=None):
+        """读取恢复时断点中的字段"""
+        return self.resumed_state.get(name, default) if self.resumed_state else default
+    
+    def load_checkpoint(self, mode: str, resume: bool) -> Optional[Dict]:
+        """resume为True且存在匹配的断点时返回断点状态"""
+        if not resume:
+            return None
+        if not self.checkpoint:
+            self.logger.warning("未配置断点文件，无法从断点继续")
+            return None
+        
+        state = self.checkpoint.load(mode, self.source_config.table_name, self.target_config.table_name)
+        if state:
+            self.logger.info(f"从断点继续 ({self.checkpoint.path}，保存于 {state.get('updated_at')})，"
+                             f"已提交 {state['counters'].get('total_rows', 0)} 行")
+        else:
+            self.logger.info("没有可用的断点，从头开始验证")
+        return state
+    
+    def save_checkpoint(self, mode: str, start_time: float, progress: Dict, force: bool = False):
+        """写入断点：已提交的进度、计数器和溢出文件偏移"""
+        if not self.checkpoint or not (force or self.checkpoint.due()):
+            return
+        
+        try:
+            self.checkpoint.save({
+                'mode': mode,
+                'source_table': self.source_config.table_name,
+                'target_table': self.target_config.table_name,
+                'counters': dict(self.committed_counters),
+                'spill_file': self.result_sink.spill_file,
+                'spill_offset': self.result_sink.offset(),
+                'elapsed': self._resumed_state_value('elapsed', 0.0) + time.time() - start_time,
+                **progress
+            })
+        except Exception as e:
+            self.logger.warning(f"写入断点失败: {e}")
+    
+    def record_fetch(self, started: float, error: bool = False):
+        """把一次读取请求的耗时和结果反馈给并发控制器"""
+        if self.concurrency:
+            self.concurrency.record(time.perf_counter() - started, error)
+            CONCURRENCY_LIMIT.labels().set(self.concurrency.limit)
     
     def get_row_data(self, table, rowkey: str) -> Optional[Dict]:
-        """获取行数据"""
+        """获取行数据，行不存在时返回None，重试后仍读取失败时抛出FetchError"""
+        started = time.perf_counter()
         try:
-            return table.row(rowkey.encode('utf-8'))
+            data = table.row(rowkey.encode('utf-8'), columns=self.projection.columns)
         except Exception as e:
+            self.record_fetch(started, error=True)
             self.logger.warning(f"获取行数据失败 {rowkey}: {e}")
-            return None
+            raise
+        self.record_fetch(started)
+        return self.projection.apply(data) or None
+    
+    def get_rows_data(self, table, rowkeys: List[str]) -> Dict[str, Dict]:
+        """
+        批量获取多行数据（一次multi-get），返回 行键->行数据，不存在的行不在结果中，
+        重试后仍读取失败时抛出FetchError
+        """
+        started = time.perf_counter()
+        try:
+            rows = table.rows([rowkey.encode('utf-8') for rowkey in rowkeys], columns=self.projection.columns)
+        except Exception as e:
+            self.record_fetch(started, error=True)
+            self.logger.warning(f"批量获取行数据失败 ({len(rowkeys)}行, 首行 {rowkeys[0]}): {e}")
+            raise
+        self.record_fetch(started)
+        rows = ((key, self.projection.apply(data)) for key, data in rows)
+        return {key.decode('utf-8'): data for key, data in rows if data}
     
     def calculate_data_hash(self, data: Dict) -> str:
-        """计算数据哈希值"""
+        """计算数据哈希值（算法由digest参数决定）"""
         if not data:
             return ""
         
-        # 将数据转换为排序后的字符串并计算MD5
-        sorted_data = sorted(data.items())
-        data_str = json.dumps(sorted_data, sort_keys=True, default=str)
-        return hashlib.md5(data_str.encode('utf-8')).hexdigest()
-    
-    def validate_single_row(self, rowkey: str) -> Dict:
-        """验证单行数据"""
-        result = {
-            'rowkey': rowkey,
-            'status': 'unknown',
-            'details': {},
-            'timestamp': time.time()
-        }
+        return self.row_digest.hexdigest(data)
+    
+    def record_error(self, rowkey: str, error) -> RowResult:
+        """记录验证出错的行，读取失败（FetchError）单独记为fetch_failed"""
+        if isinstance(error, FetchError):
+            with self.lock:
+                self.result.fetch_failed += 1
+                self.result.total_rows += 1
+            return RowResult(rowkey, RowStatus.FETCH_FAILED, timestamp=time.time(),
+                             details={'message': str(error), 'side': error.side})
         
+        with self.lock:
+            self.result.error_rows += 1
+            self.result.total_rows += 1
+        return RowResult(rowkey, RowStatus.ERROR, timestamp=time.time(),
+                         details={'message': f'验证出错: {str(error)}'})
+    
+    def record_batch_error(self, rowkeys: List[str], error) -> List[RowResult]:
+        """整批处理失败时逐行记为错误行，提交后计数和断点中的已提交行数保持一致"""
+        self.logger.error(f"处理批次 ({len(rowkeys)}行, 首行 {rowkeys[0]}) 时出错: {error}")
+        return [self.record_error(rowkey, error) for rowkey in rowkeys]
+    
+    def compare_row(self, rowkey: str, source_data: Optional[Dict], target_data: Optional[Dict]) -> RowResult:
+        """对比两端的单行数据并更新统计"""
+        result = row_result(rowkey, source_data, target_data, self.timed_digest, self.compare_row_details)
+        field = STATUS_COUNTERS.get(result.status)
+        with self.lock:
+            if field:
+                setattr(self.result, field, getattr(self.result, field) + 1)
+            self.result.total_rows += 1
+        return result
+    
+    def timed_digest(self, data: Dict) -> bytes:
+        with HASH.time():
+            return self.row_digest.digest(data)
+    
+    def compare_row_details(self, source_data: Dict, target_data: Dict) -> Dict:
+        """详细对比行数据差异"""
+        with COMPARE.time():
+            return compare_row_details(source_data, target_data)
+    
+    def add_results(self, results: List[RowResult]):
+        """把一组已得出结论的行计入统计（多进程对比的结果在主进程计数）"""
+        counters = empty_counters()
+        count_results(results, counters)
+        with self.lock:
+            for name, value in counters.items():
+                setattr(self.result, name, getattr(self.result, name) + value)
+    
+    def submit_compare(self, pairs: List[Tuple[str, Optional[Dict], Optional[Dict]]]):
+        """把一批 (行键, 源端行, 目标端行) 提交到对比进程池"""
+        started = time.perf_counter()
+        future = self.compare_pool.submit(pairs)
+        future.add_done_callback(lambda _: PROCESS_COMPARE.observe(time.perf_counter() - started))
+        return pairs, future
+    
+    def collect_compare(self, submitted) -> List[RowResult]:
+        """等待进程池的对比结论并计入统计，进程池出错时整批记为错误行"""
+        pairs, future = submitted
         try:
-            # 获取源端数据
-            source_data = self.get_row_data(self.source_table, rowkey)
-            target_data = self.get_row_data(self.target_table, rowkey)
-            
-            # 检查数据存在性
-            if source_data is None and target_data is None:
-                result['status'] = 'both_missing'
-                result['details'] = {'message': '源端和目标端都没有此行数据'}
+            results = self.compare_pool.expand(future.result())
+        except Exception as e:
+            self.logger.error(f"多进程对比失败 ({len(pairs)}行, 首行 {pairs[0][0]}): {e}")
+            return [self.record_error(rowkey, e) for rowkey, _, _ in pairs]
+        self.add_results(results)
+        return results
+    
+    def compare_rows(self, pairs: List[Tuple[str, Optional[Dict], Optional[Dict]]]) -> List[RowResult]:
+        """对比一批行：启用多进程对比时整批交给进程池，否则在当前线程逐行对比"""
+        if self.compare_pool:
+            return self.collect_compare(self.submit_compare(pairs))
+        
+        results = []
+        for rowkey, source_data, target_data in pairs:
+            try:
+                results.append(self.compare_row(rowkey, source_data, target_data))
+            except Exception as e:
+                results.append(self.record_error(rowkey, e))
+        return results
+    
+    def iter_rowkeys(self, table, max_rows: Optional[int] = None,
+                     row_start: Optional[bytes] = None) -> Iterator[str]:
+        """
+        流式迭代表中的行键，不在内存中保留完整列表
+        
+        只取行键（KEY_ONLY_FILTER），列值不经过网络，扫描批大小也按行键的字节数调整。
+        扫描在重试后仍失败时抛出异常，而不是当作扫描结束：否则验证会在不完整的行键
+        集合上报告完成并删除断点，无法从失败处续验。
+        """
+        try:
+            for key, _ in self.scan_table(table, row_start, None, max_rows, filter=KEY_ONLY_FILTER):
+                yield key.decode('utf-8')
                 
-            elif source_data is None:
-                result['status'] = 'missing_in_source'
-                result['details'] = {
-                    'message': '源端缺失此行数据',
-                    'target_columns': len(target_data) if target_data else 0
-                }
-                with self.lock:
-                    self.result.missing_in_source += 1
+        except Exception as e:
+            self.logger.error(f"获取行键列表失败: {e}")
+            raise
+    
+    def get_all_rowkeys(self, table, max_rows: Optional[int] = None) -> List[str]:
+        """获取表中所有行键"""
+        return list(self.iter_rowkeys(table, max_rows))
+    
+    def validate_by_rowkeys_list(self, rowkeys: Iterable[str], max_workers: int = 10, 
+                                progress_callback=None, batch_size: int = 100,
+                                resume: bool = False, rowkeys_source: Optional[Dict] = None) -> ValidationResult:
+        """
+        根据行键列表进行验证
+        
+        行键可以是列表，也可以是生成器等惰性迭代器：行键按需读取，在途任务数
+        不超过并发数的两倍，内存占用与行键总数无关。
+        
+        Args:
+            rowkeys: 待验证的行键（列表或迭代器）
+            max_workers: 并发线程数
+            progress_callback: 进度回调 (已完成数, 总数)，总数未知时为0
+            batch_size: 每批行数，>1时每批每端只做一次multi-get；<=1时逐行验证
+            resume: 从断点继续，跳过断点前已提交的行键（不重新读取HBase）
+            rowkeys_source: 行键来源的标识（如行键文件的路径和大小），写入断点；
+                续验时与断点中的不一致则拒绝续验，避免按行数跳过另一份行键
+        """
+        total = len(rowkeys) if hasattr(rowkeys, '__len__') else 0
+        start_time = time.time()
+        
+        # 重置结果
+        state = self.load_checkpoint('rowkeys', resume)
+        if state and state.get('rowkeys_source') != rowkeys_source:
+            raise ValueError(f"断点对应的行键来源 {state.get('rowkeys_source')} 与本次 {rowkeys_source} 不一致，"
+                             f"无法续验（去掉 --resume 从头验证）")
+        self.reset_result(state)
+        
+        committed_rows = state['committed_rows'] if state else 0
+        if committed_rows:
+            self.logger.info(f"从断点继续，跳过已验证的 {committed_rows} 个行键")
+            rowkeys = itertools.islice(iter(rowkeys), committed_rows, None)
+        
+        return self.run_rowkey_stream(rowkeys, 'rowkeys', total, max_workers, progress_callback,
+                                      batch_size, start_time, committed_rows, {'rowkeys_source': rowkeys_source})
+    
+    def run_rowkey_stream(self, rowkeys: Iterable[str], mode: str, total: int, max_workers: int,
+                          progress_callback, batch_size: int, start_time: float,
+                          committed_rows: int = 0, checkpoint_extra: Optional[Dict] = None) -> ValidationResult:
+        """
+        以有界队列流式验证行键
+        
+        批次按读取顺序编号，完成的批次先放入重排缓冲，只有之前的批次全部完成后才
+        按顺序提交（写入结果接收器、计入断点计数器），因此断点中的"已提交行数/
+        最后提交的行键"之前的行全部验证完毕，断点之后的行一条也没有写入溢出文件。
+        
+        每批行交给FetchPipeline：源端和目标端在各自的读取线程池中同时读取，对比与后续
+        批次的读取重叠进行。启用自适应并发时，在途批次数由并发控制器的当前上限决定，
+        读取线程池按并发上限创建。
+        engine为asyncio时交给AsyncRowkeyEngine在事件循环中执行，提交和断点语义相同。
+        """
+        if self.engine == 'asyncio':
+            return AsyncRowkeyEngine(self, self.async_concurrency).run(
+                rowkeys, mode, total, progress_callback, batch_size, start_time, committed_rows, checkpoint_extra)
+        
+        batch_size = max(batch_size, 1)
+        rowkey_iter = iter(rowkeys)
+        batches = iter(lambda: list(itertools.islice(rowkey_iter, batch_size)), [])
+        if self.concurrency:
+            self.concurrency.reset()
+            max_workers = self.concurrency.max_limit
+            self.logger.info(f"开始验证 {total or '流式'} 行数据 (批大小: {batch_size}, "
+                             f"自适应并发: {self.concurrency.limit}/{max_workers})")
+        else:
+            self.logger.info(f"开始验证 {total or '流式'} 行数据 (批大小: {batch_size})")
+        max_in_flight = max_workers * 2
+        progress = {'committed_rows': committed_rows, 'last_rowkey': self._resumed_state_value('last_rowkey'),
+                    **(checkpoint_extra or {})}
+        finished = False
+        
+        try:
+            with FetchPipeline(self, max_workers) as pipeline:
+                in_flight = {}
+                finished_batches = {}
+                next_seq = 0
+                next_commit = 0
+                completed = 0
+                reported = 0
+                
+                while True:
+                    # 在途和待提交的批次未满时继续从行键源读取，满了则等待（背压）
+                    room = max_in_flight - len(in_flight) - len(finished_batches)
+                    if self.concurrency:
+                        room = min(room, self.concurrency.limit - len(in_flight))
+                    for batch in itertools.islice(batches, max(room, 0)):
+                        in_flight[pipeline.submit(batch)] = (next_seq, batch)
+                        next_seq += 1
                     
-            elif target_data is None:
-                result['status'] = 'missing_in_target'
-                result['details'] = {
-                    'message': '目标端缺失此行数据',
-                    'source_columns': len(source_data) if source_data else 0
-                }
-                with self.lock:
-                    self.result.missing_in_target += 1
+                    if not in_flight:
+                        break
                     
-            else:
-                # 两端都有数据，进行详细对比
-                source_hash = self.calculate_data_hash(source_data)
-                target_hash = self.calculate_data_hash(target_data)
-                
-                if source_hash == target_hash:
-                    result['status'] = 'matched'
-                    result['details'] = {
-                        'message': '数据完全一致',
-                        'columns_count': len(source_data),
-                        'data_hash': source_hash
-                    }
-                    with self.lock:
-                        self.result.matched_rows += 1
-                else:
-                    result['status'] = 'data_mismatch'
-                    mismatch_details = self.compare_row_details(source_data, target_data)
-                    result['details'] = {
-                        'message': '数据不一致',
-                        'source_hash': source_hash,
-                        'target_hash': target_hash,
-                        'mismatches': mismatch_details
-                    }
-                    with self.lock:
-                        self.result.data_mismatch += 1
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        seq, batch = in_flight.pop(future)
+                        try:
+                            finished_batches[seq] = (batch, future.result())
+                        except Exception as e:
+                            finished_batches[seq] = (batch, self.record_batch_error(batch, e))
+                        completed += len(batch)
+                    
+                    next_commit = self.commit_batches(finished_batches, next_commit, progress)
+                    self.save_checkpoint(mode, start_time, progress)
+                    
+                    if progress_callback and completed - reported >= 100:
+                        reported = completed
+                        progress_callback(completed, total)
             
-            with self.lock:
-                self.result.total_rows += 1
-                
-        except Exception as e:
-            result['status'] = 'error'
-            result['details'] = {'message': f'验证出错: {str(e)}'}
-            with self.lock:
-                self.result.error_rows += 1
-                self.result.total_rows += 1
+            if progress_callback and completed != reported:
+                progress_callback(completed, total)
+            finished = True
+        finally:
+            if not finished:
+                self.save_checkpoint(mode, start_time, progress, force=True)
+        
+        self.finish_result(start_time)
+        self.logger.info(f"验证完成，共 {completed} 行，耗时 {self.result.validation_time:.2f} 秒")
+        
+        return self.result
+    
+    def commit_batches(self, finished_batches: Dict[int, Tuple[List[str], List[RowResult]]], next_commit: int,
+                       progress: Dict) -> int:
+        """按顺序提交已完成的批次（写入结果接收器、计入断点计数器），返回下一个待提交的批次序号"""
+        while next_commit in finished_batches:
+            batch, results = finished_batches.pop(next_commit)
+            self.result_sink.record_many(results)
+            count_results(results, self.committed_counters)
+            if self.commit_observer:
+                self.commit_observer(results)
+            progress['committed_rows'] += len(batch)
+            progress['last_rowkey'] = batch[-1]
+            if self.progress_observer:
+                self.progress_observer(progress)
+            next_commit += 1
+        return next_commit
+    
+    def validate_all_data(self, max_rows: Optional[int] = None, max_workers: int = 10,
+                         progress_callback=None, batch_size: int = 100,
+                         resume: bool = False, sample_rate: float = 1.0,
+                         seed: Optional[int] = None) -> ValidationResult:
+        """
+        验证所有数据（源端行键边扫描边验证）
+        
+        resume为True时从断点中最后提交的行键之后继续扫描。sample_rate<1时在只取行键的扫描上
+        对每个行键独立以该概率抽中（均匀抽样），只读取抽中行的列值，并在mode_info中给出
+        不一致率的置信区间；已扫描的总体行数随进度写入断点，续验时接着累计。
+        """
+        start_time = time.time()
+        
+        # 重置结果
+        state = self.load_checkpoint('all', resume)
+        if state and state.get('sample_rate', 1.0) != sample_rate:
+            raise ValueError(f"断点的抽样比例 {state.get('sample_rate', 1.0)} 与本次 {sample_rate} 不一致，"
+                             f"无法续验（去掉 --resume 从头验证）")
+        self.reset_result(state)
+        
+        row_start = None
+        committed_rows = 0
+        population_rows = 0
+        if state and state.get('last_rowkey'):
+            row_start = state['last_rowkey'].encode('utf-8') + b'\x00'
+            committed_rows = state['committed_rows']
+            population_rows = state.get('population_rows', committed_rows)
+            self.logger.info(f"从断点继续，从行键 {state['last_rowkey']} 之后开始扫描")
+            if max_rows:
+                # max_rows限制的是扫描的行键数，抽样时已扫描的行数是总体行数而不是已提交行数
+                max_rows = max(max_rows - (population_rows if sample_rate < 1.0 else committed_rows), 0)
+                if max_rows == 0:
+                    self.finish_result(start_time)
+                    return self.result
+        
+        self.logger.info("流式扫描源端行键...")
+        source_rowkeys = self.iter_rowkeys(self.key_scan_table('source'), max_rows, row_start)
+        sample = None
+        checkpoint_extra = {'sample_rate': sample_rate}
+        if sample_rate < 1.0:
+            self.logger.info(f"按 {sample_rate:.2%} 的比例均匀抽样验证")
+            sample = BernoulliKeySample(source_rowkeys, sample_rate, seed)
+            source_rowkeys = iter(sample)
+            checkpoint_extra['population_rows'] = population_rows
             
-        return result
+            def record_population(progress: Dict):
+                progress['population_rows'] = population_rows + sample.population_through(progress['last_rowkey'])
+            
+            self.progress_observer = record_population
+        
+        try:
+            first_rowkey = next(source_rowkeys, None)
+            if first_rowkey is None and state is None:
+                self.logger.warning("源端没有数据")
+                return ValidationResult()
+            
+            source_rowkeys = itertools.chain([first_rowkey], source_rowkeys) if first_rowkey is not None else iter(())
+            self.run_rowkey_stream(source_rowkeys, 'all', 0 if sample else max_rows or 0, max_workers,
+                                   progress_callback, batch_size, start_time, committed_rows, checkpoint_extra)
+        finally:
+            self.progress_observer = None
+        
+        if sample:
+            self.result.mode_info = mismatch_estimate(self.result.total_rows, self.result.matched_rows,
+                                                      population_rows=population_rows + sample.scanned)
+            self.result.mode_info['sample_rate'] = sample_rate
+            self.result.mode_info['population_rows'] = population_rows + sample.scanned
+            self.log_mismatch_estimate()
+        
+        return self.result
     
-    def compare_row_details(self, source_data: Dict, target_data: Dict) -> Dict:
-        """详细对比行数据差异"""
-        mismatches = {
-            'missing_columns_in_target': [],
-            'missing_columns_in_source': [],
-            'value_differences': []
-        }
+    def find_range_bounds(self, table, row_start: bytes, row_stop: bytes) -> Optional[Tuple[bytes, bytes]]:
+        """找出区间内实际的第一个和最后一个行键，区间为空时返回None"""
+        first = next(iter(self.scan_table(table, row_start, row_stop, 1, filter=KEY_ONLY_FILTER)), None)
+        if first is None:
+            return None
         
-        source_columns = set(source_data.keys())
-        target_columns = set(target_data.keys())
+        # 反向扫描时row_start为上界（包含），区间上界不包含，所以用 [first, row_stop) 内最后一行
+        if row_stop:
+            reverse = self.scan_table(table, row_stop, first[0], 2, filter=KEY_ONLY_FILTER, reverse=True)
+            last = next((row for row in reverse if row[0] < row_stop), None)
+        else:
+            last = next(iter(self.scan_table(table, None, None, 1, filter=KEY_ONLY_FILTER, reverse=True)), None)
+        return first[0], (last or first)[0]
+    
+    def sample_rowkeys(self, sample_size: int, run_length: int = 10, seed: Optional[int] = None,
+                       split_points: Optional[List[bytes]] = None) -> List[List[str]]:
+        """
+        按region分层随机抽取行键，按整群返回
         
-        # 找出缺失的列
-        mismatches['missing_columns_in_target'] = list(source_columns - target_columns)
-        mismatches['missing_columns_in_source'] = list(target_columns - source_columns)
+        每个region分配相同数量的随机定位，每次定位在该region实际的首尾行键之间随机取
+        起点，用row_start做一次短扫描取run_length个行键。每次定位新抽到的行键为一群，
+        已被之前的定位抽到的行不重复计入。
+        """
+        rng = random.Random(seed)
+        strata = []
+        for row_start, row_stop in self.get_key_ranges(split_points):
+            bounds = self.find_range_bounds(self.source_table, row_start, row_stop)
+            if bounds is not None:
+                strata.append((row_stop, bounds))
         
-        # 对比相同列的值
-        common_columns = source_columns & target_columns
-        for col in common_columns:
-            if source_data[col] != target_data[col]:
-                mismatches['value_differences'].append({
-                    'column': col.decode('utf-8') if isinstance(col, bytes) else str(col),
-                    'source_value': str(source_data[col]),
-                    'target_value': str(target_data[col])
-                })
+        sampled = set()
+        clusters = []
+        # 随机定位可能落到相同的行，样本不足时补充定位，最多5轮
+        for _ in range(5):
+            missing = sample_size - len(sampled)
+            if missing <= 0 or not strata:
+                break
+            seeks_per_range = max(1, math.ceil(missing / run_length / len(strata)))
+            for row_stop, (first_key, last_key) in strata:
+                for _ in range(seeks_per_range):
+                    seek_key = random_key_between(first_key, last_key, rng)
+                    cluster = []
+                    for key, _ in self.scan_table(self.source_table, seek_key, row_stop, run_length,
+                                                  filter=KEY_ONLY_FILTER):
+                        if key not in sampled:
+                            sampled.add(key)
+                            cluster.append(key.decode('utf-8'))
+                    if cluster:
+                        clusters.append(cluster)
         
-        return mismatches
+        self.logger.info(f"在 {len(strata)} 个区间中随机定位 {len(clusters)} 次，抽取 {len(sampled)} 个行键")
+        return clusters
     
-    def get_all_rowkeys(self, table, max_rows: Optional[int] = None) -> List[str]:
-        """获取表中所有行键"""
-        rowkeys = []
+    def validate_by_sampling(self, sample_size: int = 10000, max_workers: int = 10,
+                             progress_callback=None, batch_size: int = 100, run_length: int = 10,
+                             seed: Optional[int] = None, split_points: Optional[List[bytes]] = None,
+                             confidence: float = 0.95) -> ValidationResult:
+        """
+        分层随机抽样验证
+        
+        按region分层随机定位抽取约sample_size行（见sample_rowkeys），按批对比后
+        在mode_info中给出不一致率估计及其Wilson置信区间。同一次定位取到的连续行
+        是一个整群，区间按整群的设计效应折算有效样本量。
+        """
+        start_time = time.time()
+        self.reset_result()
+        
+        clusters = self.sample_rowkeys(sample_size, run_length, seed, split_points)
+        cluster_of = {rowkey: index for index, cluster in enumerate(clusters) for rowkey in cluster}
+        cluster_failures = [0] * len(clusters)
+        
+        def count_failures(results: List[RowResult]):
+            for result in results:
+                if result.status != RowStatus.MATCHED:
+                    cluster_failures[cluster_of[result.rowkey]] += 1
+        
+        rowkeys = sorted(cluster_of)
+        self.commit_observer = count_failures
         try:
-            scan_kwargs = {'columns': []}
-            if max_rows:
-                scan_kwargs['limit'] = max_rows
+            self.run_rowkey_stream(rowkeys, 'sample', len(rowkeys), max_workers, progress_callback,
+                                   batch_size, start_time)
+        finally:
+            self.commit_observer = None
+        design_effect = cluster_design_effect([len(cluster) for cluster in clusters], cluster_failures)
+        self.result.mode_info = mismatch_estimate(self.result.total_rows, self.result.matched_rows, confidence,
+                                                  design_effect=design_effect)
+        self.log_mismatch_estimate()
+        
+        return self.result
+    
+    def log_mismatch_estimate(self):
+        """输出抽样估计结果"""
+        estimate = self.result.mode_info
+        self.logger.info(
+            f"抽样 {estimate['sample_rows']} 行（有效样本 {estimate['effective_sample_rows']:.0f}），"
+            f"不一致率 {estimate['mismatch_rate']:.4%}，"
+            f"{estimate['confidence']:.0%}置信区间 [{estimate['mismatch_rate_low']:.4%}, "
+            f"{estimate['mismatch_rate_high']:.4%}]"
+        )
+    
+    def iter_changed_rowkeys(self, table, since_ms: int, until_ms: int,
+                             row_start: Optional[bytes] = None) -> Iterator[bytes]:
+        """
+        按行键顺序迭代在 [since_ms, until_ms) 内有单元格写入的行
+        
+        HBase Thrift扫描只支持时间上界，这里用KeyOnlyFilter只取单元格时间戳（不传值），
+        上界由服务端过滤，下界在客户端判断。
+        """
+        for key, data in self.scan_table(table, row_start, None, None, filter='KeyOnlyFilter()',
+                                         timestamp=until_ms, include_timestamp=True):
+            if any(ts >= since_ms for _, ts in data.values()):
+                yield key
+    
+    def iter_changed_rowkeys_both(self, since_ms: int, until_ms: int,
+                                  row_start: Optional[bytes] = None) -> Iterator[str]:
+        """归并两端在时间窗口内有变更的行键（去重，保持有序）"""
+        last = None
+        for key in heapq.merge(self.iter_changed_rowkeys(self.key_scan_table('source'), since_ms, until_ms, row_start),
+                               self.iter_changed_rowkeys(self.key_scan_table('target'), since_ms, until_ms, row_start)):
+            if key != last:
+                last = key
+                yield key.decode('utf-8')
+    
+    def validate_incremental(self, watermark_store: WatermarkStore, lag_seconds: float = 60.0,
+                             since_ms: Optional[int] = None, max_workers: int = 10,
+                             progress_callback=None, batch_size: int = 100,
+                             resume: bool = False) -> ValidationResult:
+        """
+        增量验证：只验证上次成功验证之后有写入的行
+        
+        时间窗口为 [上次水位, 当前时间 - lag_seconds)，预留lag_seconds给尚未同步完的写入。
+        两端都扫描窗口内有变更的行键并合并，再按批multi-get对比整行；验证无错误行时
+        把窗口上界记为新水位。注意删除操作不会留下新时间戳，需定期做全量验证。
+        
+        Args:
+            watermark_store: 增量水位文件
+            lag_seconds: 窗口上界距当前时间的秒数
+            since_ms: 手动指定窗口下界（毫秒），默认取上次水位，没有水位时从0开始
+            resume: 从断点继续，沿用断点中的时间窗口
+        """
+        start_time = time.time()
+        
+        # 重置结果
+        state = self.load_checkpoint('incremental', resume)
+        self.reset_result(state)
+        
+        row_start = None
+        committed_rows = 0
+        if state:
+            since_ms, until_ms = state['since_ms'], state['until_ms']
+            committed_rows = state['committed_rows']
+            if state.get('last_rowkey'):
+                row_start = state['last_rowkey'].encode('utf-8') + b'\x00'
+        else:
+            until_ms = int((time.time() - lag_seconds) * 1000)
+            if since_ms is None:
+                since_ms = watermark_store.get(self.source_config.table_name, self.target_config.table_name) or 0
+        
+        self.logger.info(f"增量验证时间窗口: [{since_ms}, {until_ms}) 毫秒")
+        self.result.mode_info = {'since_ms': since_ms, 'until_ms': until_ms}
+        if since_ms >= until_ms:
+            self.logger.warning("时间窗口为空，跳过增量验证")
+            self.finish_result(start_time)
+            return self.result
+        
+        self.run_rowkey_stream(self.iter_changed_rowkeys_both(since_ms, until_ms, row_start), 'incremental', 0,
+                               max_workers, progress_callback, batch_size, start_time, committed_rows,
+                               {'since_ms': since_ms, 'until_ms': until_ms})
+        
+        if self.result.error_rows == 0 and self.result.fetch_failed == 0:
+            watermark_store.set(self.source_config.table_name, self.target_config.table_name,
+                                until_ms, self.result.total_rows)
+            self.logger.info(f"增量水位已更新为 {until_ms}")
+        else:
+            self.logger.warning(f"存在 {self.result.error_rows} 个错误行、{self.result.fetch_failed} 个读取失败的行，"
+                                f"增量水位保持不变")
+        
+        return self.result
+    
+    def scan_table(self, table, row_start: Optional[bytes] = None, row_stop: Optional[bytes] = None,
+                   limit: Optional[int] = None, **kwargs):
+        """
+        按行键顺序扫描表，返回 (行键bytes, 行数据) 迭代器
+        
+        列投影下推到服务端；未指定batch_size时由scan_tuner按扫描类型自适应批大小。
+        """
+        scan_kwargs = dict(kwargs)
+        if self.projection.active:
+            scan_kwargs.setdefault('columns', self.projection.columns)
+            projection_filter = self.projection.scan_filter()
+            if projection_filter:
+                # 投影过滤器放在最前面，FirstKeyOnlyFilter等看到的是投影后的单元格
+                extra_filter = scan_kwargs.get('filter')
+                scan_kwargs['filter'] = f"{projection_filter} AND {extra_filter}" if extra_filter else projection_filter
+        if row_start:
+            scan_kwargs['row_start'] = row_start
+        if row_stop:
+            scan_kwargs['row_stop'] = row_stop
+        if limit:
+            scan_kwargs['limit'] = limit
+        if 'batch_size' in scan_kwargs:
+            return table.scan(**scan_kwargs)
+        return self.scan_tuner.scan(table, (id(table), scan_kwargs.get('filter')), scan_kwargs)
+    
+    def merge_scan_range(self, row_start: Optional[bytes] = None, row_stop: Optional[bytes] = None,
+                         max_rows: Optional[int] = None, on_row=None):
+        """
+        对一个行键区间做有序归并对比
+        
+        两端各打开一个有序scan，按行键归并：只在一端出现的行即为缺失行，
+        两端都有的行直接对比。每行每端只读取一次，且全部为顺序读。
+        
+        Args:
+            row_start: 起始行键（包含），None表示表头
+            row_stop: 结束行键（不包含），None表示表尾
+            max_rows: 最多对比的行数
+            on_row: 每对比完一行的回调，参数为该行的验证结果
+        """
+        source_iter = self.scan_table(self.source_table, row_start, row_stop, max_rows)
+        target_iter = self.scan_table(self.target_table, row_start, row_stop, max_rows)
+        
+        compared = 0
+        chunk = []
+        pending = deque()
+        
+        def deliver(results: List[RowResult]):
+            if on_row:
+                for result in results:
+                    on_row(result)
+        
+        try:
+            source_row = next(source_iter, None)
+            target_row = next(target_iter, None)
+            
+            while source_row is not None or target_row is not None:
+                if max_rows and compared >= max_rows:
+                    break
                 
-            for key, _ in table.scan(**scan_kwargs):
-                rowkeys.append(key.decode('utf-8'))
+                if target_row is None or (source_row is not None and source_row[0] < target_row[0]):
+                    key, source_data, target_data = source_row[0], source_row[1], None
+                    source_row = next(source_iter, None)
+                elif source_row is None or target_row[0] < source_row[0]:
+                    key, source_data, target_data = target_row[0], None, target_row[1]
+                    target_row = next(target_iter, None)
+                else:
+                    key, source_data, target_data = source_row[0], source_row[1], target_row[1]
+                    source_row = next(source_iter, None)
+                    target_row = next(target_iter, None)
                 
-        except Exception as e:
-            self.logger.error(f"获取行键列表失败: {e}")
+                rowkey = key.decode('utf-8')
+                compared += 1
+                
+                if self.compare_pool:
+                    # 多进程对比：攒满一批提交，最多保留max_pending批在计算中，读取不等待计算
+                    chunk.append((rowkey, source_data or None, target_data or None))
+                    if len(chunk) >= self.compare_pool.chunk_size:
+                        pending.append(self.submit_compare(chunk))
+                        chunk = []
+                        if len(pending) > self.compare_pool.max_pending:
+                            deliver(self.collect_compare(pending.popleft()))
+                    continue
+                
+                try:
+                    result = self.compare_row(rowkey, source_data or None, target_data or None)
+                except Exception as e:
+                    result = self.record_error(rowkey, e)
+                
+                if on_row:
+                    on_row(result)
             
-        return rowkeys
+            if chunk:
+                pending.append(self.submit_compare(chunk))
+            while pending:
+                deliver(self.collect_compare(pending.popleft()))
+        finally:
+            source_iter.close()
+            target_iter.close()
     
-    def validate_by_rowkeys_list(self, rowkeys: List[str], max_workers: int = 10, 
-                                progress_callback=None) -> ValidationResult:
-        """根据行键列表进行验证"""
-        self.logger.info(f"开始验证 {len(rowkeys)} 行数据")
+    def get_key_ranges(self, split_points: Optional[List[bytes]] = None) -> List[Tuple[bytes, bytes]]:
+        """
+        将行键空间切分为若干区间
+        
+        默认按源端表的region边界切分，也可以传入自定义切分点。
+        区间为 [start, stop)，空bytes表示表头/表尾。
+        """
+        if split_points:
+            points = sorted(set(p for p in split_points if p))
+        else:
+            try:
+                regions = self.source_table.regions()
+                points = sorted(set(r['start_key'] for r in regions if r.get('start_key')))
+            except Exception as e:
+                self.logger.warning(f"获取region边界失败，按单区间扫描: {e}")
+                points = []
+        
+        bounds = [b''] + points + [b'']
+        return [(bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1)]
+    
+    def validate_by_merge_scan(self, max_rows: Optional[int] = None, progress_callback=None,
+                               max_workers: int = 10,
+                               split_points: Optional[List[bytes]] = None,
+                               resume: bool = False) -> ValidationResult:
+        """
+        流式归并验证全表
+        
+        与validate_all_data不同，不需要先收集行键再逐行点查，并且能同时发现
+        源端缺失和目标端缺失的行。行键空间按region边界（或split_points）切分，
+        每个区间由独立的工作线程用各自的row_start/row_stop扫描归并。
+        指定max_rows时按单区间从表头开始扫描。resume为True时跳过断点中已完成的区间。
+        """
+        self.logger.info("开始归并扫描验证...")
         start_time = time.time()
+        total = max_rows or 0
+        completed = [0]
+        
+        def merge_range(row_start, row_stop):
+            counters = empty_counters()
+            
+            def on_row(result):
+                self.result_sink.record(result)
+                count_results([result], counters)
+                with self.lock:
+                    completed[0] += 1
+                    current = completed[0]
+                if progress_callback and current % 100 == 0:
+                    progress_callback(current, total)
+            
+            self.merge_scan_range(row_start, row_stop, max_rows, on_row)
+            return counters
+        
+        key_ranges = [(b'', b'')] if max_rows else None
+        self.run_key_ranges('merge', merge_range, key_ranges, split_points, max_workers, start_time, resume)
+        self.logger.info(f"验证完成，共 {self.result.total_rows} 行，耗时 {self.result.validation_time:.2f} 秒")
+        
+        return self.result
+    
+    def run_key_ranges(self, mode: str, range_task, key_ranges: Optional[List[Tuple[bytes, bytes]]],
+                       split_points: Optional[List[bytes]], max_workers: int, start_time: float,
+                       resume: bool):
+        """
+        并行处理行键区间
+        
+        range_task(row_start, row_stop) 返回该区间的计数器。区间完成后才计入断点，
+        断点记录全部区间和已完成区间；恢复时沿用断点中的区间划分，跳过已完成的区间，
+        并从溢出文件中去掉未完成区间里已写入的记录（这些区间会重新验证）。
+        """
+        state = self.load_checkpoint(mode, resume)
+        if state:
+            key_ranges = [(decode_key(start), decode_key(stop)) for start, stop in state['key_ranges']]
+            completed_ranges = [tuple(r) for r in state['completed_ranges']]
+        else:
+            key_ranges = key_ranges or self.get_key_ranges(split_points)
+            completed_ranges = []
+        
+        done = set(completed_ranges)
+        done_bytes = [(decode_key(start), decode_key(stop)) for start, stop in completed_ranges]
+        
+        def in_completed_range(record):
+            key = record['rowkey'].encode('utf-8')
+            return any(start <= key and (not stop or key < stop) for start, stop in done_bytes)
         
         # 重置结果
-        self.result = ValidationResult()
+        self.reset_result(state, in_completed_range)
+        
+        pending = [r for r in key_ranges if (encode_key(r[0]), encode_key(r[1])) not in done]
+        self.logger.info(f"行键空间切分为 {len(key_ranges)} 个区间，待验证 {len(pending)} 个，并发数 {max_workers}")
+        progress = {
+            'key_ranges': [[encode_key(start), encode_key(stop)] for start, stop in key_ranges],
+            'completed_ranges': [list(r) for r in completed_ranges]
+        }
+        finished = False
+        
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                future_to_range = {
+                    executor.submit(range_task, row_start, row_stop): (row_start, row_stop)
+                    for row_start, row_stop in pending
+                }
+                
+                for future in as_completed(future_to_range):
+                    row_start, row_stop = future_to_range[future]
+                    try:
+                        counters = future.result()
+                    except Exception as e:
+                        self.logger.error(f"区间 [{row_start!r}, {row_stop!r}) 验证失败: {e}")
+                        continue
+                    
+                    for field, value in counters.items():
+                        self.committed_counters[field] += value
+                    progress['completed_ranges'].append([encode_key(row_start), encode_key(row_stop)])
+                    self.save_checkpoint(mode, start_time, progress)
+            finished = True
+        finally:
+            if not finished:
+                self.save_checkpoint(mode, start_time, progress, force=True)
+        
+        self.finish_result(start_time)
+    
+    def count_range(self, table, row_start: bytes, row_stop: bytes) -> int:
+        """用只取行键的扫描统计区间 [row_start, row_stop) 内的行数"""
+        rows = 0
+        for _ in self.scan_table(table, row_start, row_stop, filter=KEY_ONLY_FILTER):
+            rows += 1
+        return rows
+    
+    def validate_by_count(self, progress_callback=None, max_workers: int = 10,
+                          split_points: Optional[List[bytes]] = None) -> ValidationResult:
+        """
+        按区间核对两端行数
+        
+        行键空间按region边界（或split_points）切分，两端每个区间各做一次只取行键的
+        并行扫描（行很小，自适应批大小会很快增长到上限，RPC次数很少），
+        在mode_info['range_counts']中给出每个区间的行数差，用于在深度对比前
+        快速找出需要全量验证的区间。
+        
+        只比较行数时无法区分具体的行，计数器按区间折算：两端行数的较小值计为匹配，
+        差值计为对应一端的缺失，因此缺失数是下界，数据不一致不会被发现。
+        计数失败的区间delta为None，不计入计数器。
+        """
+        self.logger.info("开始按区间核对行数...")
+        start_time = time.time()
+        self.reset_result()
+        
+        key_ranges = self.get_key_ranges(split_points)
+        total = len(key_ranges)
+        self.logger.info(f"行键空间切分为 {total} 个区间，并发数 {max_workers}")
+        counts = {}
         
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # 提交所有任务
-            future_to_rowkey = {
-                executor.submit(self.validate_single_row, rowkey): rowkey 
-                for rowkey in rowkeys
-            }
+            future_to_task = {}
+            for row_start, row_stop in key_ranges:
+                for side, table in (('source', self.source_table), ('target', self.target_table)):
+                    future = executor.submit(self.count_range, table, row_start, row_stop)
+                    future_to_task[future] = (row_start, row_stop, side)
             
-            completed = 0
-            for future in as_completed(future_to_rowkey):
-                rowkey = future_to_rowkey[future]
+            for future in as_completed(future_to_task):
+                row_start, row_stop, side = future_to_task[future]
                 try:
-                    result = future.result()
-                    self.result.details.append(result)
-                    
-                    completed += 1
-                    if progress_callback and completed % 100 == 0:
-                        progress_callback(completed, len(rowkeys))
-                        
+                    rows = future.result()
                 except Exception as e:
-                    self.logger.error(f"处理行键 {rowkey} 时出错: {e}")
+                    self.logger.error(f"区间 [{row_start!r}, {row_stop!r}) {side}端计数失败: {e}")
+                    rows = None
+                
+                range_counts = counts.setdefault((row_start, row_stop), {})
+                range_counts[side] = rows
+                if len(range_counts) == 2 and progress_callback:
+                    progress_callback(sum(len(c) == 2 for c in counts.values()), total)
         
+        range_report = []
+        for row_start, row_stop in key_ranges:
+            source_rows = counts[(row_start, row_stop)]['source']
+            target_rows = counts[(row_start, row_stop)]['target']
+            entry = {
+                'row_start': row_start.decode('utf-8', 'backslashreplace'),
+                'row_stop': row_stop.decode('utf-8', 'backslashreplace'),
+                'source_rows': source_rows,
+                'target_rows': target_rows,
+                'delta': None if source_rows is None or target_rows is None else target_rows - source_rows
+            }
+            range_report.append(entry)
+            
+            if entry['delta'] is None:
+                continue
+            self.result.total_rows += max(source_rows, target_rows)
+            self.result.matched_rows += min(source_rows, target_rows)
+            self.result.missing_in_target += max(0, -entry['delta'])
+            self.result.missing_in_source += max(0, entry['delta'])
+        
+        differing = [entry for entry in range_report if entry['delta'] != 0]
+        self.result_sink.close()
+        self.result.mode_info = {
+            'count_only': True,
+            'source_rows': sum(entry['source_rows'] or 0 for entry in range_report),
+            'target_rows': sum(entry['target_rows'] or 0 for entry in range_report),
+            'differing_ranges': len(differing),
+            'failed_ranges': sum(entry['delta'] is None for entry in range_report),
+            'range_counts': range_report
+        }
         self.result.validation_time = time.time() - start_time
-        self.logger.info(f"验证完成，耗时 {self.result.validation_time:.2f} 秒")
+        
+        self.logger.info(
+            f"行数核对完成，源端 {self.result.mode_info['source_rows']} 行，"
+            f"目标端 {self.result.mode_info['target_rows']} 行，"
+            f"{len(differing)}/{total} 个区间行数不一致，耗时 {self.result.validation_time:.2f} 秒"
+        )
         
         return self.result
     
-    def validate_all_data(self, max_rows: Optional[int] = None, max_workers: int = 10,
-                         progress_callback=None) -> ValidationResult:
-        """验证所有数据"""
-        # 获取源端所有行键
-        self.logger.info("获取源端行键列表...")
-        source_rowkeys = self.get_all_rowkeys(self.source_table, max_rows)
+    def merkle_compare_range(self, row_start: bytes, row_stop: bytes, leaf_rows: int = 1000,
+                             on_row=None, on_matched=None) -> Dict:
+        """
+        按叶子区间摘要对比一个行键区间
+        
+        两端同时顺序扫描一遍，源端每leaf_rows行切出一个叶子，目标端行键小于下一个叶子
+        起点的行归入当前叶子。叶子在内存中缓存到结束，两端的 (行键, 行摘要) 序列相同时
+        整个叶子直接计为匹配，不生成逐行结果；不同时用已读取的行逐行对比，不再重新扫描。
+        
+        读取量与归并扫描相同（每行每端读取一次整行），省下的是一致叶子的逐行结果和记录开销；
+        内存占用为两端各一个叶子的行数据。
+        
+        Args:
+            row_start: 起始行键（包含）
+            row_stop: 结束行键（不包含）
+            leaf_rows: 每个叶子包含的源端行数
+            on_row: 摘要不同的叶子中逐行对比的每行结果回调
+            on_matched: 回调，参数为摘要一致直接计为匹配的行数
+        
+        Returns:
+            区间统计：叶子数、摘要不同的叶子数、逐行对比的行数
+        """
+        stats = {'leaves': 0, 'differing_leaves': 0, 'compared_rows': 0}
         
-        if not source_rowkeys:
-            self.logger.warning("源端没有数据")
-            return ValidationResult()
+        def digests(rows):
+            return [(key, self.timed_digest(data)) for key, data in rows]
         
-        return self.validate_by_rowkeys_list(source_rowkeys, max_workers, progress_callback)
+        def close_leaf(source_rows, target_rows):
+            stats['leaves'] += 1
+            if digests(source_rows) == digests(target_rows):
+                with self.lock:
+                    self.result.matched_rows += len(source_rows)
+                    self.result.total_rows += len(source_rows)
+                if on_matched and source_rows:
+                    on_matched(len(source_rows))
+                return
+            
+            stats['differing_leaves'] += 1
+            source_data = dict(source_rows)
+            target_data = dict(target_rows)
+            for key in sorted(source_data.keys() | target_data.keys()):
+                rowkey = key.decode('utf-8')
+                try:
+                    result = self.compare_row(rowkey, source_data.get(key), target_data.get(key))
+                except Exception as e:
+                    result = self.record_error(rowkey, e)
+                stats['compared_rows'] += 1
+                if on_row:
+                    on_row(result)
+        
+        source_iter = self.scan_table(self.source_table, row_start, row_stop)
+        target_iter = self.scan_table(self.target_table, row_start, row_stop)
+        try:
+            target_row = next(target_iter, None)
+            source_rows, target_rows = [], []
+            for key, data in source_iter:
+                if len(source_rows) >= leaf_rows:
+                    # key是下一个叶子的起点，目标端行键小于它的行属于当前叶子
+                    while target_row is not None and target_row[0] < key:
+                        target_rows.append(target_row)
+                        target_row = next(target_iter, None)
+                    close_leaf(source_rows, target_rows)
+                    source_rows, target_rows = [], []
+                source_rows.append((key, data))
+            
+            while target_row is not None:
+                target_rows.append(target_row)
+                target_row = next(target_iter, None)
+            if source_rows or target_rows:
+                close_leaf(source_rows, target_rows)
+        finally:
+            source_iter.close()
+            target_iter.close()
+        
+        return stats
+    
+    def validate_by_merkle(self, progress_callback=None, max_workers: int = 10,
+                           split_points: Optional[List[bytes]] = None,
+                           leaf_rows: int = 1000,
+                           resume: bool = False) -> ValidationResult:
+        """
+        叶子区间摘要验证全表（见merkle_compare_range）
+        
+        适合两端几乎一致的场景：摘要一致的叶子整体计为匹配，不生成逐行结果；
+        只有摘要不同的叶子才用已读取的行逐行对比，并按原有的缺失/不一致分类记录。
+        每端整行读取一遍，读取量与归并扫描相同。
+        行键空间按region边界（或split_points）切分后由工作线程并行处理。
+        """
+        self.logger.info(f"开始区间摘要验证 (叶子行数: {leaf_rows})...")
+        start_time = time.time()
+        completed = [0]
+        stats = {'leaves': 0, 'differing_leaves': 0, 'compared_rows': 0}
+        
+        def add_completed(count):
+            with self.lock:
+                completed[0] += count
+                current = completed[0]
+            if progress_callback:
+                progress_callback(current, 0)
+        
+        def merkle_range(row_start, row_stop):
+            counters = empty_counters()
+            
+            def on_row(result):
+                self.result_sink.record(result)
+                count_results([result], counters)
+                add_completed(1)
+            
+            def on_matched(count):
+                counters['total_rows'] += count
+                counters['matched_rows'] += count
+                add_completed(count)
+            
+            range_stats = self.merkle_compare_range(row_start, row_stop, leaf_rows, on_row, on_matched)
+            with self.lock:
+                for name, value in range_stats.items():
+                    stats[name] += value
+            return counters
+        
+        self.run_key_ranges('merkle', merkle_range, None, split_points, max_workers, start_time, resume)
+        self.logger.info(
+            f"验证完成，共 {self.result.total_rows} 行，叶子 {stats['leaves']} 个，"
+            f"摘要不同 {stats['differing_leaves']} 个，逐行对比 {stats['compared_rows']} 行，"
+            f"耗时 {self.result.validation_time:.2f} 秒"
+        )
+        
+        return self.result
     
     def generate_report(self) -> Dict:
         """生成验证报告"""
@@ -347,6 +1388,7 @@ class HBaseDataValidator:
                 'missing_in_source': self.result.missing_in_source,
                 'data_mismatch': self.result.data_mismatch,
                 'error_rows': self.result.error_rows,
+                'fetch_failed': self.result.fetch_failed,
                 'success_rate': f"{self.result.success_rate:.2f}%",
                 'validation_time': f"{self.result.validation_time:.2f}秒"
             },
@@ -354,15 +1396,25 @@ class HBaseDataValidator:
                 'source': {
                     'host': self.source_config.host,
                     'port': self.source_config.port,
-                    'table': self.source_config.table_name
+                    'table': self.source_config.table_name,
+                    'max_requests_per_second': self.source_config.max_requests_per_second,
+                    'max_bytes_per_second': self.source_config.max_bytes_per_second
                 },
                 'target': {
                     'host': self.target_config.host,
                     'port': self.target_config.port,
-                    'table': self.target_config.table_name
-                }
+                    'table': self.target_config.table_name,
+                    'max_requests_per_second': self.target_config.max_requests_per_second,
+                    'max_bytes_per_second': self.target_config.max_bytes_per_second
+                },
+                'digest': self.row_digest.algorithm,
+                'columns': self.projection.describe(),
+                'scan_batch_size': self.scan_tuner.fixed_batch_size or 'auto'
             },
-            'details': self.result.details,
+            'details': list(self.result.details.dicts()) if self.include_details else [],
+            'spill_file': self.result.spill_file,
+            'spilled_rows': self.result.spilled_rows,
+            'mode_info': self.result.mode_info,
             'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
         }
         
@@ -377,7 +1429,7 @@ class HBaseDataValidator:
         
         try:
             with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(report, f, ensure_ascii=False, indent=2)
+                json.dump(report, f, ensure_ascii=False, indent=2, default=str)
             
             self.logger.info(f"验证报告已保存到: {filename}")
             return filename
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行指标
+读取路径上各阶段（源端读取、目标端读取、摘要计算、逐列对比、结果记录）的延迟直方图
+和行数、RPC次数、重试次数等计数器，按Prometheus文本格式在可选的 /metrics 端点暴露，
+验证进行中即可看出时间花在哪里、瓶颈在源端还是目标端。
+只依赖标准库，未启动HTTP端点时只在内存中累加。
+"""
+
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from scan_tuning import DEFAULT_BATCH_SIZE
+
+# 延迟直方图的桶上界（秒），覆盖亚毫秒级摘要计算到秒级的慢RPC
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """指标族：同名、同标签名的一组时间序列"""
+
+    type_name = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """按标签值取得（或创建）一个时间序列"""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def collect(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+        with self._lock:
+            children = sorted(self._children.items())
+        for values, child in children:
+            lines.extend(self._format_child(values, child))
+        return lines
+
+    def _format_child(self, values, child) -> List[str]:
+        return [f'{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}']
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeChild(_CounterChild):
+    def set(self, value: float):
+        self.value = value
+
+
+class _HistogramChild:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        """统计with块的耗时"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+    type_name = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+
+class Gauge(_Metric):
+    """可任意设置的瞬时值"""
+    type_name = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+
+class Histogram(_Metric):
+    """累积桶直方图"""
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def _format_child(self, values, child) -> List[str]:
+        with child._lock:
+            counts = list(child.counts)
+            total = child.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}')
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+        lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"指标已注册: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def exposition(self) -> str:
+        """Prometheus文本格式（0.0.4）"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'hbase_validator_stage_seconds',
+    '各阶段耗时（秒）：source_fetch/target_fetch为一次RPC（扫描为一批），hash/compare/record为一行，'
+    'process_compare为多进程对比的一批',
+    ['stage'])
+RPC_TOTAL = REGISTRY.counter(
+    'hbase_validator_rpc_total', '读取请求数（扫描按批计）', ['side', 'op'])
+RPC_ERRORS = REGISTRY.counter(
+    'hbase_validator_rpc_errors_total', '重试后仍失败的读取请求数', ['side', 'op'])
+RETRIES = REGISTRY.counter(
+    'hbase_validator_retries_total', '瞬时读取错误的重试次数', ['side'])
+ROWS = REGISTRY.counter(
+    'hbase_validator_rows_total', '已记录的验证结果行数', ['status'])
+CONCURRENCY_LIMIT = REGISTRY.gauge(
+    'hbase_validator_concurrency_limit', '自适应并发的当前上限')
+PIPELINE_QUEUE = REGISTRY.gauge(
+    'hbase_validator_pipeline_queue_batches', '读取流水线中两端已读取、等待对比的批次数')
+
+# 逐行阶段的直方图，热路径上直接引用，避免每行查找标签
+HASH = STAGE_SECONDS.labels('hash')
+COMPARE = STAGE_SECONDS.labels('compare')
+RECORD = STAGE_SECONDS.labels('record')
+# 多进程对比时一批行从提交到得出结论的耗时
+PROCESS_COMPARE = STAGE_SECONDS.labels('process_compare')
+
+
+class MeteredTable:
+    """在表对象外加一层计时和计数，接口与happybase.Table一致"""
+
+    def __init__(self, table, side: str):
+        """
+        Args:
+            table: 被包装的表对象
+            side: 指标中的端标签（source/target）
+        """
+        self.table = table
+        self.stage = STAGE_SECONDS.labels(f'{side}_fetch')
+        self._ops = {op: (RPC_TOTAL.labels(side, op), RPC_ERRORS.labels(side, op))
+                     for op in ('get', 'multi_get', 'scan', 'meta')}
+
+    @property
+    def name(self):
+        return self.table.name
+
+    def _call(self, op: str, method: str, *args, **kwargs):
+        calls, errors = self._ops[op]
+        calls.inc()
+        started = time.perf_counter()
+        try:
+            return getattr(self.table, method)(*args, **kwargs)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            self.stage.observe(time.perf_counter() - started)
+
+    def row(self, row, *args, **kwargs):
+        return self._call('get', 'row', row, *args, **kwargs)
+
+    def rows(self, rows, *args, **kwargs):
+        return self._call('multi_get', 'rows', rows, *args, **kwargs)
+
+    def regions(self):
+        return self._call('meta', 'regions')
+
+    def families(self):
+        return self._call('meta', 'families')
+
+    def scan(self, **kwargs):
+        """扫描按批计时：一批batch_size行的等待时间之和记为一次RPC"""
+        calls, errors = self._ops['scan']
+        batch_size = kwargs.get('batch_size') or DEFAULT_BATCH_SIZE
+        scanner = iter(self.table.scan(**kwargs))
+        try:
+            rows_in_batch = 0
+            waited = 0.0
+            while True:
+                started = time.perf_counter()
+                try:
+                    item = next(scanner)
+                except StopIteration:
+                    break
+                except Exception:
+                    errors.inc()
+                    raise
+                finally:
+                    waited += time.perf_counter() - started
+                rows_in_batch += 1
+                if rows_in_batch >= batch_size:
+                    calls.inc()
+                    self.stage.observe(waited)
+                    rows_in_batch = 0
+                    waited = 0.0
+                yield item
+            if rows_in_batch or waited:
+                calls.inc()
+                self.stage.observe(waited)
+        finally:
+            scanner.close()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.registry.exposition().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: int, host: str = '0.0.0.0') -> Optional[ThreadingHTTPServer]:
+    """
+    在后台线程启动 /metrics 端点，同一进程内重复调用只启动一次（Streamlit每次交互都会重跑脚本）
+
+    Args:
+        port: 监听端口，0或None表示不启动
+        host: 监听地址
+    """
+    global _server
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name='metrics-server', daemon=True).start()
+            logging.getLogger(__name__).info(f"指标端点已启动: http://{host}:{port}/metrics")
+        return _server
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多表验证
+按表名列表或命名空间通配符（如 hope_saas_oms:*）一次验证多张表：
+
+- 两端各只创建一组连接池，所有表共享；连接总数即全局并发预算，
+  任意时刻每端在途的RPC数不超过预算。按行键验证时驱动验证的行键扫描在整张表
+  验证期间占用一个连接，这部分连接从预算中单独划出（见connect）
+- 按源端region数从多到少调度，最大的表最先开始，避免最后只剩一张大表在跑
+- 熔断器和限速令牌桶按端点在所有表之间共享
+- 所有表的结果汇总为一份报告
+"""
+
+import fnmatch
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, List, Optional
+
+from connection_pool import HBaseConnectionPool
+from hbase_data_validator import HBaseConnection, HBaseDataValidator, ValidationResult
+from checkpoint import COUNTER_FIELDS
+
+# 验证模式 -> HBaseDataValidator的方法
+MODE_METHODS = {
+    'rowkey': 'validate_all_data',
+    'merge': 'validate_by_merge_scan',
+    'merkle': 'validate_by_merkle',
+    'count': 'validate_by_count',
+    'sample': 'validate_by_sampling',
+    'incremental': 'validate_incremental',
+}
+
+
+@dataclass
+class TableJob:
+    """一张表的验证任务"""
+    source_table: str
+    target_table: str
+    regions: int = 0
+    status: str = 'pending'
+    error: Optional[str] = None
+    report: Optional[Dict] = None
+    result: Optional[ValidationResult] = None
+
+
+def _pattern_regex(pattern: str):
+    """把带*的表名模式转换为正则，每个*是一个捕获组"""
+    return re.compile('^' + '(.*)'.join(re.escape(part) for part in pattern.split('*')) + '$')
+
+
+def map_table_name(source_table: str, table_mapping: Optional[Dict[str, str]] = None) -> str:
+    """
+    源端表名映射为目标端表名
+
+    先按完整表名匹配；再按通配模式匹配，目标模式中的*依次替换为源端*匹配到的内容，
+    如 "ns_old:*" -> "ns_new:*"。没有匹配的规则时两端同名。
+    """
+    table_mapping = table_mapping or {}
+    if source_table in table_mapping:
+        return table_mapping[source_table]
+
+    for source_pattern, target_pattern in table_mapping.items():
+        if '*' not in source_pattern:
+            continue
+        match = _pattern_regex(source_pattern).match(source_table)
+        if match:
+            target = target_pattern
+            for captured in match.groups():
+                target = target.replace('*', captured, 1)
+            return target
+    return source_table
+
+
+def parse_table_mapping(value) -> Dict[str, str]:
+    """解析表名映射，支持字典或 "源=目标,源=目标" 字符串"""
+    if not value:
+        return {}
+    if isinstance(value, dict):
+        return dict(value)
+    mapping = {}
+    for item in value.split(','):
+        if '=' in item:
+            source, target = item.split('=', 1)
+            mapping[source.strip()] = target.strip()
+    return mapping
+
+
+def _safe_name(table_name: str) -> str:
+    return re.sub(r'[^0-9A-Za-z_.-]', '_', table_name)
+
+
+class MultiTableValidator:
+    """多表验证调度器"""
+
+    def __init__(self, source_config: HBaseConnection, target_config: HBaseConnection,
+                 tables: List[str], table_mapping: Optional[Dict[str, str]] = None,
+                 budget: int = 32, parallel_tables: int = 4,
+                 validator_options: Optional[Dict] = None,
+                 connection_factory: Optional[Callable] = None):
+        """
+        初始化多表验证
+
+        Args:
+            source_config: 源端连接配置（table_name不使用）
+            target_config: 目标端连接配置（table_name不使用）
+            tables: 源端表名或通配模式列表，如 ["hope_saas_oms:*"]
+            table_mapping: 源端 -> 目标端表名映射，支持通配模式
+            budget: 全局并发预算，即每端的连接总数
+            parallel_tables: 同时验证的表数
+            validator_options: 传给每张表HBaseDataValidator的参数
+            connection_factory: 连接构造函数，默认happybase.Connection
+        """
+        self.source_config = source_config
+        self.target_config = target_config
+        self.tables = tables
+        self.table_mapping = table_mapping or {}
+        self.budget = max(budget, 1)
+        self.parallel_tables = max(parallel_tables, 1)
+        self.connection_factory = connection_factory
+        self.validator_options = dict(validator_options or {})
+        # 全局预算由共享连接池控制，单表不再做自适应并发
+        self.validator_options.pop('max_concurrency', None)
+        self.validator_options.pop('pool_size', None)
+
+        # 行键扫描每张表占用一个连接，最多parallel_tables个，读取至少保留一个连接
+        # （预算为1时无法划分，行键扫描另占一个连接）
+        self.key_scan_size = max(1, min(self.parallel_tables, self.budget - 1))
+        self.fetch_size = max(self.budget - self.key_scan_size, 1)
+
+        self.source_pool = None
+        self.target_pool = None
+        self.key_scan_pools: Dict[str, HBaseConnectionPool] = {}
+        self.breakers = {}
+        self.rate_limiters = {}
+        self.jobs: List[TableJob] = []
+        self.validation_time = 0.0
+        self.connect_lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def create_pool(self, config: HBaseConnection, size: int) -> HBaseConnectionPool:
+        return HBaseConnectionPool(config.host, config.port, config.timeout, size,
+                                   connection_factory=self.connection_factory)
+
+    def connect(self) -> bool:
+        """
+        创建两端共享的连接池
+
+        每端fetch_size个连接用于读取，key_scan_size个连接用于驱动按行键验证的行键扫描。
+        行键扫描与读取分开，行键扫描占满连接时读取线程不会等不到连接（反之亦然）。
+        """
+        try:
+            self.source_pool = self.create_pool(self.source_config, self.fetch_size)
+            self.target_pool = self.create_pool(self.target_config, self.fetch_size)
+            self.key_scan_pools = {
+                'source': self.create_pool(self.source_config, self.key_scan_size),
+                'target': self.create_pool(self.target_config, self.key_scan_size),
+            }
+            self.source_pool.tables()
+            self.target_pool.tables()
+            return True
+        except Exception as e:
+            self.logger.error(f"连接HBase失败: {e}")
+            return False
+
+    def disconnect(self):
+        """关闭共享连接池"""
+        for pool in (self.source_pool, self.target_pool, *self.key_scan_pools.values()):
+            if pool:
+                pool.close()
+
+    def resolve_jobs(self) -> List[TableJob]:
+        """展开表名模式，映射目标端表名，并按源端region数从多到少排序"""
+        source_tables = [name.decode('utf-8') for name in self.source_pool.tables()]
+        target_tables = set(name.decode('utf-8') for name in self.target_pool.tables())
+
+        selected = []
+        for pattern in self.tables:
+            matched = fnmatch.filter(source_tables, pattern) if '*' in pattern or '?' in pattern else \
+                [pattern] if pattern in source_tables else []
+            if not matched:
+                self.logger.warning(f"源端没有匹配的表: {pattern}")
+            selected.extend(name for name in matched if name not in selected)
+
+        jobs = []
+        for source_table in selected:
+            job = TableJob(source_table, map_table_name(source_table, self.table_mapping))
+            if job.target_table not in target_tables:
+                job.status = 'failed'
+                job.error = f"目标端表不存在: {job.target_table}"
+            else:
+                try:
+                    job.regions = len(self.source_pool.table(source_table).regions())
+                except Exception as e:
+                    self.logger.warning(f"获取 {source_table} 的region失败: {e}")
+            jobs.append(job)
+
+        jobs.sort(key=lambda job: (-job.regions, job.source_table))
+        self.jobs = jobs
+        return jobs
+
+    def create_table_validator(self, job: TableJob) -> HBaseDataValidator:
+        """为一张表创建使用共享连接池的验证器，断点和溢出文件按表分开"""
+        options = dict(self.validator_options)
+        safe_name = _safe_name(job.source_table)
+        if options.get('checkpoint_file'):
+            base, ext = os.path.splitext(options['checkpoint_file'])
+            options['checkpoint_file'] = f"{base}.{safe_name}{ext or '.json'}"
+        if options.get('spill_dir'):
+            options['spill_dir'] = os.path.join(options['spill_dir'], safe_name)
+
+        validator = HBaseDataValidator(
+            replace(self.source_config, table_name=job.source_table),
+            replace(self.target_config, table_name=job.target_table),
+            pool_size=self.fetch_size, source_pool=self.source_pool, target_pool=self.target_pool,
+            key_scan_pools=self.key_scan_pools, connection_factory=self.connection_factory,
+            **options
+        )
+        # 熔断和限速按端点在所有表之间共享
+        validator.breakers = self.breakers
+        validator.rate_limiters = self.rate_limiters
+        return validator
+
+    def validate_table(self, job: TableJob, mode: str, mode_kwargs: Dict):
+        """验证一张表，结果写入job"""
+        validator = self.create_table_validator(job)
+        job.status = 'running'
+        try:
+            # 串行连接，保证每个端点只创建一个熔断器和令牌桶
+            with self.connect_lock:
+                connected = validator.connect_source() and validator.connect_target()
+            if not connected:
+                raise RuntimeError("连接或表检查失败")
+            method = getattr(validator, MODE_METHODS[mode])
+            job.result = method(max_workers=self.fetch_size, **mode_kwargs)
+            job.report = validator.generate_report()
+            job.status = 'done'
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+            self.logger.error(f"表 {job.source_table} 验证失败: {e}")
+        finally:
+            validator.disconnect()
+
+    def run(self, mode: str = 'merge', progress_callback=None, **mode_kwargs) -> List[TableJob]:
+        """
+        验证所有表
+
+        Args:
+            mode: 验证模式，见MODE_METHODS
+            progress_callback: 每完成一张表的回调，参数为 (已完成表数, 总表数)
+            mode_kwargs: 传给对应验证方法的其他参数（max_workers由全局预算决定）
+        """
+        if mode not in MODE_METHODS:
+            raise ValueError(f"多表验证不支持的模式: {mode}")
+
+        start_time = time.time()
+        jobs = self.resolve_jobs()
+        pending = [job for job in jobs if job.status == 'pending']
+        self.logger.info(f"共 {len(jobs)} 张表，待验证 {len(pending)} 张，"
+                         f"同时验证 {self.parallel_tables} 张，全局并发预算 {self.budget}")
+
+        completed = len(jobs) - len(pending)
+        with ThreadPoolExecutor(max_workers=self.parallel_tables) as executor:
+            futures = [executor.submit(self.validate_table, job, mode, mode_kwargs) for job in pending]
+            for future in as_completed(futures):
+                future.result()
+                completed += 1
+                if progress_callback:
+                    progress_callback(completed, len(jobs))
+
+        self.validation_time = time.time() - start_time
+        summary = self.summary()
+        self.logger.info(f"多表验证完成，{summary['tables']} 张表中 {summary['failed_tables']} 张失败，"
+                         f"共 {summary['total_rows']} 行，耗时 {self.validation_time:.2f} 秒")
+        return jobs
+
+    def summary(self) -> Dict:
+        """所有表的汇总统计"""
+        totals = {field: 0 for field in COUNTER_FIELDS}
+        for job in self.jobs:
+            if job.result:
+                for field in COUNTER_FIELDS:
+                    totals[field] += getattr(job.result, field)
+
+        success_rate = totals['matched_rows'] / totals['total_rows'] * 100 if totals['total_rows'] else 0.0
+        return {
+            'tables': len(self.jobs),
+            'failed_tables': sum(job.status == 'failed' for job in self.jobs),
+            'inconsistent_tables': sum(1 for job in self.jobs
+                                       if job.result and job.result.matched_rows != job.result.total_rows),
+            **totals,
+            'success_rate': f"{success_rate:.2f}%",
+            'validation_time': f"{self.validation_time:.2f}秒"
+        }
+
+    def generate_report(self) -> Dict:
+        """生成合并报告"""
+        return {
+            'summary': self.summary(),
+            'configuration': {
+                'source': {'host': self.source_config.host, 'port': self.source_config.port},
+                'target': {'host': self.target_config.host, 'port': self.target_config.port},
+                'tables': self.tables,
+                'table_mapping': self.table_mapping,
+                'budget': self.budget,
+                'parallel_tables': self.parallel_tables
+            },
+            'tables': [
+                {
+                    'source_table': job.source_table,
+                    'target_table': job.target_table,
+                    'regions': job.regions,
+                    'status': job.status,
+                    'error': job.error,
+                    'report': job.report
+                }
+                for job in self.jobs
+            ],
+            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+    def save_report(self, filename: str = None) -> Optional[str]:
+        """保存合并报告"""
+        if filename is None:
+            filename = f"hbase_multi_table_report_{int(time.time())}.json"
+
+        try:
+            with open(filename, 'w', encoding='utf-8') as f:
+                json.dump(self.generate_report(), f, ensure_ascii=False, indent=2, default=str)
+            self.logger.info(f"多表验证报告已保存: {filename}")
+            return filename
+        except Exception as e:
+            self.logger.error(f"保存多表验证报告失败: {e}")
+            return None
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+采样剖析
+后台线程按固定间隔用sys._current_frames()采集所有验证线程的调用栈，按阶段归类
+（Thrift读取、等待连接、限速、重试退避、摘要计算、逐列对比、锁等待、结果记录、等待任务完成），
+输出折叠栈文件（每行 "阶段;帧;帧;... 次数"，可直接用flamegraph.pl或speedscope生成火焰图）
+和热点函数汇总。只采集调用栈中包含本项目代码的线程，空闲的线程池线程和Web框架线程不计入。
+"""
+
+import json
+import linecache
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+# 默认采样间隔（秒）
+DEFAULT_INTERVAL = 0.01
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 从栈顶向下找到的第一个匹配帧决定样本所属阶段：(文件名或模块目录, 函数名或None, 阶段)
+STAGE_RULES = [
+    ('hbase_data_validator.py', 'compare_row_details', 'compare'),
+    ('hbase_data_validator.py', 'timed_digest', 'hash'),
+    ('row_digest.py', None, 'hash'),
+    ('result_sink.py', None, 'record'),
+    ('rate_limit.py', 'acquire', 'rate_limit_wait'),
+    ('resilience.py', 'before_call', 'circuit_open'),
+    ('resilience.py', '_failed', 'retry_backoff'),
+    ('connection_pool.py', '_acquire', 'pool_wait'),
+    ('thriftpy2', None, 'thrift_io'),
+    ('happybase', None, 'thrift_io'),
+    ('fake_hbase.py', None, 'thrift_io'),
+    ('async_engine.py', 'call', 'thrift_io'),
+    ('selectors.py', None, 'thrift_io'),
+    ('socket.py', None, 'thrift_io'),
+    ('ssl.py', None, 'thrift_io'),
+    ('_base.py', 'wait', 'wait'),
+    ('_base.py', 'as_completed', 'wait'),
+]
+
+
+def _matches(filename: str, funcname: str, rule_file: str, rule_func: Optional[str]) -> bool:
+    if rule_func is not None and funcname != rule_func:
+        return False
+    return os.path.basename(filename) == rule_file or f'{os.sep}{rule_file}{os.sep}' in filename
+
+
+def classify(frames: List[Tuple[str, str, int]]) -> str:
+    """
+    按调用栈判断样本所属阶段
+
+    Args:
+        frames: 从根到栈顶的 (文件名, 函数名, 行号) 列表
+    """
+    filename, _, lineno = frames[-1]
+    leaf_line = linecache.getline(filename, lineno).strip() if filename.startswith(PROJECT_DIR) else ''
+    if leaf_line.startswith('with ') and 'lock' in leaf_line:
+        # 本项目代码停在 with xxx.lock: 上，说明正在等待锁
+        return 'lock_wait'
+
+    for filename, funcname, _ in reversed(frames):
+        for rule_file, rule_func, stage in STAGE_RULES:
+            if _matches(filename, funcname, rule_file, rule_func):
+                return stage
+    return 'other'
+
+
+def frame_label(filename: str, funcname: str) -> str:
+    return f"{os.path.splitext(os.path.basename(filename))[0]}:{funcname}"
+
+
+class SamplingProfiler:
+    """采样剖析器，start()/stop()之间在后台线程采样"""
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()  # (阶段, 帧标签元组) -> 样本数
+        self.samples = 0
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self._started = 0.0
+
+    def start(self) -> 'SamplingProfiler':
+        self._stop.clear()
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> 'SamplingProfiler':
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+            self.elapsed += time.perf_counter() - self._started
+        return self
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.sample(exclude=own_id)
+
+    def sample(self, exclude: Optional[int] = None):
+        """采集一次所有线程的调用栈"""
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == exclude:
+                continue
+            frames = []
+            in_project = False
+            while frame is not None:
+                code = frame.f_code
+                frames.append((code.co_filename, code.co_name, frame.f_lineno))
+                in_project = in_project or (code.co_filename.startswith(PROJECT_DIR)
+                                            and code.co_filename != __file__)
+                frame = frame.f_back
+            if not in_project:
+                continue
+            frames.reverse()
+            labels = tuple(frame_label(filename, funcname) for filename, funcname, _ in frames)
+            self.stacks[(classify(frames), labels)] += 1
+            self.samples += 1
+
+    def stage_totals(self) -> Counter:
+        totals = Counter()
+        for (stage, _), count in self.stacks.items():
+            totals[stage] += count
+        return totals
+
+    def hot_functions(self, top_n: int = 15) -> List[Dict]:
+        """按自身样本数（栈顶）排序的热点函数，附带包含子调用的样本数"""
+        self_counts = Counter()
+        total_counts = Counter()
+        for (_, labels), count in self.stacks.items():
+            self_counts[labels[-1]] += count
+            for label in set(labels):
+                total_counts[label] += count
+        return [
+            {'function': label, 'self': count, 'total': total_counts[label],
+             'self_percent': count / self.samples * 100 if self.samples else 0.0,
+             'total_percent': total_counts[label] / self.samples * 100 if self.samples else 0.0}
+            for label, count in self_counts.most_common(top_n)
+        ]
+
+    def summary(self, top_n: int = 15) -> Dict:
+        totals = self.stage_totals()
+        return {
+            'samples': self.samples,
+            'interval_seconds': self.interval,
+            'elapsed_seconds': round(self.elapsed, 3),
+            'stages': {stage: {'samples': count,
+                               'thread_seconds': round(count * self.interval, 3),
+                               'percent': round(count / self.samples * 100, 2) if self.samples else 0.0}
+                       for stage, count in totals.most_common()},
+            'hot_functions': self.hot_functions(top_n)
+        }
+
+    def save(self, path_prefix: str) -> Tuple[str, str]:
+        """写入折叠栈文件（<前缀>.collapsed）和汇总（<前缀>.profile.json），返回两个文件名"""
+        directory = os.path.dirname(path_prefix)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        collapsed_file = f"{path_prefix}.collapsed"
+        with open(collapsed_file, 'w', encoding='utf-8') as f:
+            for (stage, labels), count in sorted(self.stacks.items()):
+                f.write(f"{stage};{';'.join(labels)} {count}\n")
+
+        summary_file = f"{path_prefix}.profile.json"
+        with open(summary_file, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, ensure_ascii=False, indent=2)
+        return collapsed_file, summary_file
+
+    def format_summary(self, top_n: int = 10) -> str:
+        """文本格式的阶段占比和热点函数"""
+        summary = self.summary(top_n)
+        lines = [f"采样 {summary['samples']} 次（间隔 {self.interval * 1000:.0f}ms，"
+                 f"耗时 {summary['elapsed_seconds']:.1f}秒）", "阶段占比（线程时间）:"]
+        for stage, entry in summary['stages'].items():
+            lines.append(f"  {stage:<16}{entry['percent']:>6.1f}%  {entry['thread_seconds']:>8.2f}秒")
+        lines.append(f"热点函数 Top {top_n}（自身 / 含子调用）:")
+        for entry in summary['hot_functions']:
+            lines.append(f"  {entry['self_percent']:>6.1f}% {entry['total_percent']:>6.1f}%  {entry['function']}")
+        return '\n'.join(lines)
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+读取限速
+按端点用令牌桶限制每秒请求数和每秒读取字节数，所有工作线程共享同一组令牌桶，
+点查、批量读取和扫描（每批一次RPC）都计入，避免验证压垮线上集群。
+字节数在响应返回后才知道，先读后扣，超出的部分作为欠账在下一次请求前偿还。
+每个线程在令牌桶上等待的时间单独累计，扫描批大小调整时从RPC耗时中扣除。
+"""
+
+import asyncio
+import threading
+import time
+from typing import Optional
+
+from scan_tuning import DEFAULT_BATCH_SIZE, estimate_row_bytes
+
+# 各线程累计的限速等待时间
+_waits = threading.local()
+
+
+def waited_seconds() -> float:
+    """当前线程累计在令牌桶上等待的秒数"""
+    return getattr(_waits, 'seconds', 0.0)
+
+
+class TokenBucket:
+    """线程安全的令牌桶"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        """
+        Args:
+            rate: 每秒补充的令牌数
+            burst: 桶容量，默认为一秒的令牌数
+        """
+        self.rate = float(rate)
+        self.capacity = float(burst or rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, amount: float = 1.0) -> float:
+        """令牌足够（超过桶容量的请求只需桶满）时扣除amount并返回0，否则返回还需等待的秒数"""
+        needed = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            if self._tokens >= needed:
+                self._tokens -= amount
+                return 0.0
+            return (needed - self._tokens) / self.rate
+
+    def acquire(self, amount: float = 1.0):
+        """等待令牌足够后扣除amount"""
+        while True:
+            wait = self.try_acquire(amount)
+            if not wait:
+                return
+            started = time.perf_counter()
+            time.sleep(wait)
+            _waits.seconds = waited_seconds() + time.perf_counter() - started
+
+    async def acquire_async(self, amount: float = 1.0):
+        """acquire的协程版本，等待时不阻塞事件循环"""
+        while True:
+            wait = self.try_acquire(amount)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def consume(self, amount: float):
+        """直接扣除amount，不等待（可以欠账）"""
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+
+
+class RateLimiter:
+    """单个端点的请求数和字节数限制，0或None表示不限制"""
+
+    def __init__(self, requests_per_second: Optional[float] = None,
+                 bytes_per_second: Optional[float] = None):
+        self.requests_per_second = requests_per_second or None
+        self.bytes_per_second = bytes_per_second or None
+        self.requests = TokenBucket(requests_per_second) if requests_per_second else None
+        self.bytes = TokenBucket(bytes_per_second) if bytes_per_second else None
+
+    @property
+    def active(self) -> bool:
+        return bool(self.requests or self.bytes)
+
+    def before_request(self):
+        """发出一次RPC前调用：等待请求令牌，并等待之前的字节欠账还清"""
+        if self.requests:
+            self.requests.acquire(1)
+        if self.bytes:
+            self.bytes.acquire(0)
+
+    async def before_request_async(self):
+        """before_request的协程版本"""
+        if self.requests:
+            await self.requests.acquire_async(1)
+        if self.bytes:
+            await self.bytes.acquire_async(0)
+
+    def after_response(self, size: int):
+        """收到响应后扣除字节数"""
+        if self.bytes and size:
+            self.bytes.consume(size)
+
+
+class RateLimitedTable:
+    """在表对象外加一层限速，接口与happybase.Table一致"""
+
+    def __init__(self, table, limiter: RateLimiter):
+        self.table = table
+        self.limiter = limiter
+
+    @property
+    def name(self):
+        return self.table.name
+
+    def row(self, row, *args, **kwargs):
+        self.limiter.before_request()
+        data = self.table.row(row, *args, **kwargs)
+        self.limiter.after_response(estimate_row_bytes(row, data) if data else 0)
+        return data
+
+    def rows(self, rows, *args, **kwargs):
+        self.limiter.before_request()
+        result = self.table.rows(rows, *args, **kwargs)
+        self.limiter.after_response(sum(estimate_row_bytes(key, data) for key, data in result))
+        return result
+
+    def regions(self):
+        self.limiter.before_request()
+        return self.table.regions()
+
+    def families(self):
+        self.limiter.before_request()
+        return self.table.families()
+
+    def scan(self, **kwargs):
+        """扫描按批计请求数：打开时一次，之后每batch_size行一次"""
+        batch_size = kwargs.get('batch_size') or DEFAULT_BATCH_SIZE
+        if kwargs.get('limit'):
+            batch_size = min(batch_size, kwargs['limit'])
+
+        self.limiter.before_request()
+        scanner = self.table.scan(**kwargs)
+        try:
+            rows_in_batch = 0
+            for key, data in scanner:
+                self.limiter.after_response(estimate_row_bytes(key, data))
+                yield key, data
+                rows_in_batch += 1
+                if rows_in_batch >= batch_size:
+                    rows_in_batch = 0
+                    self.limiter.before_request()
+        finally:
+            scanner.close()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+读取容错
+瞬时的Thrift超时、传输断开、region迁移等错误按指数退避（带随机抖动）重试；
+同一端点连续失败时熔断，暂停该端的所有请求，等待一段时间后只放一个探测请求，
+成功后恢复。重试耗尽的读取抛出FetchError，由验证器记为读取失败，
+不再与"行不存在"混在一起。
+"""
+
+import logging
+import random
+import socket
+import threading
+import time
+from typing import Callable, Optional
+
+from connection_pool import BROKEN_TRANSPORT_ERRORS
+
+# HBase服务端返回的可恢复错误（region迁移、拆分、队列满等）
+TRANSIENT_SERVER_ERRORS = (
+    'NotServingRegionException',
+    'RegionMovedException',
+    'RegionOpeningException',
+    'RegionTooBusyException',
+    'CallQueueTooBigException',
+    'ServerNotRunningYetException',
+    'RetriesExhaustedException',
+    'SocketTimeoutException',
+)
+
+
+class FetchError(Exception):
+    """重试后仍然读取失败"""
+
+    def __init__(self, side: str, message: str):
+        super().__init__(f"{side}读取失败: {message}")
+        self.side = side
+
+
+def is_transient(error: BaseException) -> bool:
+    """判断错误是否值得重试"""
+    if isinstance(error, BROKEN_TRANSPORT_ERRORS + (socket.timeout, TimeoutError, ConnectionError)):
+        return True
+    message = f"{type(error).__name__} {error}"
+    return any(name in message for name in TRANSIENT_SERVER_ERRORS)
+
+
+class RetryPolicy:
+    """指数退避重试策略（full jitter）"""
+
+    def __init__(self, max_attempts: int = 4, base_delay: float = 0.2, max_delay: float = 10.0):
+        """
+        Args:
+            max_attempts: 包括第一次在内的最大尝试次数
+            base_delay: 第一次重试的退避上限（秒）
+            max_delay: 退避上限（秒）
+        """
+        self.max_attempts = max(max_attempts, 1)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int) -> float:
+        """第attempt次失败后的等待时间，在 [0, base * 2^(attempt-1)] 内均匀随机"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+
+class CircuitBreaker:
+    """
+    单个端点的熔断器
+
+    连续失败达到阈值后熔断reset_timeout秒，期间所有请求在before_call中等待；
+    熔断到期后只放行一个探测请求，探测成功则恢复，失败则再次熔断。
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.logger = logging.getLogger(__name__)
+        self._condition = threading.Condition()
+        self._failures = 0
+        self._open_until = 0.0
+        self._probing = False
+
+    @property
+    def is_open(self) -> bool:
+        return self._failures >= self.failure_threshold
+
+    def _admit(self) -> float:
+        """在锁内判断能否发出请求：能则返回0（熔断到期时占用探测名额），否则返回要等待的秒数"""
+        if not self.is_open:
+            return 0.0
+        remaining = self._open_until - time.time()
+        if remaining > 0:
+            return remaining
+        if not self._probing:
+            self._probing = True
+            return 0.0
+        # 探测请求进行中，等待其结果
+        return self.reset_timeout
+
+    def before_call(self):
+        """熔断期间阻塞，直到本线程可以发出请求"""
+        with self._condition:
+            wait = self._admit()
+            while wait:
+                self._condition.wait(wait)
+                wait = self._admit()
+
+    def try_call(self) -> float:
+        """不阻塞的before_call：返回0表示可以发出请求，否则为需要等待的秒数（异步引擎使用）"""
+        with self._condition:
+            return self._admit()
+
+    def record_success(self):
+        with self._condition:
+            if self.is_open:
+                self.logger.info(f"{self.name} 探测成功，恢复请求")
+            self._failures = 0
+            self._probing = False
+            self._condition.notify_all()
+
+    def record_failure(self):
+        with self._condition:
+            self._failures += 1
+            if self._probing or self._failures == self.failure_threshold:
+                self.logger.warning(f"{self.name} 连续失败 {self._failures} 次，"
+                                    f"暂停请求 {self.reset_timeout:.0f} 秒")
+                self._open_until = time.time() + self.reset_timeout
+            self._probing = False
+            self._condition.notify_all()
+
+
+class ResilientTable:
+    """
+    在表对象外加一层重试和熔断，接口与happybase.Table一致
+
+    scan()失败时从最后一个已返回的行键处重新打开扫描并跳过该行，
+    调用方看到的行序列不重复、不遗漏。
+    """
+
+    def __init__(self, table, side: str, policy: RetryPolicy, breaker: CircuitBreaker,
+                 on_retry: Optional[Callable[[BaseException], None]] = None):
+        """
+        Args:
+            table: 被包装的表对象（PooledTable）
+            side: 端名称，用于错误信息
+            policy: 重试策略
+            breaker: 该端点的熔断器
+            on_retry: 每次可重试的失败后回调，参数为异常
+        """
+        self.table = table
+        self.side = side
+        self.policy = policy
+        self.breaker = breaker
+        self.on_retry = on_retry
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def name(self):
+        return self.table.name
+
+    def retry_delay(self, error: BaseException, attempt: int, action: str) -> float:
+        """处理一次失败：不可重试或重试耗尽时抛出FetchError，否则返回退避等待的秒数"""
+        if not is_transient(error):
+            # 服务端正常返回了错误，端点本身是健康的
+            self.breaker.record_success()
+            raise FetchError(self.side, f"{action}: {error}") from error
+
+        self.breaker.record_failure()
+        if self.on_retry:
+            self.on_retry(error)
+        if attempt >= self.policy.max_attempts:
+            raise FetchError(self.side, f"{action} 重试{attempt}次后仍失败: {error}") from error
+
+        delay = self.policy.delay(attempt)
+        self.logger.debug(f"{self.side}{action}失败，{delay:.2f}秒后第{attempt}次重试: {error}")
+        return delay
+
+    def _failed(self, error: BaseException, attempt: int, action: str):
+        """处理一次失败并退避等待"""
+        time.sleep(self.retry_delay(error, attempt, action))
+
+    def _call(self, action: str, method: str, *args, **kwargs):
+        attempt = 0
+        while True:
+            attempt += 1
+            self.breaker.before_call()
+            try:
+                result = getattr(self.table, method)(*args, **kwargs)
+            except Exception as e:
+                self._failed(e, attempt, action)
+                continue
+            self.breaker.record_success()
+            return result
+
+    def row(self, row, *args, **kwargs):
+        return self._call('点查', 'row', row, *args, **kwargs)
+
+    def rows(self, rows, *args, **kwargs):
+        return self._call('批量读取', 'rows', rows, *args, **kwargs)
+
+    def regions(self):
+        return self._call('获取region', 'regions')
+
+    def families(self):
+        return self._call('获取列族', 'families')
+
+    def scan(self, **kwargs):
+        kwargs = dict(kwargs)
+        remaining = kwargs.get('limit')
+        last_key = None
+        failures = 0
+        while True:
+            self.breaker.before_call()
+            scanner = self.table.scan(**kwargs)
+            received = False
+            try:
+                for key, data in scanner:
+                    if key == last_key:
+                        continue
+                    if not received:
+                        self.breaker.record_success()
+                        received = True
+                        failures = 0
+                    last_key = key
+                    yield key, data
+                    if remaining:
+                        remaining -= 1
+                        if remaining == 0:
+                            return
+            except Exception as e:
+                failures += 1
+                self._failed(e, failures, '扫描')
+                # 从最后返回的行键处重新打开（正向为起点，反向为上界，都包含该行，重新打开后跳过）
+                if last_key is not None:
+                    kwargs['row_start'] = last_key
+                    if remaining:
+                        kwargs['limit'] = remaining + 1
+                continue
+            finally:
+                scanner.close()
+            if not received:
+                self.breaker.record_success()
+            return
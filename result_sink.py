@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+验证结果接收器
+内存中只保留计数器和有上限的样本记录（按列保存在ResultStore中），不一致的行逐条
+追加写入JSONL溢出文件，大规模验证时进程内存不再随行数增长。
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from metrics import RECORD, ROWS
+from result_store import ResultStore, RowResult, RowStatus
+
+# 按状态预先取得行数计数器，热路径上不再逐行查找标签
+_ROW_COUNTERS = [ROWS.labels(status.label) for status in RowStatus]
+
+
+class ResultSink:
+    """验证结果接收器"""
+
+    def __init__(self, include_details: bool = True, max_detail_records: int = 1000,
+                 spill_dir: Optional[str] = None):
+        """
+        初始化结果接收器
+
+        Args:
+            include_details: 是否保留行级明细样本
+            max_detail_records: 内存中最多保留的明细记录数，不一致的行优先保留
+            spill_dir: 溢出文件目录，None表示不写溢出文件
+        """
+        self.include_details = include_details
+        self.max_detail_records = max_detail_records
+        self.spill_dir = spill_dir
+        self.spill_file = None
+        self.spilled_rows = 0
+
+        self._problem_sample = ResultStore()
+        self._matched_sample = ResultStore()
+        self._lock = threading.Lock()
+        self._spill = None
+
+    def _open_spill(self):
+        """第一次出现不一致的行时才创建溢出文件"""
+        if self.spill_file is None:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            self.spill_file = os.path.join(
+                self.spill_dir, f"hbase_validation_spill_{int(time.time() * 1000)}.jsonl"
+            )
+        self._spill = open(self.spill_file, 'a', encoding='utf-8')
+
+    def resume(self, spill_file: Optional[str], offset: int,
+               keep: Optional[Callable[[Dict], bool]] = None):
+        """
+        从断点恢复溢出文件
+
+        截断到断点记录的偏移，丢弃断点之后写入的记录；给出keep时还会去掉
+        断点时尚未提交（恢复后会重新验证）的记录，避免重复。
+        """
+        if not spill_file or not os.path.exists(spill_file):
+            return
+
+        with open(spill_file, 'rb') as f:
+            content = f.read(offset).decode('utf-8')
+
+        kept = []
+        for line in content.splitlines():
+            if line.strip() and (keep is None or keep(json.loads(line))):
+                kept.append(line)
+
+        with open(spill_file, 'w', encoding='utf-8') as f:
+            for line in kept:
+                f.write(line)
+                f.write('\n')
+
+        self.spill_file = spill_file
+        self.spill_dir = os.path.dirname(spill_file) or '.'
+        self.spilled_rows = len(kept)
+
+    def offset(self) -> int:
+        """溢出文件当前长度，用于写入断点"""
+        with self._lock:
+            if self._spill is not None:
+                self._spill.flush()
+                return self._spill.tell()
+        if self.spill_file and os.path.exists(self.spill_file):
+            return os.path.getsize(self.spill_file)
+        return 0
+
+    @property
+    def sample(self) -> ResultStore:
+        """内存中的明细样本（不一致的行在前）"""
+        with self._lock:
+            sample = ResultStore()
+            sample.extend(self._problem_sample)
+            sample.extend(self._matched_sample)
+        return sample
+
+    def record(self, result: RowResult):
+        """记录一行验证结论"""
+        _ROW_COUNTERS[result.status].inc()
+        with RECORD.time():
+            self._record(result)
+
+    def _record(self, result: RowResult):
+        matched = result.status == RowStatus.MATCHED
+
+        with self._lock:
+            if not matched and self.spill_dir:
+                if self._spill is None:
+                    self._open_spill()
+                self._spill.write(json.dumps(result.to_dict(), ensure_ascii=False, default=str))
+                self._spill.write('\n')
+                self.spilled_rows += 1
+
+            if not self.include_details:
+                return
+
+            if len(self._problem_sample) + len(self._matched_sample) < self.max_detail_records:
+                (self._matched_sample if matched else self._problem_sample).append(result)
+            elif not matched and self._matched_sample:
+                # 样本已满时用不一致的行替换匹配的行
+                self._matched_sample.pop()
+                self._problem_sample.append(result)
+
+    def record_many(self, results: List[RowResult]):
+        """批量记录验证结论"""
+        for result in results:
+            self.record(result)
+
+    def flush(self):
+        """刷新溢出文件"""
+        with self._lock:
+            if self._spill is not None:
+                self._spill.flush()
+
+    def close(self):
+        """关闭溢出文件，之后不再接收新的不一致记录"""
+        with self._lock:
+            if self._spill is not None:
+                self._spill.close()
+                self._spill = None
+            self.spill_dir = None
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+紧凑的行验证结果
+每行的验证结果原来是带rowkey/status/details/timestamp的嵌套字典，一致的行还带十六进制摘要，
+每行几百字节的Python对象，其中绝大多数是matched。这里用RowResult元组表示一行结论：
+状态为小整数枚举，摘要为原始bytes，只有不一致/缺失/出错的行才带details字典。
+ResultStore按列保存一组结论：状态、列数、时间戳在array中，行键和摘要拼接在bytes区中按偏移
+切分，details只为非matched的行保存；报告和界面通过records()/dicts()按需还原。
+"""
+
+import time
+from array import array
+from enum import IntEnum
+from typing import Dict, Iterator, NamedTuple, Optional, Sequence
+
+
+class RowStatus(IntEnum):
+    """行验证状态，label为报告、溢出文件和指标中使用的字符串"""
+    MATCHED = 0
+    MISSING_IN_TARGET = 1
+    MISSING_IN_SOURCE = 2
+    DATA_MISMATCH = 3
+    BOTH_MISSING = 4
+    ERROR = 5
+    FETCH_FAILED = 6
+
+    @property
+    def label(self) -> str:
+        return _LABELS[self]
+
+    @classmethod
+    def from_label(cls, label: str) -> 'RowStatus':
+        return cls[label.upper()]
+
+
+_LABELS = [status.name.lower() for status in RowStatus]
+
+
+class RowResult(NamedTuple):
+    """一行的验证结论"""
+    rowkey: str
+    status: RowStatus
+    digest: Optional[bytes] = None   # matched为行摘要，data_mismatch为源端行摘要，其余为None
+    columns: int = 0                 # 源端列数（源端缺失时为目标端列数）
+    timestamp: float = 0.0
+    details: Optional[Dict] = None   # 非matched的行的明细
+
+    def to_dict(self) -> Dict:
+        """还原为报告/溢出文件中的字典格式"""
+        if self.status == RowStatus.MATCHED:
+            details = {
+                'message': '数据完全一致',
+                'columns_count': self.columns,
+                'data_hash': self.digest.hex() if self.digest else ''
+            }
+        else:
+            details = self.details or {}
+        return {
+            'rowkey': self.rowkey,
+            'status': self.status.label,
+            'details': details,
+            'timestamp': self.timestamp
+        }
+
+
+def matched_result(rowkey: str, columns: int, digest: bytes, timestamp: Optional[float] = None) -> RowResult:
+    """一致的行"""
+    return RowResult(rowkey, RowStatus.MATCHED, digest, columns, timestamp or time.time())
+
+
+class ResultStore(Sequence):
+    """按列保存的一组行验证结论，不是线程安全的，由调用方加锁"""
+
+    def __init__(self):
+        self._status = array('B')
+        self._columns = array('I')
+        self._timestamps = array('d')
+        self._keys = bytearray()
+        self._key_offsets = array('Q', [0])
+        self._digests = bytearray()
+        self._digest_offsets = array('Q', [0])
+        self._details: Dict[int, Dict] = {}
+
+    def __len__(self) -> int:
+        return len(self._status)
+
+    def append(self, result: RowResult):
+        index = len(self._status)
+        self._status.append(result.status)
+        self._columns.append(result.columns)
+        self._timestamps.append(result.timestamp)
+        self._keys += result.rowkey.encode('utf-8')
+        self._key_offsets.append(len(self._keys))
+        if result.digest:
+            self._digests += result.digest
+        self._digest_offsets.append(len(self._digests))
+        if result.details is not None:
+            self._details[index] = result.details
+
+    def extend(self, results):
+        for result in results:
+            self.append(result)
+
+    def pop(self) -> RowResult:
+        """移除并返回最后一条结论"""
+        result = self[-1]
+        index = len(self._status) - 1
+        self._status.pop()
+        self._columns.pop()
+        self._timestamps.pop()
+        self._key_offsets.pop()
+        del self._keys[self._key_offsets[-1]:]
+        self._digest_offsets.pop()
+        del self._digests[self._digest_offsets[-1]:]
+        self._details.pop(index, None)
+        return result
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('ResultStore index out of range')
+        digest = bytes(self._digests[self._digest_offsets[index]:self._digest_offsets[index + 1]])
+        return RowResult(
+            self._keys[self._key_offsets[index]:self._key_offsets[index + 1]].decode('utf-8'),
+            RowStatus(self._status[index]),
+            digest or None,
+            self._columns[index],
+            self._timestamps[index],
+            self._details.get(index)
+        )
+
+    def records(self, status: Optional[RowStatus] = None) -> Iterator[RowResult]:
+        """按顺序逐条还原结论，给出status时只返回该状态的行"""
+        for index in range(len(self)):
+            if status is None or self._status[index] == status:
+                yield self[index]
+
+    def dicts(self, status: Optional[RowStatus] = None) -> Iterator[Dict]:
+        """按顺序逐条还原为字典格式"""
+        for result in self.records(status):
+            yield result.to_dict()
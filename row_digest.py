@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+行数据摘要
+按列名排序后直接对列名/值的字节做哈希，每个字段带长度前缀保证编码无歧义，
+不再经过json.dumps和str(bytes)。默认使用xxhash（未安装时退回blake2b）。
+"""
+
+import hashlib
+import json
+import struct
+from typing import Callable, Dict, List
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+
+DIGEST_ALGORITHMS: List[str] = ['auto', 'xxh3_128', 'xxh64', 'blake2b', 'md5-json']
+
+_pack_length = struct.Struct('>I').pack
+
+
+def _as_bytes(value) -> bytes:
+    """列名/值统一转换为bytes"""
+    if isinstance(value, bytes):
+        return value
+    if isinstance(value, str):
+        return value.encode('utf-8')
+    return str(value).encode('utf-8')
+
+
+def canonical_row_bytes(data: Dict) -> bytes:
+    """行数据的规范编码：按列名排序，依次写入 长度+列名+长度+值"""
+    parts = []
+    for column, value in sorted(data.items()):
+        column = _as_bytes(column)
+        value = _as_bytes(value)
+        parts.append(_pack_length(len(column)))
+        parts.append(column)
+        parts.append(_pack_length(len(value)))
+        parts.append(value)
+    return b''.join(parts)
+
+
+def _md5_json_digest(data: Dict) -> bytes:
+    """兼容旧版本的摘要：排序后json序列化再计算MD5"""
+    sorted_data = sorted(data.items())
+    data_str = json.dumps(sorted_data, sort_keys=True, default=str)
+    return hashlib.md5(data_str.encode('utf-8')).digest()
+
+
+def _blake2b_digest(data: Dict) -> bytes:
+    return hashlib.blake2b(canonical_row_bytes(data), digest_size=16).digest()
+
+
+def _xxh3_128_digest(data: Dict) -> bytes:
+    return xxhash.xxh3_128_digest(canonical_row_bytes(data))
+
+
+def _xxh64_digest(data: Dict) -> bytes:
+    return xxhash.xxh64_digest(canonical_row_bytes(data))
+
+
+def resolve_algorithm(algorithm: str) -> str:
+    """解析摘要算法名，auto及未安装xxhash时的xxh*均退回blake2b"""
+    if algorithm not in DIGEST_ALGORITHMS:
+        raise ValueError(f"不支持的摘要算法: {algorithm}，可选: {', '.join(DIGEST_ALGORITHMS)}")
+    if algorithm == 'auto':
+        return 'xxh3_128' if xxhash is not None else 'blake2b'
+    if algorithm.startswith('xxh') and xxhash is None:
+        return 'blake2b'
+    return algorithm
+
+
+class RowDigest:
+    """可插拔的行摘要计算器"""
+
+    _FUNCTIONS: Dict[str, Callable[[Dict], bytes]] = {
+        'xxh3_128': _xxh3_128_digest,
+        'xxh64': _xxh64_digest,
+        'blake2b': _blake2b_digest,
+        'md5-json': _md5_json_digest,
+    }
+
+    def __init__(self, algorithm: str = 'auto'):
+        """
+        初始化摘要计算器
+
+        Args:
+            algorithm: auto / xxh3_128 / xxh64 / blake2b / md5-json
+        """
+        self.algorithm = resolve_algorithm(algorithm)
+        self._digest = self._FUNCTIONS[self.algorithm]
+
+    def digest(self, data: Dict) -> bytes:
+        """计算行摘要（原始bytes）"""
+        return self._digest(data)
+
+    def hexdigest(self, data: Dict) -> str:
+        """计算行摘要（十六进制字符串）"""
+        return self._digest(data).hex()
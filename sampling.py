@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+统计抽样
+在行键空间中随机定位抽取样本，并用Wilson区间给出不一致率的置信区间，
+用于在几分钟内对数十亿行的迁移给出有统计意义的结论。
+每次定位取到的一小段连续行是一个整群，群内的行往往一起出错（同一批写入、同一个region），
+区间按设计效应折算的有效样本量计算，而不是把每行当作独立样本。
+"""
+
+import bisect
+import math
+import random
+from statistics import NormalDist
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+
+_CHAR_CLASSES = [
+    bytes(range(ord('0'), ord('9') + 1)),
+    bytes(range(ord('A'), ord('Z') + 1)),
+    bytes(range(ord('a'), ord('z') + 1)),
+]
+
+
+def _position_alphabets(first: bytes, last: bytes) -> List[bytes]:
+    """
+    每个位置可能出现的字符表
+
+    同一位置上首尾行键的字符属于数字/大写/小写字母时只在这些字符类中取值，
+    否则取全部256个字节值。这样 order_0001 这类定长业务行键不会把随机点
+    大量落在不存在的字符组合里。
+    """
+    alphabets = []
+    for i in range(max(len(first), len(last))):
+        chars = set(first[i:i + 1] + last[i:i + 1])
+        classes = [cls for cls in _CHAR_CLASSES if chars & set(cls)]
+        if chars and all(any(c in cls for cls in classes) for c in chars):
+            alphabets.append(bytes(sorted(set().union(*classes))))
+        else:
+            alphabets.append(bytes(range(256)))
+    return alphabets
+
+
+def _key_to_int(key: bytes, alphabets: List[bytes]) -> int:
+    value = 0
+    for i, alphabet in enumerate(alphabets):
+        index = bisect.bisect_left(alphabet, key[i]) if i < len(key) else 0
+        value = value * len(alphabet) + min(index, len(alphabet) - 1)
+    return value
+
+
+def _int_to_key(value: int, alphabets: List[bytes]) -> bytes:
+    chars = []
+    for alphabet in reversed(alphabets):
+        value, index = divmod(value, len(alphabet))
+        chars.append(alphabet[index])
+    return bytes(reversed(chars))
+
+
+def random_key_between(first: bytes, last: bytes, rng: random.Random) -> bytes:
+    """
+    在首尾行键 [first, last] 之间随机生成一个扫描起点
+
+    按位置字符表把行键视为混合进制整数后均匀插值。随机行键只作为扫描起点，
+    实际抽中的是它之后的第一行，因此某行被抽中的概率与它前面的行键空隙成正比；
+    行键分布极不均匀时存在一定偏差。
+    """
+    if last <= first:
+        return first
+    alphabets = _position_alphabets(first, last)
+    low = _key_to_int(first, alphabets)
+    high = _key_to_int(last, alphabets)
+    if high <= low:
+        return first
+    return max(_int_to_key(rng.randint(low, high), alphabets), first)
+
+
+def wilson_interval(failures: float, total: float, confidence: float = 0.95):
+    """不一致率的Wilson置信区间，返回 (下界, 上界)；有效样本量可以不是整数"""
+    if total == 0:
+        return 0.0, 1.0
+
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    p = failures / total
+    denominator = 1 + z * z / total
+    center = (p + z * z / (2 * total)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / total + z * z / (4 * total * total)) / denominator
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+def cluster_design_effect(cluster_sizes: Sequence[int], cluster_failures: Sequence[int]) -> float:
+    """
+    整群抽样的设计效应（不小于1）
+
+    按群计算的比率估计方差与把各行当作独立样本时的方差之比。样本中没有不一致行
+    （或全部不一致）时无法估计群内相关性，按群内完全相关取平均群大小。
+    """
+    clusters = len(cluster_sizes)
+    total = sum(cluster_sizes)
+    if not total:
+        return 1.0
+    mean_size = total / clusters
+    failures = sum(cluster_failures)
+    if clusters < 2 or failures in (0, total):
+        return max(1.0, mean_size)
+
+    p = failures / total
+    residuals = sum((f - p * m) ** 2 for m, f in zip(cluster_sizes, cluster_failures))
+    cluster_variance = clusters / (clusters - 1) * residuals / (total * total)
+    return max(1.0, cluster_variance / (p * (1 - p) / total))
+
+
+class BernoulliKeySample:
+    """
+    对行键流做伯努利抽样：每个行键独立以sample_rate的概率抽中
+
+    行键来自只取行键的扫描，未抽中的行键不会读取列值。scanned为已扫描的总体行数；
+    population_through(rowkey)给出扫描到某个抽中行键（含）为止的总体行数，按提交顺序
+    调用，用于把与已提交进度一致的总体行数写入断点。
+    """
+
+    def __init__(self, rowkeys: Iterable[str], sample_rate: float, seed: Optional[int] = None):
+        self.rowkeys = rowkeys
+        self.sample_rate = sample_rate
+        self.rng = random.Random(seed)
+        self.scanned = 0
+        self._positions = deque()
+
+    def __iter__(self) -> Iterator[str]:
+        for rowkey in self.rowkeys:
+            self.scanned += 1
+            if self.rng.random() < self.sample_rate:
+                self._positions.append((rowkey, self.scanned))
+                yield rowkey
+
+    def population_through(self, rowkey: str) -> int:
+        """扫描到抽中行键rowkey（含）为止的总体行数，并丢弃它之前的记录"""
+        while self._positions:
+            key, scanned = self._positions.popleft()
+            if key == rowkey:
+                return scanned
+        raise KeyError(rowkey)
+
+
+def mismatch_estimate(total_rows: int, matched_rows: int, confidence: float = 0.95,
+                      population_rows: Optional[int] = None, design_effect: float = 1.0) -> Dict:
+    """
+    根据样本结果估计不一致率及其置信区间
+
+    design_effect大于1（整群抽样）时按有效样本量 total_rows / design_effect 计算Wilson区间。
+    """
+    failures = total_rows - matched_rows
+    low, high = wilson_interval(failures / design_effect, total_rows / design_effect, confidence)
+    estimate = {
+        'sample_rows': total_rows,
+        'mismatch_rows': failures,
+        'mismatch_rate': failures / total_rows if total_rows else 0.0,
+        'confidence': confidence,
+        'design_effect': design_effect,
+        'effective_sample_rows': total_rows / design_effect,
+        'mismatch_rate_low': low,
+        'mismatch_rate_high': high,
+    }
+    if population_rows:
+        estimate['estimated_mismatch_rows_low'] = int(low * population_rows)
+        estimate['estimated_mismatch_rows_high'] = int(math.ceil(high * population_rows))
+    return estimate
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+扫描批大小自适应
+happybase的scan按batch_size行一批通过RPC拉取（即HBase的scanner caching）。
+批太小时只取行键的扫描几乎全部时间花在往返上，批太大时宽表单次RPC占用内存过多、
+耗时过长。这里按实测的每行字节数和每批RPC耗时调整批大小：
+
+- 每批耗时低于目标值时翻倍，超过上限时减半
+- 批大小不超过 内存预算 / 平均每行字节数
+- 批大小变化超过一倍时，从最后一个行键之后重新打开扫描
+- 每批耗时不含读取限速的等待时间，否则限速越严批越小
+
+同一类扫描（同一张表、是否只取行键）学到的批大小会作为下一次扫描的初始值。
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def estimate_row_bytes(key: bytes, data: Dict) -> int:
+    """估算一行在传输中的字节数（行键、列名和值，带时间戳时每个单元格另加8字节）"""
+    size = len(key)
+    for column, value in data.items():
+        if isinstance(value, tuple):
+            size += len(column) + len(value[0]) + 8
+        else:
+            size += len(column) + len(value)
+    return size
+
+
+class ScanTuner:
+    """按扫描类型记录并调整批大小"""
+
+    def __init__(self, batch_size: Optional[int] = None, memory_budget_mb: float = 8.0,
+                 min_batch_size: int = 10, max_batch_size: int = 20000,
+                 target_rpc_seconds: float = 0.2, max_rpc_seconds: float = 1.0,
+                 wait_clock: Optional[Callable[[], float]] = None):
+        """
+        初始化批大小调整器
+
+        Args:
+            batch_size: 固定批大小，None表示自适应
+            memory_budget_mb: 单个扫描一批数据的内存预算（MB）
+            min_batch_size: 批大小下限
+            max_batch_size: 批大小上限
+            target_rpc_seconds: 每批耗时低于该值时增大批大小
+            max_rpc_seconds: 每批耗时超过该值时减小批大小
+            wait_clock: 返回当前线程累计限速等待秒数的函数，这部分时间不计入每批耗时
+        """
+        self.fixed_batch_size = batch_size
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.target_rpc_seconds = target_rpc_seconds
+        self.max_rpc_seconds = max_rpc_seconds
+        self.wait_clock = wait_clock or (lambda: 0.0)
+
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._learned: Dict[Tuple, int] = {}
+
+    @property
+    def adaptive(self) -> bool:
+        return not self.fixed_batch_size
+
+    def initial_batch_size(self, shape: Tuple) -> int:
+        """某类扫描的初始批大小"""
+        if not self.adaptive:
+            return self.fixed_batch_size
+        with self._lock:
+            return self._learned.get(shape, DEFAULT_BATCH_SIZE)
+
+    def next_batch_size(self, batch_size: int, batch_seconds: float, row_bytes: float) -> int:
+        """根据上一批的耗时和平均每行字节数给出下一批的大小"""
+        if batch_seconds > self.max_rpc_seconds:
+            desired = batch_size // 2
+        elif batch_seconds < self.target_rpc_seconds:
+            desired = batch_size * 2
+        else:
+            desired = batch_size
+
+        memory_cap = int(self.memory_budget / max(row_bytes, 1.0))
+        return max(self.min_batch_size, min(desired, memory_cap, self.max_batch_size))
+
+    def scan(self, table, shape: Tuple, scan_kwargs: Dict) -> Iterator[Tuple[bytes, Dict]]:
+        """
+        按自适应批大小扫描
+
+        反向扫描无法算出上一个行键之前的起点，只按初始批大小扫描不做调整。
+        """
+        batch_size = self.initial_batch_size(shape)
+        if not self.adaptive or scan_kwargs.get('reverse'):
+            yield from table.scan(batch_size=batch_size, **scan_kwargs)
+            return
+
+        scan_kwargs = dict(scan_kwargs)
+        remaining = scan_kwargs.pop('limit', None)
+        row_bytes = None
+
+        while True:
+            kwargs = dict(scan_kwargs, batch_size=batch_size)
+            if remaining:
+                kwargs['limit'] = remaining
+
+            scanner = iter(table.scan(**kwargs))
+            resized = False
+            try:
+                rows_in_batch = 0
+                batch_bytes = 0
+                batch_seconds = 0.0
+                while True:
+                    started = time.perf_counter()
+                    waited = self.wait_clock()
+                    row = next(scanner, None)
+                    batch_seconds += time.perf_counter() - started - (self.wait_clock() - waited)
+                    if row is None:
+                        break
+
+                    key, data = row
+                    rows_in_batch += 1
+                    batch_bytes += estimate_row_bytes(key, data)
+                    yield row
+
+                    if remaining:
+                        remaining -= 1
+                        if remaining == 0:
+                            return
+
+                    if rows_in_batch < batch_size:
+                        continue
+
+                    # 一批结束：按耗时和行大小决定下一批的大小
+                    average = batch_bytes / rows_in_batch
+                    row_bytes = average if row_bytes is None else 0.7 * row_bytes + 0.3 * average
+                    new_size = self.next_batch_size(batch_size, batch_seconds, row_bytes)
+                    with self._lock:
+                        self._learned[shape] = new_size
+
+                    if new_size >= batch_size * 2 or new_size * 2 <= batch_size:
+                        self.logger.debug(f"扫描批大小调整: {batch_size} -> {new_size} "
+                                          f"(每行约{row_bytes:.0f}字节, 每批{batch_seconds:.3f}秒)")
+                        batch_size = new_size
+                        scan_kwargs['row_start'] = key + b'\x00'
+                        resized = True
+                        break
+                    rows_in_batch = 0
+                    batch_bytes = 0
+                    batch_seconds = 0.0
+            finally:
+                close = getattr(scanner, 'close', None)
+                if close:
+                    close()
+
+            if not resized:
+                return
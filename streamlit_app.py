@@ -16,8 +16,12 @@ import threading
 from datetime import datetime
 import os
 import io
+import itertools
 
 from hbase_data_validator import HBaseDataValidator, HBaseConnection, ValidationResult
+from metrics import start_metrics_server
+from profiler import SamplingProfiler
+from result_store import RowStatus
 
 
 class ValidationSession:
@@ -28,6 +32,8 @@ class ValidationSession:
         self.progress = 0
         self.current_result = None
         self.error_message = None
+        self.profile_summary = None
+        self.profile_files = None
 
 
 def init_session_state():
@@ -57,7 +63,34 @@ def sidebar_config():
     # 验证配置
     st.sidebar.subheader("⚙️ 验证配置")
     max_rows = st.sidebar.number_input("最大验证行数", value=1000, min_value=1, help="设置为0表示验证所有数据")
+    mode = st.sidebar.selectbox(
+        "验证模式",
+        options=['rowkey', 'merge', 'merkle', 'sample'],
+        format_func=lambda m: {'rowkey': '按源端行键点查', 'merge': '双端有序扫描归并',
+                               'merkle': '叶子区间摘要', 'sample': '分层随机抽样'}[m],
+        help="归并模式顺序扫描两端，可同时发现源端和目标端缺失的行；区间摘要模式只对摘要不同的叶子"
+             "逐行对比，适合两端几乎一致的大表（行键文件模式下不生效）"
+    )
     max_workers = st.sidebar.slider("并发线程数", min_value=1, max_value=20, value=10)
+    engine = st.sidebar.selectbox("执行引擎", options=['thread', 'asyncio'],
+                                  format_func=lambda e: {'thread': '线程池', 'asyncio': '异步I/O'}[e],
+                                  help="异步I/O引擎在一个事件循环中保持数百个在途multi-get，适合高延迟的跨机房验证"
+                                       "（只作用于按行键验证和抽样）")
+    adaptive_concurrency = st.sidebar.checkbox("自适应并发", value=False,
+                                               help="以并发线程数为初始值，根据读取延迟和错误在1~64之间自动调整")
+    sample_rate = st.sidebar.slider("采样比例", min_value=0.01, max_value=1.0, value=1.0, step=0.01,
+                                    help="按源端行键点查模式下均匀抽样的比例，小于1时给出不一致率的置信区间")
+    sample_size = st.sidebar.number_input("抽样行数", value=10000, min_value=100, step=1000,
+                                          help="分层随机抽样模式的目标抽样行数")
+    include_columns = st.sidebar.text_input("包含列", value="", help="只对比的列族/列，逗号分隔，如 info,detail:status，留空表示全部")
+    exclude_columns = st.sidebar.text_input("排除列", value="", help="不对比的列族/列，逗号分隔，如 blob,info:raw")
+    batch_size = st.sidebar.number_input("批处理大小", value=100, min_value=1, max_value=10000,
+                                         help="每批multi-get的行数，1表示逐行验证")
+    compare_processes = st.sidebar.number_input("比较进程数", value=0, min_value=0, max_value=os.cpu_count() or 1,
+                                                help="行摘要和逐列对比使用的子进程数，0表示在读取线程中对比")
+    profile = st.sidebar.checkbox("性能剖析", value=False,
+                                  help="采样验证线程的调用栈，结束后显示各阶段耗时占比和热点函数，"
+                                       "并在reports目录写入折叠栈文件（可生成火焰图）")
     
     # 行键文件上传
     st.sidebar.subheader("📄 行键文件")
@@ -67,7 +100,17 @@ def sidebar_config():
         'source': HBaseConnection(source_host, source_port, source_table),
         'target': HBaseConnection(target_host, target_port, target_table),
         'max_rows': max_rows if max_rows > 0 else None,
+        'mode': mode,
+        'sample_rate': sample_rate,
+        'sample_size': sample_size,
+        'include_columns': include_columns,
+        'exclude_columns': exclude_columns,
         'max_workers': max_workers,
+        'max_concurrency': 64 if adaptive_concurrency else None,
+        'batch_size': batch_size,
+        'compare_processes': compare_processes,
+        'engine': engine,
+        'profile': profile,
         'rowkeys_file': uploaded_file
     }
 
@@ -107,17 +150,35 @@ def test_connections(config):
 
 def progress_callback(completed, total):
     """进度回调函数"""
-    progress = completed / total
+    progress = min(completed / total, 1.0) if total else 0
     st.session_state.validation_session.progress = progress
 
 
+def iter_uploaded_rowkeys(uploaded_file):
+    """逐行读取上传的行键文件"""
+    for line in io.TextIOWrapper(uploaded_file, encoding='utf-8'):
+        rowkey = line.strip()
+        if rowkey:
+            yield rowkey
+
+
 def run_validation(config):
     """运行验证"""
     session = st.session_state.validation_session
+    session.profile_summary = None
+    session.profile_files = None
+    profiler = SamplingProfiler().start() if config['profile'] else None
     
     try:
         # 创建验证器
-        session.validator = HBaseDataValidator(config['source'], config['target'])
+        session.validator = HBaseDataValidator(config['source'], config['target'],
+                                               pool_size=config['max_workers'],
+                                               spill_dir='reports',
+                                               include_columns=config['include_columns'],
+                                               max_concurrency=config['max_concurrency'],
+                                               compare_processes=config['compare_processes'],
+                                               engine=config['engine'],
+                                               exclude_columns=config['exclude_columns'])
         
         # 连接数据库
         if not session.validator.connect_source():
@@ -130,20 +191,44 @@ def run_validation(config):
         
         # 开始验证
         if config['rowkeys_file']:
-            # 使用上传的行键文件
-            rowkeys_content = config['rowkeys_file'].read().decode('utf-8')
-            rowkeys = [line.strip() for line in rowkeys_content.split('\n') if line.strip()]
+            # 使用上传的行键文件（逐行流式读取）
+            config['rowkeys_file'].seek(0)
+            rowkeys = iter_uploaded_rowkeys(config['rowkeys_file'])
             result = session.validator.validate_by_rowkeys_list(
                 rowkeys, 
                 config['max_workers'], 
-                progress_callback
+                progress_callback,
+                config['batch_size']
+            )
+        elif config['mode'] == 'merge':
+            # 双端有序扫描归并
+            result = session.validator.validate_by_merge_scan(
+                config['max_rows'],
+                progress_callback,
+                config['max_workers']
+            )
+        elif config['mode'] == 'sample':
+            # 分层随机抽样
+            result = session.validator.validate_by_sampling(
+                config['sample_size'],
+                config['max_workers'],
+                progress_callback,
+                config['batch_size']
+            )
+        elif config['mode'] == 'merkle':
+            # 叶子区间摘要
+            result = session.validator.validate_by_merkle(
+                progress_callback,
+                config['max_workers']
             )
         else:
             # 验证所有数据
             result = session.validator.validate_all_data(
                 config['max_rows'], 
                 config['max_workers'], 
-                progress_callback
+                progress_callback,
+                config['batch_size'],
+                sample_rate=config['sample_rate']
             )
         
         session.current_result = result
@@ -159,6 +244,15 @@ def run_validation(config):
     except Exception as e:
         session.error_message = f"验证过程出错: {str(e)}"
     finally:
+        if profiler:
+            profiler.stop()
+            session.profile_summary = profiler.summary()
+            try:
+                session.profile_files = profiler.save(
+                    os.path.join('reports', f"hbase_validation_profile_{int(time.time())}")
+                )
+            except Exception as e:
+                session.error_message = f"保存剖析结果失败: {str(e)}"
         session.is_running = False
 
 
@@ -194,7 +288,7 @@ def validation_control(config):
         if session.current_result:
             report = session.validator.generate_report() if session.validator else {}
             if report:
-                report_json = json.dumps(report, ensure_ascii=False, indent=2)
+                report_json = json.dumps(report, ensure_ascii=False, indent=2, default=str)
                 st.download_button(
                     "下载报告",
                     data=report_json,
@@ -247,6 +341,31 @@ def display_validation_results():
     
     # 可视化图表
     create_result_charts(result)
+    
+    # 性能剖析
+    if session.profile_summary:
+        display_profile(session.profile_summary, session.profile_files)
+
+
+def display_profile(summary: dict, files):
+    """显示性能剖析结果"""
+    with st.expander(f"🔬 性能剖析（采样 {summary['samples']} 次）", expanded=True):
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown("**阶段占比（线程时间）**")
+            st.dataframe(pd.DataFrame([
+                {'阶段': stage, '占比(%)': entry['percent'], '线程时间(秒)': entry['thread_seconds']}
+                for stage, entry in summary['stages'].items()
+            ]), use_container_width=True)
+        with col2:
+            st.markdown("**热点函数**")
+            st.dataframe(pd.DataFrame([
+                {'函数': entry['function'], '自身(%)': round(entry['self_percent'], 1),
+                 '含子调用(%)': round(entry['total_percent'], 1)}
+                for entry in summary['hot_functions']
+            ]), use_container_width=True)
+        if files:
+            st.caption(f"折叠栈: {files[0]}，汇总: {files[1]}")
 
 
 def create_result_charts(result: ValidationResult):
@@ -255,15 +374,16 @@ def create_result_charts(result: ValidationResult):
     
     with col1:
         # 饼图 - 数据分布
-        labels = ['匹配', '目标端缺失', '源端缺失', '数据不一致', '错误']
+        labels = ['匹配', '目标端缺失', '源端缺失', '数据不一致', '错误', '读取失败']
         values = [
             result.matched_rows,
             result.missing_in_target,
             result.missing_in_source,
             result.data_mismatch,
-            result.error_rows
+            result.error_rows,
+            result.fetch_failed
         ]
-        colors = ['#00D4AA', '#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4']
+        colors = ['#00D4AA', '#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFA94D']
         
         fig_pie = go.Figure(data=[go.Pie(
             labels=labels, 
@@ -276,13 +396,14 @@ def create_result_charts(result: ValidationResult):
     
     with col2:
         # 柱状图 - 详细统计
-        categories = ['匹配', '目标端缺失', '源端缺失', '数据不一致', '错误']
+        categories = ['匹配', '目标端缺失', '源端缺失', '数据不一致', '错误', '读取失败']
         counts = [
             result.matched_rows,
             result.missing_in_target,
             result.missing_in_source,
             result.data_mismatch,
-            result.error_rows
+            result.error_rows,
+            result.fetch_failed
         ]
         
         fig_bar = px.bar(
@@ -317,19 +438,26 @@ def display_detailed_report():
     with col1:
         status_filter = st.selectbox(
             "状态过滤",
-            options=['全部', 'matched', 'missing_in_target', 'missing_in_source', 'data_mismatch', 'error'],
+            options=['全部'] + [status.label for status in RowStatus if status != RowStatus.BOTH_MISSING],
             index=0
         )
     
     with col2:
         max_display = st.number_input("最大显示行数", value=100, min_value=10, max_value=1000)
     
-    # 过滤数据
-    details = result.details
-    if status_filter != '全部':
-        details = [d for d in details if d['status'] == status_filter]
+    estimate = result.mode_info
+    if 'mismatch_rate' in estimate:
+        st.info(f"抽样估计不一致率 {estimate['mismatch_rate']:.4%}，"
+                f"{estimate['confidence']:.0%}置信区间 "
+                f"[{estimate['mismatch_rate_low']:.4%}, {estimate['mismatch_rate_high']:.4%}]"
+                f"（有效样本 {estimate.get('effective_sample_rows', estimate['sample_rows']):,.0f} 行）")
+    
+    if result.spill_file and result.spilled_rows:
+        st.caption(f"以下为内存中的明细样本，全部 {result.spilled_rows} 条不一致记录已写入: {result.spill_file}")
     
-    details = details[:max_display]
+    # 过滤数据（明细样本按列保存，只还原需要显示的行）
+    status = None if status_filter == '全部' else RowStatus.from_label(status_filter)
+    details = list(itertools.islice(result.details.dicts(status), max_display))
     
     # 显示详细信息
     if details:
@@ -402,6 +530,9 @@ def main():
     # 初始化会话状态
     init_session_state()
     
+    # 指标端点（设置了HBASE_VALIDATOR_METRICS_PORT时启动，进程内只启动一次）
+    start_metrics_server(int(os.environ.get('HBASE_VALIDATOR_METRICS_PORT') or 0))
+    
     # 侧边栏配置
     config = sidebar_config()
     
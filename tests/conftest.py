@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""测试公共夹具：在fake_hbase上生成一对源端/目标端表并创建验证器"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_hbase import FakeHBase, populate_pair  # noqa: E402
+from hbase_data_validator import HBaseConnection, HBaseDataValidator  # noqa: E402
+
+SOURCE_HOST = 'source'
+TARGET_HOST = 'target'
+TABLE_NAME = 'ns:table'
+ROWS = 2000
+
+
+def expected_counts(backend: FakeHBase, table_name: str = TABLE_NAME) -> dict:
+    """按两端表数据直接算出的各状态行数"""
+    source = backend.clusters[SOURCE_HOST][table_name.encode('utf-8')].rows
+    target = backend.clusters[TARGET_HOST][table_name.encode('utf-8')].rows
+    counts = {'matched_rows': 0, 'missing_in_target': 0, 'missing_in_source': 0, 'data_mismatch': 0}
+    for key, cells in source.items():
+        if key not in target:
+            counts['missing_in_target'] += 1
+        elif {c: v for c, (v, _) in cells.items()} == {c: v for c, (v, _) in target[key].items()}:
+            counts['matched_rows'] += 1
+        else:
+            counts['data_mismatch'] += 1
+    counts['missing_in_source'] = sum(1 for key in target if key not in source)
+    return counts
+
+
+@pytest.fixture
+def backend():
+    backend = FakeHBase()
+    populate_pair(backend, SOURCE_HOST, TARGET_HOST, TABLE_NAME, ROWS, columns=5, value_size=16,
+                  mismatch_ratio=0.02, missing_ratio=0.02, regions=4, seed=1)
+    # 只在目标端存在的行
+    backend.clusters[TARGET_HOST][TABLE_NAME.encode('utf-8')].put(b'row9999999999', {b'cf:q0': b'extra'})
+    return backend
+
+
+@pytest.fixture
+def make_validator(backend):
+    validators = []
+
+    def make(**kwargs):
+        validator = HBaseDataValidator(HBaseConnection(SOURCE_HOST, table_name=TABLE_NAME),
+                                       HBaseConnection(TARGET_HOST, table_name=TABLE_NAME),
+                                       connection_factory=backend.connect, **kwargs)
+        assert validator.connect_source() and validator.connect_target()
+        validators.append(validator)
+        return validator
+
+    yield make
+    for validator in validators:
+        validator.disconnect()
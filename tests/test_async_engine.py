@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import struct
+
+import pytest
+
+from async_engine import BinaryProtocol, MemoryBuffer, MessageScanner, load_hbase_service, message_length
+from conftest import expected_counts
+
+service = load_hbase_service()
+needs_thrift = pytest.mark.skipif(service is None, reason='需要thriftpy2和happybase')
+
+
+def encode_rows_result(rows: int, columns: int, strict: bool = True) -> bytes:
+    """编码一条getRowsWithColumns的响应消息"""
+    Hbase = service.Hbase
+    results = [
+        service.TRowResult(row=b'row%010d' % i,
+                           columns={b'cf:q%d' % c: service.TCell(value=b'v' * 20, timestamp=i) for c in range(columns)})
+        for i in range(rows)
+    ]
+    buffer = MemoryBuffer()
+    protocol = BinaryProtocol(buffer)
+    Hbase.getRowsWithColumns_result(success=results).write(protocol)
+    buffer.flush()
+    body = buffer.getvalue()
+    name = b'getRowsWithColumns'
+    if strict:
+        header = struct.pack('!iI', -2147418110, len(name)) + name + struct.pack('!i', 7)
+    else:
+        header = struct.pack('!I', len(name)) + name + struct.pack('!bi', 2, 7)
+    return header + body
+
+
+@needs_thrift
+@pytest.mark.parametrize('strict', [True, False])
+def test_message_length_every_prefix(strict):
+    message = encode_rows_result(3, 4, strict)
+    for end in range(len(message)):
+        assert message_length(message[:end]) is None
+    assert message_length(message) == len(message)
+    assert message_length(message + b'\x80\x01\x00\x02') == len(message)
+
+
+@needs_thrift
+@pytest.mark.parametrize('chunk', [1, 7, 1000, 65536])
+def test_message_scanner_incremental(chunk):
+    message = encode_rows_result(300, 20)
+    scanner = MessageScanner()
+    data = bytearray()
+    for start in range(0, len(message), chunk):
+        assert scanner.feed(data) is None
+        data += message[start:start + chunk]
+    assert scanner.feed(data) == len(message)
+
+
+@needs_thrift
+def test_message_length_empty_result():
+    message = encode_rows_result(0, 0)
+    assert message_length(message) == len(message)
+
+
+def test_asyncio_engine_matches_thread_engine(backend, make_validator):
+    expected = expected_counts(backend)
+    keys = ['row%010d' % i for i in range(2000)] + ['row9999999999']
+    for engine in ('thread', 'asyncio'):
+        result = make_validator(engine=engine).validate_by_rowkeys_list(keys, max_workers=4, batch_size=50)
+        assert result.total_rows == len(keys)
+        for name, value in expected.items():
+            assert getattr(result, name) == value, (engine, name)
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+
+import pytest
+
+import fake_hbase
+from checkpoint import CheckpointManager
+from conftest import SOURCE_HOST, TABLE_NAME, expected_counts
+from resilience import FetchError
+
+
+@pytest.fixture
+def failing_scan(backend, monkeypatch):
+    """源端的第一次全表扫描在返回fail_after行后出现不可重试的错误"""
+    source_data = backend.clusters[SOURCE_HOST][TABLE_NAME.encode('utf-8')]
+    original_scan = fake_hbase.FakeTable.scan
+    state = {'armed': True, 'fail_after': 700}
+
+    def scan(self, *args, **kwargs):
+        rows = original_scan(self, *args, **kwargs)
+        if not (state['armed'] and self.data is source_data and kwargs.get('row_start') is None):
+            yield from rows
+            return
+        for count, row in enumerate(rows):
+            if count == state['fail_after']:
+                state['armed'] = False
+                raise RuntimeError('TableNotEnabledException: disabled')
+            yield row
+
+    monkeypatch.setattr(fake_hbase.FakeTable, 'scan', scan)
+    return state
+
+
+def test_failed_key_scan_keeps_checkpoint_and_resumes(backend, make_validator, failing_scan, tmp_path):
+    checkpoint_file = str(tmp_path / 'checkpoint.json')
+    validator = make_validator(checkpoint_file=checkpoint_file, spill_dir=str(tmp_path / 'spill'))
+
+    with pytest.raises(FetchError):
+        validator.validate_all_data(max_workers=2, batch_size=50)
+    state = validator.checkpoint.load('all', validator.source_config.table_name, validator.target_config.table_name)
+    assert state is not None
+    assert 0 < state['counters']['total_rows'] <= failing_scan['fail_after']
+
+    result = validator.validate_all_data(max_workers=2, batch_size=50, resume=True)
+    expected = expected_counts(backend)
+    assert result.total_rows == 2000
+    assert result.matched_rows == expected['matched_rows']
+    assert result.missing_in_target == expected['missing_in_target']
+    assert result.data_mismatch == expected['data_mismatch']
+    assert not os.path.exists(checkpoint_file)
+
+
+@pytest.mark.parametrize('engine', ['thread', 'asyncio'])
+def test_sampled_resume_counts_whole_population(backend, make_validator, failing_scan, tmp_path, engine):
+    checkpoint_file = str(tmp_path / 'checkpoint.json')
+    validator = make_validator(engine=engine, checkpoint_file=checkpoint_file, spill_dir=str(tmp_path / 'spill'))
+
+    with pytest.raises(FetchError):
+        validator.validate_all_data(max_workers=2, batch_size=20, sample_rate=0.3, seed=1)
+    state = validator.checkpoint.load('all', validator.source_config.table_name, validator.target_config.table_name)
+    assert state['sample_rate'] == 0.3
+    assert state['counters']['total_rows'] < state['population_rows'] <= failing_scan['fail_after']
+
+    with pytest.raises(ValueError):
+        validator.validate_all_data(max_workers=2, batch_size=20, resume=True)
+    result = validator.validate_all_data(max_workers=2, batch_size=20, resume=True, sample_rate=0.3, seed=1)
+    assert result.mode_info['population_rows'] == 2000
+    assert result.mode_info['sample_rows'] == result.total_rows < 2000
+    assert not os.path.exists(checkpoint_file)
+
+
+def test_save_creates_missing_directory(tmp_path):
+    manager = CheckpointManager(str(tmp_path / 'reports' / 'checkpoint.json'))
+    manager.save({'mode': 'rowkeys', 'source_table': 'a', 'target_table': 'b'})
+    assert manager.load('rowkeys', 'a', 'b') is not None
+
+
+def interrupted(rowkeys, stop_after):
+    """行键源在给出stop_after个行键后中断"""
+    for count, rowkey in enumerate(rowkeys):
+        if count == stop_after:
+            raise KeyboardInterrupt
+        yield rowkey
+
+
+def spilled_rowkeys(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line)['rowkey'] for line in f]
+
+
+@pytest.mark.parametrize('engine', ['thread', 'asyncio'])
+def test_rowkeys_resume_does_not_duplicate_spill_lines(backend, make_validator, tmp_path, engine):
+    keys = sorted(key.decode('utf-8') for key in backend.clusters[SOURCE_HOST][TABLE_NAME.encode('utf-8')].keys)
+    source = {'path': '/data/rowkeys.txt', 'size': 12345}
+    checkpoint_file = str(tmp_path / 'reports' / 'checkpoint.json')
+    validator = make_validator(engine=engine, checkpoint_file=checkpoint_file, spill_dir=str(tmp_path / 'spill'))
+
+    with pytest.raises(KeyboardInterrupt):
+        validator.validate_by_rowkeys_list(interrupted(keys, 1200), max_workers=4, batch_size=50,
+                                           rowkeys_source=source)
+    assert os.path.exists(checkpoint_file)
+
+    with pytest.raises(ValueError):
+        validator.validate_by_rowkeys_list(iter(keys), max_workers=4, batch_size=50, resume=True,
+                                           rowkeys_source=dict(source, size=54321))
+
+    result = validator.validate_by_rowkeys_list(iter(keys), max_workers=4, batch_size=50, resume=True,
+                                                rowkeys_source=source)
+    expected = expected_counts(backend)
+    assert result.total_rows == len(keys)
+    assert result.matched_rows == expected['matched_rows']
+    assert result.missing_in_target == expected['missing_in_target']
+    assert result.data_mismatch == expected['data_mismatch']
+
+    spilled = spilled_rowkeys(result.spill_file)
+    assert len(spilled) == len(set(spilled)) == len(keys) - result.matched_rows
+    assert not os.path.exists(checkpoint_file)
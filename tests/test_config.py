@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+import os
+
+import pytest
+
+from config_manager import ConfigManager
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize('config_file', [os.path.join(REPO_ROOT, 'config.yaml'), 'missing.yaml'])
+def test_shipped_config_keeps_max_workers_as_the_cap(config_file, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    validation = ConfigManager(config_file).get_validation_config()
+    assert validation.max_concurrency == 0
+
+
+def test_max_workers_bounds_the_pool_by_default(make_validator):
+    validator = make_validator(pool_size=10)
+    assert validator.concurrency is None
+    assert validator.pool_size == 10
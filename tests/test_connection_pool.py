@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+import threading
+
+import pytest
+
+from watermark import WatermarkStore
+
+
+def run_with_timeout(func, timeout=30):
+    """在后台线程中运行，超时视为死锁"""
+    outcome = {}
+
+    def target():
+        outcome['result'] = func()
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        pytest.fail('验证在等待连接时卡住')
+    return outcome['result']
+
+
+def test_all_data_single_connection_does_not_deadlock(make_validator):
+    validator = make_validator(pool_size=1)
+    result = run_with_timeout(lambda: validator.validate_all_data(max_workers=1, batch_size=50))
+    assert result.total_rows == 2000
+
+
+def test_incremental_single_connection_does_not_deadlock(make_validator, tmp_path):
+    validator = make_validator(pool_size=1)
+    store = WatermarkStore(str(tmp_path / 'watermark.json'))
+    result = run_with_timeout(lambda: validator.validate_incremental(store, lag_seconds=-10, max_workers=1))
+    assert result.total_rows == 2001
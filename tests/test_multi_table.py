@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+from collections import Counter
+
+import pytest
+
+from conftest import SOURCE_HOST, TARGET_HOST, expected_counts
+from fake_hbase import FakeHBase, populate_pair
+from hbase_data_validator import HBaseConnection
+from multi_table import MultiTableValidator
+from test_connection_pool import run_with_timeout
+
+TABLES = ['ns:a', 'ns:b', 'ns:c']
+
+
+@pytest.fixture
+def backend():
+    backend = FakeHBase()
+    for seed, table in enumerate(TABLES):
+        populate_pair(backend, SOURCE_HOST, TARGET_HOST, table, 500, columns=3, value_size=8,
+                      mismatch_ratio=0.02, missing_ratio=0.02, regions=2, seed=seed)
+    return backend
+
+
+@pytest.mark.parametrize('budget', [1, 3, 8])
+def test_rowkey_mode_uses_the_injected_factory_within_budget(backend, budget):
+    connections = Counter()
+
+    def connect(host='localhost', **kwargs):
+        connections[host] += 1
+        return backend.connect(host, **kwargs)
+
+    validator = MultiTableValidator(HBaseConnection('source'), HBaseConnection('target'), ['ns:*'],
+                                    budget=budget, parallel_tables=2, connection_factory=connect)
+    assert validator.connect()
+    try:
+        jobs = run_with_timeout(lambda: validator.run('rowkey', batch_size=50) or validator.jobs)
+    finally:
+        validator.disconnect()
+
+    assert [job.status for job in jobs] == ['done'] * len(TABLES)
+    for job in jobs:
+        result = job.result
+        expected = dict(expected_counts(backend, job.source_table), missing_in_source=0)
+        assert {name: getattr(result, name) for name in expected} == expected
+        assert result.total_rows == 500
+        assert result.error_rows == result.fetch_failed == 0
+    # 读取和行键扫描的连接都来自注入的连接工厂，总数不超过预算（预算为1时行键扫描另占一个）
+    assert set(connections) == {SOURCE_HOST, TARGET_HOST}
+    assert connections[SOURCE_HOST] <= max(budget, 2)
+    assert connections[TARGET_HOST] <= max(budget, 2)
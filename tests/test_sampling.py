@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from sampling import cluster_design_effect, mismatch_estimate
+
+
+def test_design_effect_of_scattered_failures_is_about_one():
+    sizes = [10] * 1000
+    failures = [1 if i % 10 == 0 else 0 for i in range(1000)]
+    assert cluster_design_effect(sizes, failures) == pytest.approx(1.0, abs=0.05)
+
+
+def test_design_effect_of_clustered_failures_is_about_cluster_size():
+    sizes = [10] * 1000
+    failures = [10 if i % 100 == 0 else 0 for i in range(1000)]
+    assert cluster_design_effect(sizes, failures) == pytest.approx(10.0, rel=0.05)
+
+
+def test_design_effect_without_failures_assumes_full_correlation():
+    assert cluster_design_effect([10, 10, 8], [0, 0, 0]) == pytest.approx(28 / 3)
+    assert cluster_design_effect([1] * 50, [0] * 50) == 1.0
+
+
+def test_clustered_interval_is_wider():
+    independent = mismatch_estimate(10000, 9900, 0.95)
+    clustered = mismatch_estimate(10000, 9900, 0.95, design_effect=10.0)
+    assert clustered['mismatch_rate'] == independent['mismatch_rate']
+    assert clustered['effective_sample_rows'] == 1000
+    assert clustered['mismatch_rate_low'] < independent['mismatch_rate_low']
+    assert clustered['mismatch_rate_high'] > independent['mismatch_rate_high']
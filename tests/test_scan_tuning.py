@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from fake_hbase import FakeHBase
+from rate_limit import RateLimitedTable, RateLimiter, waited_seconds
+from scan_tuning import ScanTuner
+
+
+def test_rate_limit_wait_does_not_shrink_scan_batches():
+    backend = FakeHBase()
+    data = backend.create_table('source', 'ns:table')
+    for i in range(3000):
+        data.put(b'row%06d' % i, {b'cf:a': b'value'})
+
+    limiter = RateLimiter(requests_per_second=20)
+    limiter.requests.consume(limiter.requests.capacity)
+    table = RateLimitedTable(backend.connect('source').table('ns:table'), limiter)
+    tuner = ScanTuner(min_batch_size=10, max_batch_size=50, target_rpc_seconds=0.0, max_rpc_seconds=0.03,
+                      wait_clock=waited_seconds)
+
+    shape = ('ns:table', None)
+    started = waited_seconds()
+    rows = list(tuner.scan(table, shape, {'limit': 1500}))
+
+    assert len(rows) == 1500
+    # 每批都在限速上等待约0.05秒，超过max_rpc_seconds，但这不是RPC本身的耗时
+    assert waited_seconds() - started > 0.5
+    assert tuner.initial_batch_size(shape) == 50
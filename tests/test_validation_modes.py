@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+
+from conftest import ROWS, SOURCE_HOST, TABLE_NAME, TARGET_HOST, expected_counts
+from watermark import WatermarkStore
+
+COUNTERS = ['matched_rows', 'missing_in_target', 'missing_in_source', 'data_mismatch']
+
+
+def counters(result) -> dict:
+    return {name: getattr(result, name) for name in COUNTERS}
+
+
+def assert_clean(result):
+    assert result.error_rows == 0
+    assert result.fetch_failed == 0
+
+
+@pytest.mark.parametrize('engine', ['thread', 'asyncio'])
+def test_all_data(backend, make_validator, engine):
+    result = make_validator(engine=engine).validate_all_data(max_workers=4, batch_size=50)
+    # 以源端行键为准，只在目标端存在的行不在验证范围内
+    assert counters(result) == dict(expected_counts(backend), missing_in_source=0)
+    assert result.total_rows == ROWS
+    assert_clean(result)
+
+
+@pytest.mark.parametrize('engine', ['thread', 'asyncio'])
+def test_incremental(backend, make_validator, tmp_path, engine):
+    store = WatermarkStore(str(tmp_path / 'watermark.json'))
+    result = make_validator(engine=engine).validate_incremental(store, lag_seconds=-10, max_workers=4)
+    assert counters(result) == expected_counts(backend)
+    assert result.total_rows == ROWS + 1
+    assert_clean(result)
+    assert store.get(TABLE_NAME, TABLE_NAME) == result.mode_info['until_ms']
+
+
+def test_merge(backend, make_validator):
+    result = make_validator().validate_by_merge_scan(max_workers=4)
+    assert counters(result) == expected_counts(backend)
+    assert result.total_rows == ROWS + 1
+    assert_clean(result)
+
+
+@pytest.mark.parametrize('leaf_rows', [7, 100, 5000])
+def test_merkle(backend, make_validator, monkeypatch, leaf_rows):
+    import fake_hbase
+
+    scan = fake_hbase.FakeTable.scan
+    scanned = []
+
+    def recording_scan(self, *args, **kwargs):
+        for row in scan(self, *args, **kwargs):
+            scanned.append(row[0])
+            yield row
+
+    monkeypatch.setattr(fake_hbase.FakeTable, 'scan', recording_scan)
+    result = make_validator().validate_by_merkle(max_workers=4, leaf_rows=leaf_rows)
+    assert counters(result) == expected_counts(backend)
+    assert result.total_rows == ROWS + 1
+    assert_clean(result)
+    # 摘要不同的叶子用已读取的行对比，每行每端只扫描一次
+    source_rows = len(backend.clusters[SOURCE_HOST][TABLE_NAME.encode('utf-8')].keys)
+    target_rows = len(backend.clusters[TARGET_HOST][TABLE_NAME.encode('utf-8')].keys)
+    assert len(scanned) == source_rows + target_rows
+
+
+def test_count(backend, make_validator):
+    result = make_validator().validate_by_count(max_workers=4)
+    source_rows = len(backend.clusters[SOURCE_HOST][TABLE_NAME.encode('utf-8')].keys)
+    target_rows = len(backend.clusters[TARGET_HOST][TABLE_NAME.encode('utf-8')].keys)
+    assert result.mode_info['source_rows'] == source_rows
+    assert result.mode_info['target_rows'] == target_rows
+    assert sum(r['source_rows'] for r in result.mode_info['range_counts']) == source_rows
+    assert sum(r['target_rows'] for r in result.mode_info['range_counts']) == target_rows
+    assert result.missing_in_target == source_rows - target_rows
+    assert_clean(result)
+
+
+@pytest.mark.parametrize('engine', ['thread', 'asyncio'])
+def test_sampling(backend, make_validator, tmp_path, engine):
+    validator = make_validator(engine=engine, spill_dir=str(tmp_path))
+    result = validator.validate_by_sampling(300, max_workers=4, seed=1)
+    assert result.total_rows >= 300
+    assert result.total_rows == sum(counters(result).values())
+    assert_clean(result)
+
+    # 抽中的不一致行与两端数据一致
+    source = backend.clusters[SOURCE_HOST][TABLE_NAME.encode('utf-8')].rows
+    target = backend.clusters[TARGET_HOST][TABLE_NAME.encode('utf-8')].rows
+    with open(result.spill_file, encoding='utf-8') as f:
+        spilled = [json.loads(line) for line in f]
+    assert len(spilled) == result.total_rows - result.matched_rows
+    for record in spilled:
+        key = record['rowkey'].encode('utf-8')
+        assert record['status'] == ('missing_in_target' if key not in target else 'data_mismatch')
+        assert key in source
+
+    estimate = result.mode_info
+    assert estimate['sample_rows'] == result.total_rows
+    assert estimate['design_effect'] >= 1.0
+    assert estimate['mismatch_rate_low'] <= estimate['mismatch_rate'] <= estimate['mismatch_rate_high']
+
+
+def test_all_data_sample_reads_only_sampled_rows(backend, make_validator, monkeypatch):
+    import fake_hbase
+
+    rows = fake_hbase.FakeTable.rows
+    fetched = []
+
+    def recording_rows(self, keys, *args, **kwargs):
+        fetched.extend(keys)
+        return rows(self, keys, *args, **kwargs)
+
+    monkeypatch.setattr(fake_hbase.FakeTable, 'rows', recording_rows)
+    result = make_validator().validate_all_data(max_workers=4, batch_size=50, sample_rate=0.1, seed=1)
+    # 未抽中的行键只出现在只取行键的扫描里，两端都只读取抽中的行
+    assert len(fetched) == 2 * result.total_rows
+    assert 100 < result.total_rows < 300
+    assert result.mode_info['population_rows'] == ROWS
+
+
+@pytest.fixture
+def failing_batch(monkeypatch):
+    """首行为FAILING_ROWKEY的批次在对比阶段整批抛出异常（两种引擎）"""
+    import async_engine
+    import fetch_pipeline
+
+    compare = fetch_pipeline.FetchPipeline.compare
+    validate_batch = async_engine.AsyncRowkeyEngine.validate_batch
+
+    def failing_compare(self, rowkeys, source, target):
+        if rowkeys[0] == FAILING_ROWKEY:
+            raise RuntimeError('boom')
+        return compare(self, rowkeys, source, target)
+
+    async def failing_validate_batch(self, rowkeys):
+        if rowkeys[0] == FAILING_ROWKEY:
+            raise RuntimeError('boom')
+        return await validate_batch(self, rowkeys)
+
+    monkeypatch.setattr(fetch_pipeline.FetchPipeline, 'compare', failing_compare)
+    monkeypatch.setattr(async_engine.AsyncRowkeyEngine, 'validate_batch', failing_validate_batch)
+
+
+FAILING_ROWKEY = 'row%010d' % 500
+
+
+@pytest.mark.parametrize('engine', ['thread', 'asyncio'])
+def test_failed_batch_rows_are_counted(backend, make_validator, tmp_path, engine, failing_batch):
+    keys = ['row%010d' % i for i in range(1000)]
+    validator = make_validator(engine=engine, spill_dir=str(tmp_path))
+    result = validator.validate_by_rowkeys_list(keys, max_workers=4, batch_size=50)
+
+    assert result.total_rows == len(keys)
+    assert result.error_rows == 50
+    assert result.total_rows == sum(counters(result).values()) + result.error_rows + result.fetch_failed
+    with open(result.spill_file, encoding='utf-8') as f:
+        errors = [record['rowkey'] for record in map(json.loads, f) if record['status'] == 'error']
+    assert errors == keys[500:550]
+
+
+def test_all_data_enumerates_keys_without_values(backend, make_validator, monkeypatch):
+    import fake_hbase
+
+    scan = fake_hbase.FakeTable.scan
+    scanned_bytes = []
+
+    def recording_scan(self, *args, **kwargs):
+        for key, data in scan(self, *args, **kwargs):
+            scanned_bytes.append(sum(len(value) for value in data.values()))
+            yield key, data
+
+    monkeypatch.setattr(fake_hbase.FakeTable, 'scan', recording_scan)
+    result = make_validator().validate_all_data(max_workers=4, batch_size=50)
+    assert result.total_rows == ROWS
+    assert len(scanned_bytes) == ROWS
+    assert not any(scanned_bytes)
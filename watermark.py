@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量验证水位
+按 源端表 -> 目标端表 记录每次成功增量验证覆盖到的时间戳（毫秒），
+下一次增量验证只检查该时间戳之后写入的单元格所在的行。
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+
+class WatermarkStore:
+    """增量验证水位文件"""
+
+    def __init__(self, path: str):
+        """
+        初始化水位文件
+
+        Args:
+            path: 水位文件路径
+        """
+        self.path = path
+        # 多表验证时多个表并发更新同一个水位文件
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def key(source_table: str, target_table: str) -> str:
+        """水位键"""
+        return f"{source_table}->{target_table}"
+
+    def _load_all(self) -> Dict:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            self.logger.warning(f"读取增量水位文件失败: {e}")
+            return {}
+
+    def get(self, source_table: str, target_table: str) -> Optional[int]:
+        """读取上次成功验证的水位（毫秒），没有记录时返回None"""
+        entry = self._load_all().get(self.key(source_table, target_table))
+        return entry['watermark_ms'] if entry else None
+
+    def set(self, source_table: str, target_table: str, watermark_ms: int, rows: int):
+        """记录本次成功验证的水位"""
+        with self._lock:
+            data = self._load_all()
+            data[self.key(source_table, target_table)] = {
+                'watermark_ms': watermark_ms,
+                'validated_rows': rows,
+                'updated_at': time.strftime('%Y-%m-%d %H:%M:%S')
+            }
+
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)